@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+       Name: check_import_time
+DESCRIPTION: fails if importing smol_k8s_lab.constants gets slow again, or
+             starts loading the config or speech files, which it only does
+             lazily now. Run from the root of the repo, in the poetry venv:
+               python .github/check_import_time.py
+     AUTHOR: @jessebot
+    LICENSE: GNU AFFERO GENERAL PUBLIC LICENSE Version 3
+"""
+import argparse
+import subprocess
+import sys
+
+MODULE = "smol_k8s_lab.constants"
+# importing these is what made the constants module slow (~1.1s), so they
+# must stay lazy. See _LAZY in smol_k8s_lab/constants.py
+MUST_STAY_LAZY = ["DEFAULT_CONFIG", "INITIAL_USR_CONFIG", "SPEECH_MP3_DIR"]
+
+
+def import_times() -> tuple:
+    """
+    imports MODULE in a fresh python with -X importtime and returns the self
+    time of the MODULE body and the cumulative time of the whole import,
+    both in milliseconds
+    """
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                          f"import {MODULE}"],
+                         capture_output=True, text=True, check=True)
+    body_us, total_us = 0, 0
+    for line in res.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # the package imports constants itself, so it shows up twice
+        if name.strip() == MODULE:
+            body_us += int(self_us)
+        # top level imports aren't indented
+        if not name.startswith("  "):
+            total_us += int(cumulative_us)
+    return body_us / 1000, total_us / 1000
+
+
+def loaded_lazy_names() -> list:
+    """
+    returns the names in MUST_STAY_LAZY that importing MODULE computed
+    """
+    code = (f"import {MODULE} as c; "
+            f"print(' '.join(n for n in {MUST_STAY_LAZY} if n in vars(c)))")
+    res = subprocess.run([sys.executable, "-c", code],
+                         capture_output=True, text=True, check=True)
+    return res.stdout.split()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("DESCRIPTION:")[1])
+    parser.add_argument("--body-budget", type=float, default=50,
+                        help=f"max ms to run the {MODULE} module body")
+    parser.add_argument("--total-budget", type=float, default=1000,
+                        help=f"max ms for the whole import of {MODULE}")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="imports to time. We use the fastest, since a "
+                             "slow run is usually a busy machine")
+    args = parser.parse_args()
+
+    times = [import_times() for _ in range(max(1, args.runs))]
+    body = min(t[0] for t in times)
+    total = min(t[1] for t in times)
+    print(f"{MODULE} body: {body:.1f}ms (budget {args.body_budget:.0f}ms), "
+          f"whole import: {total:.1f}ms (budget {args.total_budget:.0f}ms)")
+
+    failed = False
+    if body > args.body_budget:
+        print(f"ERROR: the {MODULE} module body is over budget. Anything "
+              "slow in it should be computed lazily, see _LAZY")
+        failed = True
+    if total > args.total_budget:
+        print(f"ERROR: importing {MODULE} is over budget. Run python -X "
+              f"importtime -c 'import {MODULE}' to see what got slower")
+        failed = True
+
+    loaded = loaded_lazy_names()
+    if loaded:
+        print(f"ERROR: importing {MODULE} computed {', '.join(loaded)}, which "
+              "should only be computed the first time they're used")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
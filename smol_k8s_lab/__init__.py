@@ -10,36 +10,22 @@
         LICENSE: GNU AFFERO GENERAL PUBLIC LICENSE
 """
 
-import asyncio
+import sys
+
+# profile imports from the very start, if --profile-imports was passed in
+if "--profile-imports" in sys.argv:
+    from .utils.import_profile import PROFILER
+    PROFILER.install()
+
 from click import option, command
 import logging
 from os import environ as env
-from rich.logging import RichHandler
-from rich.panel import Panel
-
-# custom libs and constants
-from .constants import INITIAL_USR_CONFIG, XDG_CONFIG_FILE, load_yaml
-from .env_config import check_os_support, process_configs
-from .bitwarden.bw_cli import BwCLI
-from .bitwarden.tui.bitwarden_app import BitwardenCredentialsApp
-from .constants import KUBECONFIG, VERSION
-from .k8s_apps import (setup_oidc_provider, setup_base_apps,
-                       setup_k8s_secrets_management, setup_federated_apps,
-                       setup_storage_apps)
-from .k8s_apps.monitoring.prometheus_stack import configure_prometheus_stack
-from .k8s_apps.monitoring.grafana_stack import configure_grafana_stack
-from .k8s_apps.monitoring.tempo import configure_tempo
-from .k8s_apps.networking.netmaker import configure_netmaker
-from .k8s_apps.operators import setup_operators
-from .k8s_apps.operators.minio import configure_minio_tenant
-from .k8s_apps.social.libre_translate import configure_libretranslate
-from .k8s_apps.valkey import configure_valkey
-from .k8s_distros import create_k8s_distro, delete_cluster
-from .tui import launch_config_tui
-from .utils.rich_cli.console_logging import CONSOLE, sub_header, header
-from .utils.rich_cli.help_text import RichCommand, options_help
-from .utils.run.final_cmd import run_final_cmd
 
+# custom libs and constants. Everything else is imported only by the commands
+# that need it, so --version, --help, and --delete start quickly
+from . import constants
+from .constants import KUBECONFIG, XDG_CONFIG_FILE, ensure_dirs, load_yaml
+from .utils.rich_cli.help_text import RichCommand, options_help
 
 HELP = options_help()
 HELP_SETTINGS = dict(help_option_names=["-h", "--help"])
@@ -52,6 +38,7 @@ def process_log_config(log_dict: dict = {"level": "warn", "file": ""}):
 
     TODO: change this to always add file logger
     """
+    from rich.logging import RichHandler
 
     # determine logging level and default to warning level
     level = log_dict.get("level", "warn")
@@ -119,26 +106,45 @@ def process_log_config(log_dict: dict = {"level": "warn", "file": ""}):
         type=str,
         default="",
         help=HELP['command'])
+@option("--max-parallel", "-p",
+        metavar="NUMBER",
+        type=int,
+        default=0,
+        help=HELP['max_parallel'])
+@option("--profile-imports",
+        is_flag=True,
+        help=HELP['profile_imports'])
 def main(config: str = "",
          delete: bool = False,
          log_file: str = "",
          version: bool = False,
          interactive: bool = False,
-         final_cmd: str = ""):
+         final_cmd: str = "",
+         max_parallel: int = 0,
+         profile_imports: bool = False):
     """
     Quickly install a k8s distro for a homelab setup. Installs k3s
     with metallb, ingess-nginx, cert-manager, and argocd
     """
+    # print the import times however we exit
+    if profile_imports:
+        from atexit import register
+        from .utils.import_profile import PROFILER
+        register(PROFILER.report)
+
     # only return the version if --version was passed in
     if version:
-        print(f"\n🎉 v{VERSION}\n")
+        print(f"\n🎉 v{constants.VERSION}\n")
         return True
 
     # make sure this OS is supported
+    from .env_config import check_os_support, process_configs
     check_os_support()
+    ensure_dirs()
 
     # if we're just deleting a cluster, do that immediately
     if delete:
+        from .k8s_distros import delete_cluster
         logging.debug("Cluster deletion was requested")
         # exits the script after deleting the cluster
         delete_cluster(delete)
@@ -150,14 +156,14 @@ def main(config: str = "",
     cluster_name = "smol-k8s-lab"
 
     # verify if the TUI should be used
-    tui_enabled = INITIAL_USR_CONFIG['smol_k8s_lab']['tui']['enabled']
     if config:
         config_dict = load_yaml(config)
-        tui_enabled = config_dict['smol_k8s_lab']['tui']['enabled']
     else:
-        config_dict = INITIAL_USR_CONFIG
+        config_dict = constants.INITIAL_USR_CONFIG
+    tui_enabled = config_dict['smol_k8s_lab']['tui']['enabled']
 
     if interactive or tui_enabled:
+        from .tui import launch_config_tui
         cluster_name, USR_CFG, SECRETS, bitwarden_credentials = launch_config_tui(config_dict)
     else:
         # process all of the config file, or create a new one and also grab secrets
@@ -176,6 +182,7 @@ def main(config: str = "",
 
             # if any of the credentials are missing from the env, launch the tui
             if not any([password, client_id, client_secret]):
+                from .bitwarden.tui.bitwarden_app import BitwardenCredentialsApp
                 bitwarden_credentials = BitwardenCredentialsApp().run()
                 if not bitwarden_credentials:
                     raise Exception("Exiting because no credentials were passed in "
@@ -189,12 +196,42 @@ def main(config: str = "",
     log = process_log_config(USR_CFG['smol_k8s_lab']['log'])
     log.debug("Logging configured.")
 
+    # now we know we're installing a cluster, so import everything for that
+    from rich.panel import Panel
+    from .bitwarden.bw_cli import BwCLI
+    from .k8s_apps import (setup_oidc_provider, setup_base_apps,
+                           setup_k8s_secrets_management, add_federated_apps,
+                           setup_storage_apps, install_apps)
+    from .k8s_apps.monitoring.prometheus_stack import configure_prometheus_stack
+    from .k8s_apps.monitoring.grafana_stack import configure_grafana_stack
+    from .k8s_apps.monitoring.tempo import configure_tempo
+    from .k8s_apps.networking.netmaker import configure_netmaker
+    from .k8s_apps.operators import setup_operators
+    from .k8s_apps.operators.minio import configure_minio_tenant
+    from .k8s_apps.social.libre_translate import configure_libretranslate
+    from .k8s_apps.valkey import configure_valkey
+    from .k8s_apps.ingress.ingress_nginx_controller import KIND_MANIFEST_URL
+    from .k8s_apps.networking.metallb import manifest_url as metallb_manifest_url
+    from .k8s_distros import create_k8s_distro
+    from .k8s_tools.helm import (prefetch_chart_versions, set_helm_repo_max_age,
+                                  use_chart_version_lockfile)
+    from .k8s_tools.restores import restore_manifest_urls
+    from .utils import manifest_cache
+    from .utils.rich_cli.console_logging import CONSOLE
+    from .utils.run.final_cmd import run_final_cmd
+    from .utils.run.scheduler import TaskGraph
+    from .utils.run.subproc import set_max_concurrent_commands
+    from .utils.value_from import RESOLVER
+
     k8s_distros = USR_CFG['k8s_distros']
 
     # if we have bitwarden credetials unlock the vault
     if bitwarden_credentials:
-        strat = USR_CFG['smol_k8s_lab']['local_password_manager']['duplicate_strategy']
-        bw = BwCLI(**bitwarden_credentials, duplicate_strategy=strat)
+        password_manager = USR_CFG['smol_k8s_lab']['local_password_manager']
+        strat = password_manager['duplicate_strategy']
+        bw = BwCLI(**bitwarden_credentials,
+                   duplicate_strategy=strat,
+                   serve=password_manager.get('serve', False))
         bw.unlock()
     else:
         bw = None
@@ -202,6 +239,11 @@ def main(config: str = "",
     # this is a dict of all the apps we can install
     apps = USR_CFG['apps']
 
+    # look up every secret in the config of enabled apps before we start
+    RESOLVER.bitwarden = bw
+    RESOLVER.prefetch({app: app_cfg for app, app_cfg in apps.items()
+                       if app_cfg.get('enabled', False)})
+
     # check immediately if metallb is enabled
     metallb_enabled = apps['metallb']['enabled']
     # check immediately if cilium is enabled
@@ -214,6 +256,36 @@ def main(config: str = "",
             selected_distro = distro
             break
 
+    # look up the chart versions of the enabled base apps at once
+    use_chart_version_lockfile(
+            USR_CFG['smol_k8s_lab'].get('lock_chart_versions', False))
+    set_helm_repo_max_age(USR_CFG['smol_k8s_lab'].get('helm_repo_max_age', 3600))
+    base_appsets = {'cilium': 'cilium',
+                    'cert_manager': 'cert-manager',
+                    'argo_cd': 'argo-cd'}
+    # kind gets ingress-nginx from a manifest, not the helm chart
+    if selected_distro != 'kind':
+        base_appsets['ingress_nginx'] = 'ingress-nginx'
+    chart_appsets = [appset for app, appset in base_appsets.items()
+                     if apps.get(app, {}).get('enabled', False)]
+    if (apps['argo_cd']['enabled'] and
+            apps['argo_cd']['argo']['directory_recursion']):
+        chart_appsets.append('appset-secret-plugin')
+    prefetch_chart_versions(chart_appsets)
+
+    # and download the manifests we'll apply, at once: metallb's, kind's
+    # ingress-nginx, and the ones the restores of the enabled apps use
+    manifests = restore_manifest_urls(apps, bitwarden=bool(bw))
+    if selected_distro == 'kind' and apps['ingress_nginx']['enabled']:
+        manifests.append(KIND_MANIFEST_URL)
+    if metallb_enabled:
+        try:
+            manifests.append(metallb_manifest_url())
+        except Exception as e:
+            # we'll try again, and report it properly, when we install metallb
+            log.debug(f"Couldn't look up the metallb manifest to prefetch: {e}")
+    manifest_cache.prefetch(manifests)
+
     # install the actual KIND, k3s, or k3d cluster
     k8s_obj = create_k8s_distro(cluster_name, selected_distro, metadata,
                                 metallb_enabled, cilium_enabled)
@@ -231,6 +303,12 @@ def main(config: str = "",
     # check if argo is enabled
     argo_enabled = apps['argo_cd']['enabled']
 
+    # how many apps (and base helm charts) we install at the same time
+    if not max_parallel:
+        max_parallel = USR_CFG['smol_k8s_lab'].get('max_parallel', 1)
+    set_max_concurrent_commands(
+            USR_CFG['smol_k8s_lab'].get('max_concurrent_commands', 8))
+
     # installs all the base apps: metallb/cilium, ingess-nginx, cert-manager, and argocd
     argocd = setup_base_apps(k8s_obj,
                              distro,
@@ -241,19 +319,11 @@ def main(config: str = "",
                              apps.get('cnpg_operator', {}),
                              apps['argo_cd'],
                              SECRETS,
-                             bw)
+                             bw,
+                             max_parallel)
 
     # 🦑 Install Argo CD: continuous deployment app for k8s
     if argo_enabled:
-        # setup k8s secrets management and secret stores
-        setup_k8s_secrets_management(argocd,
-                                     distro,
-                                     apps.pop('external_secrets_operator', {}),
-                                     SECRETS['global_external_secrets'],
-                                     apps.pop('infisical', {}),
-                                     apps.pop('vault', {}),
-                                     bw)
-
         # if the global cluster issuer is set to letsencrypt-staging don't
         # verify TLS certs in requests to APIs
         if 'staging' in SECRETS['global_cluster_issuer']:
@@ -261,134 +331,165 @@ def main(config: str = "",
         else:
             api_tls_verify = True
 
-        # Setup minio, our local s3 provider, is essential for creating buckets
-        # and cnpg operator, our postgresql operator for creating postgres clusters
-        setup_operators(argocd,
-                        apps.pop('prometheus_crds', {'enabled': False}),
-                        apps.pop('longhorn', {'enabled': False}),
-                        apps.pop('k8up', {'enabled': False}),
-                        apps.pop('minio_operator', {'enabled': False}),
-                        apps.pop('seaweedfs', {'enabled': False}),
-                        apps.pop('cnpg_operator', {'enabled': False}),
-                        apps.pop('postgres_operator', {'enabled': False}),
-                        apps.pop('openbao', {'enabled': False}),
-                        bw)
-
         # global pvc storage class
         pvc_storage_class = SECRETS.get('global_pvc_storage_class', 'local-path')
 
         # check if zitadel is enabled
         zitadel_enabled = apps['zitadel']['enabled']
 
-        # setup OIDC for securing all endpoints with SSO
-        oidc_obj = setup_oidc_provider(argocd,
-                                       api_tls_verify,
-                                       apps.pop('zitadel', {}),
-                                       apps.pop('vouch', {}),
-                                       pvc_storage_class,
-                                       bw,
-                                       SECRETS['argo_cd_hostname'])
-
         # we need this for all the oidc apps we need to create
         zitadel_hostname = SECRETS.get('zitadel_hostname', "")
 
+        # every step below runs as soon as the steps it requires are done
+        graph = TaskGraph(max_parallel)
+
+        # setup k8s secrets management and secret stores
+        eso_dict = apps.pop('external_secrets_operator', {})
+        infisical_dict = apps.pop('infisical', {})
+        vault_dict = apps.pop('vault', {})
+        graph.add('secrets_management',
+                  lambda: setup_k8s_secrets_management(
+                      argocd,
+                      distro,
+                      eso_dict,
+                      SECRETS['global_external_secrets'],
+                      infisical_dict,
+                      vault_dict,
+                      bw))
+
+        # Setup minio, our local s3 provider, is essential for creating buckets
+        # and cnpg operator, our postgresql operator for creating postgres
+        # clusters, and k8up for backups
+        operators = [apps.pop('prometheus_crds', {'enabled': False}),
+                     apps.pop('longhorn', {'enabled': False}),
+                     apps.pop('k8up', {'enabled': False}),
+                     apps.pop('minio_operator', {'enabled': False}),
+                     apps.pop('seaweedfs', {'enabled': False}),
+                     apps.pop('cnpg_operator', {'enabled': False}),
+                     apps.pop('postgres_operator', {'enabled': False}),
+                     apps.pop('openbao', {'enabled': False})]
+        graph.add('operators',
+                  lambda: setup_operators(argocd, *operators, bw),
+                  ['secrets_management'])
+
+        # setup OIDC for securing all endpoints with SSO
+        zitadel_dict = apps.pop('zitadel', {})
+        vouch_dict = apps.pop('vouch', {})
+        graph.add('oidc',
+                  lambda: setup_oidc_provider(argocd,
+                                              api_tls_verify,
+                                              zitadel_dict,
+                                              vouch_dict,
+                                              pvc_storage_class,
+                                              bw,
+                                              SECRETS['argo_cd_hostname']),
+                  ['operators'])
+
+        def oidc_obj():
+            return graph.results.get('oidc', None)
+
         # setup netmaker, a wireguard vpn management web interface
         netmaker_dict = apps.pop('netmaker', {'enabled': False})
         # only do this if the user has smol-k8s-lab init enabled
         if netmaker_dict['enabled']:
-            configure_netmaker(argocd,
-                               netmaker_dict,
-                               'zitadel',
-                               zitadel_hostname,
-                               bw,
-                               oidc_obj)
+            graph.add('netmaker',
+                      lambda: configure_netmaker(argocd,
+                                                 netmaker_dict,
+                                                 'zitadel',
+                                                 zitadel_hostname,
+                                                 bw,
+                                                 oidc_obj()),
+                      ['oidc'])
 
         # this is currently just to make sure that grafana zitadel auth gets set up
         prometheus_stack = apps.pop('prometheus', {'enabled': False})
         if prometheus_stack['enabled']:
-            configure_prometheus_stack(argocd, prometheus_stack, oidc_obj, bw)
+            graph.add('prometheus',
+                      lambda: configure_prometheus_stack(
+                          argocd, prometheus_stack, oidc_obj(), bw),
+                      ['operators', 'oidc'])
 
         grafana_stack = apps.pop('grafana_stack', {'enabled': False})
         if grafana_stack['enabled']:
-            configure_grafana_stack(argocd, grafana_stack, oidc_obj, bw)
+            graph.add('grafana_stack',
+                      lambda: configure_grafana_stack(
+                          argocd, grafana_stack, oidc_obj(), bw),
+                      ['operators', 'oidc'])
 
         tempo = apps.pop('tempo', {'enabled': False})
         if tempo['enabled']:
-            configure_tempo(argocd, tempo, bw)
+            graph.add('tempo',
+                      lambda: configure_tempo(argocd, tempo, bw),
+                      ['operators'])
 
-        # set up self hosted translation
+        # set up self hosted translation, mastodon needs the api key from this
         libre_translate_dict = apps.pop('libre_translate', {'enabled': False})
         if libre_translate_dict['enabled']:
-            libretranslate_api_key = configure_libretranslate(
-                    argocd, libre_translate_dict, bw
-                    )
-        else:
-            libretranslate_api_key = ""
-
-        # setup nextcloud, home assistant, mastodon, gotosocial, and matrix
-        asyncio.run(
-                setup_federated_apps(
-                    argocd,
-                    api_tls_verify,
-                    apps.pop('forgejo', {}),
-                    apps.pop('ghost', {}),
-                    apps.pop('harbor', {}),
-                    apps.pop('jellyfin', {}),
-                    apps.pop('home_assistant', {}),
-                    apps.pop('nextcloud', {}),
-                    apps.pop('mastodon', {}),
-                    apps.pop('gotosocial', {}),
-                    apps.pop('matrix', {}),
-                    apps.pop('peertube', {}),
-                    apps.pop('writefreely', {}),
-                    pvc_storage_class,
-                    zitadel_hostname,
-                    oidc_obj,
-                    libretranslate_api_key,
-                    bw
-                    )
-                )
+            graph.add('libre_translate',
+                      lambda: configure_libretranslate(
+                          argocd, libre_translate_dict, bw),
+                      ['operators'])
+
+        # setup nextcloud, home assistant, mastodon, gotosocial, matrix, etc
+        add_federated_apps(graph,
+                           argocd,
+                           apps,
+                           api_tls_verify,
+                           pvc_storage_class,
+                           bw)
 
         # stand alone valkey
         if apps.get('valkey'):
-            configure_valkey(argocd, apps.pop('valkey'), bw)
+            valkey_dict = apps.pop('valkey')
+            graph.add('valkey',
+                      lambda: configure_valkey(argocd, valkey_dict, bw),
+                      ['secrets_management'])
 
         if apps.get('valkey_cluster'):
-            configure_valkey(argocd, apps.pop('valkey_cluster'), bw)
+            valkey_cluster_dict = apps.pop('valkey_cluster')
+            graph.add('valkey_cluster',
+                      lambda: configure_valkey(argocd, valkey_cluster_dict, bw),
+                      ['secrets_management'])
 
         if apps.get('juicefs'):
-            asyncio.run(
-                    setup_storage_apps(
-                        argocd=argocd,
-                        juicefs_dict=apps['juicefs'],
-                        pvc_storage_class=pvc_storage_class,
-                        bw=bw
-                        )
-                    )
+            graph.add('juicefs',
+                      lambda: setup_storage_apps(
+                          argocd=argocd,
+                          juicefs_dict=apps['juicefs'],
+                          pvc_storage_class=pvc_storage_class,
+                          bw=bw),
+                      ['operators'])
 
         # we support creating a default minio tenant with oidc enabled
-        # we set it up here in case other apps rely on it
+        # the rest of the Argo CD apps wait on it, in case they rely on it
         minio_tenant_config = apps.pop('minio_tenant', {})
         if minio_tenant_config and minio_tenant_config.get('enabled', False):
-            configure_minio_tenant(argocd,
-                                   minio_tenant_config,
-                                   api_tls_verify,
-                                   zitadel_hostname,
-                                   oidc_obj,
-                                   bw)
+            graph.add('minio_tenant',
+                      lambda: configure_minio_tenant(argocd,
+                                                     minio_tenant_config,
+                                                     api_tls_verify,
+                                                     zitadel_hostname,
+                                                     oidc_obj(),
+                                                     bw),
+                      ['operators', 'oidc'])
 
         # after argocd, zitadel, bweso, and vouch are up, we install all apps
         # as Argo CD Applications
-        header("Installing the rest of the Argo CD apps")
-        for app_key, app_meta in apps.items():
-            if app_meta['enabled']:
-                argo_app = app_key.replace('_', '-')
-                sub_header(f"Installing app: {argo_app}")
-                argocd.install_app(argo_app, app_meta['argo'])
-
-        # lock the bitwarden vault on the way out, to be polite :3
-        if bw:
-            bw.lock()
+        graph.add('remaining_apps',
+                  lambda: install_apps(argocd, apps, max_parallel),
+                  ['secrets_management', 'operators', 'oidc', 'juicefs',
+                   'minio_tenant'])
+
+        # we write appset secret vars in batches, right before they're needed
+        try:
+            with argocd.batch_appset_secret():
+                graph.run()
+        finally:
+            graph.print_report()
+            # lock the bitwarden vault on the way out, to be polite :3, and so
+            # bw serve isn't left running with it unlocked if a step failed
+            if bw:
+                bw.lock()
 
     # we're done :D
     print("")
@@ -12,16 +12,26 @@ Example:
                         password="fakepassword")
         bw.lock()
 """
+import atexit
 import base64
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging as log
+import requests
 from rich.prompt import Prompt
 from shutil import which
+from subprocess import Popen, DEVNULL
 from sys import exit
 from os import environ as env
+from threading import Lock
+from time import sleep, monotonic
+from ..utils.run.scheduler import call_in_main_thread
 from ..utils.run.subproc import subproc
 from .tui.bitwarden_existing_item_app import AskUserForDuplicateStrategy
 
+# seconds we trust our index of the vault before we sync and list it again
+VAULT_INDEX_TTL = 300
+
 
 def create_custom_field(custom_field_name: str, value: str) -> dict:
    """
@@ -40,11 +50,17 @@ class BwCLI():
     Python Wrapper for the Bitwarden cli
     """
     def __init__(self, password: str, client_id: str, client_secret: str,
-                 duplicate_strategy: str = "ask"):
+                 duplicate_strategy: str = "ask",
+                 serve: bool = False,
+                 serve_port: int = 8087):
         """
         for storing the session token, credentials, and duplicate_strategy
 
         duplicate_strategy: str, must be one of: edit, ask, duplicate, no_action
+        serve:              bool, if True, we start "bw serve" on localhost when
+                            we unlock the vault, and use its REST API instead of
+                            running bw for every operation
+        serve_port:         int, localhost port for "bw serve" to listen on
         """
         self.bw_path = str(which("bw"))
         log.debug(f"self.bw_path is {self.bw_path}")
@@ -73,11 +89,114 @@ class BwCLI():
         self.client_secret = client_secret
         self.duplicate_strategy = duplicate_strategy
 
+        # "bw serve" process and http session, see start_serve()
+        self.serve = serve
+        self.serve_url = f"http://127.0.0.1:{serve_port}"
+        self.serve_process = None
+        self.session = None
+
+        # index of every item in the vault, see refresh_index()
+        self._items_by_id = None
+        self._items_by_name = {}
+        self._index_time = 0.0
+        self._index_lock = Lock()
+
+        # apps may be set up at the same time, but the bw cli keeps the vault
+        # in a local file, so we only ever run one bw sync/create/edit at a time
+        self._cli_lock = Lock()
+
+    def start_serve(self, timeout: int = 30) -> bool:
+        """
+        start "bw serve" on localhost with our session, and wait till it
+        answers. Returns True if it's up, else False, and we use the cli
+        """
+        log.info(f"Starting bw serve on {self.serve_url}")
+        port = self.serve_url.split(":")[-1]
+        try:
+            self.serve_process = Popen([self.bw_path, "serve",
+                                        "--hostname", "127.0.0.1",
+                                        "--port", port],
+                                       env=self.env,
+                                       stdout=DEVNULL,
+                                       stderr=DEVNULL)
+        except Exception as e:
+            log.warning(f"Couldn't start bw serve, so we'll use the bw cli: {e}")
+            return False
+        # bw serve answers anyone on localhost with our unlocked vault, so
+        # make sure it never outlives us, even if we crash or are interrupted
+        atexit.register(self.stop_serve)
+
+        # keep-alive session, so we reuse one connection for every request
+        self.session = requests.Session()
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            if self.serve_process.poll() is not None:
+                break
+            try:
+                self._api("get", "/status")
+                log.debug("bw serve is up")
+                return True
+            except Exception:
+                sleep(0.5)
+
+        log.warning("bw serve didn't start, so we'll use the bw cli instead")
+        self.stop_serve()
+        with self._index_lock:
+            self._items_by_id = None
+        return False
+
+    def stop_serve(self) -> None:
+        """
+        stop "bw serve" if we started it
+        """
+        if self.serve_process:
+            self.serve_process.terminate()
+            try:
+                self.serve_process.wait(timeout=10)
+            except Exception:
+                self.serve_process.kill()
+            self.serve_process = None
+            atexit.unregister(self.stop_serve)
+        if self.session:
+            self.session.close()
+            self.session = None
+
+    def _api(self, method: str, path: str, **kwargs):
+        """
+        make a request to the "bw serve" Vault Management API and return the
+        data from the response. Raises an exception if it wasn't successful
+        """
+        response = self.session.request(method, self.serve_url + path,
+                                        timeout=60, **kwargs)
+        body = response.json()
+        if not response.ok or not body.get("success", False):
+            raise RuntimeError(f"bw serve {method} {path} failed: "
+                               f"{body.get('message', response.status_code)}")
+        return body.get("data", {})
+
+    def _serving(self) -> bool:
+        return self.session is not None
+
+    def _serve_fallback(self, action: str, error: Exception) -> None:
+        """
+        log that bw serve failed us, before we try the cli instead
+        """
+        log.debug(f"Could not {action} via bw serve, so we'll use the bw cli "
+                  f"instead. Error was: {error}")
+
     def sync(self) -> None:
         """
         syncs your bitwaren vault on initialize of this class
         """
-        res = subproc([f"{self.bw_path} sync"], env=self.env)
+        if self._serving():
+            try:
+                log.info(self._api("post", "/sync").get("title", "Syncing complete."))
+                return
+            except Exception as e:
+                self._serve_fallback("sync", e)
+
+        with self._cli_lock:
+            res = subproc([f"{self.bw_path} sync"], env=self.env)
         log.info(res)
 
     def __get_credential__(self, credential: str) -> str:
@@ -92,6 +211,12 @@ class BwCLI():
         generate a new password. Takes special_characters bool.
         """
         log.info('Checking if you are logged in...')
+        if self._serving():
+            try:
+                return self._api("get", "/status")['template']['status']
+            except Exception as e:
+                self._serve_fallback("get status", e)
+
         return json.loads(subproc(["bw status"], env=self.env))['status']
 
     def unlock(self) -> None:
@@ -133,6 +258,16 @@ class BwCLI():
             log.info(f"[green]bw status[/] returned '{status}', so we won't "
                      "unlock the Bitwarden vault before starting.")
 
+        if self.serve:
+            self.start_serve()
+
+        # one listing of the whole vault, instead of a sync for every item
+        try:
+            self.refresh_index(sync_first=False)
+        except Exception as e:
+            log.debug(f"Couldn't index the Bitwarden vault, so we'll look up "
+                      f"each item instead. Error was: {e}")
+
     def lock(self) -> None:
         """
         lock bitwarden vault, only if the user didn't have a session env var,
@@ -140,19 +275,41 @@ class BwCLI():
         """
         if self.delete_session:
             log.info('Locking the Bitwarden vault...')
-            subproc([f"{self.bw_path} lock"], env=self.env)
+            locked = False
+            if self._serving():
+                try:
+                    self._api("post", "/lock")
+                    locked = True
+                except Exception as e:
+                    self._serve_fallback("lock", e)
+            if not locked:
+                subproc([f"{self.bw_path} lock"], env=self.env)
             log.info('Bitwarden vault locked.')
         else:
             log.debug("We didn't lock the Bitwarden vault when we were done, "
                       "because we didn't set the BW_SESSION env var, so we don't"
                       " want to be rude.")
 
+        self.stop_serve()
+
     def generate(self, special_characters: bool = False) -> str:
         """
         generate a new password. Takes special_characters bool.
         """
         log.debug('Generating a new password...')
 
+        if self._serving():
+            params = {"length": 32, "uppercase": "true", "lowercase": "true",
+                      "number": "true"}
+            if special_characters:
+                params["special"] = "true"
+            try:
+                password = self._api("get", "/generate", params=params)['data']
+                log.debug('New password generated.')
+                return password
+            except Exception as e:
+                self._serve_fallback("generate a password", e)
+
         command = "bw generate --length 32 --uppercase --lowercase --number"
         if special_characters:
             command += " --special"
@@ -161,17 +318,105 @@ class BwCLI():
         log.debug('New password generated.')
         return password
 
+    def _list_items(self) -> list:
+        """
+        returns every item in the vault
+        """
+        if self._serving():
+            try:
+                return self._api("get", "/list/object/items")['data']
+            except Exception as e:
+                self._serve_fallback("list items", e)
+
+        return json.loads(subproc([f"{self.bw_path} list items"],
+                                  quiet=True, env=self.env))
+
+    def refresh_index(self, sync_first: bool = True) -> None:
+        """
+        (re)build our index of the vault, by item name and id, from a single
+        listing of every item. Syncs the vault first, unless told otherwise
+        """
+        with self._index_lock:
+            if sync_first:
+                self.sync()
+            items = self._list_items()
+            self._items_by_id = {}
+            self._items_by_name = {}
+            for item in items:
+                self._add_to_index(item)
+            self._index_time = monotonic()
+            log.debug(f"Indexed {len(items)} Bitwarden items")
+
+    def _add_to_index(self, item: dict) -> None:
+        """
+        add (or replace) an item in our index. Call with self._index_lock held
+        """
+        old_item = self._items_by_id.get(item['id'])
+        if old_item:
+            same_name = self._items_by_name.get(old_item['name'], [])
+            self._items_by_name[old_item['name']] = [
+                    i for i in same_name if i['id'] != item['id']]
+        self._items_by_id[item['id']] = item
+        self._items_by_name.setdefault(item['name'], []).append(item)
+
+    def _update_index(self, item: dict) -> None:
+        """
+        record an item we just created or edited, if we have an index
+        """
+        with self._index_lock:
+            if self._items_by_id is not None:
+                self._add_to_index(item)
+
+    def _indexed_items(self, item_name: str, check_ttl: bool) -> list|None:
+        """
+        returns the indexed items with item_name as their name or id, or None
+        if we have no index to ask
+        """
+        if self._items_by_id is None:
+            return None
+        if check_ttl and monotonic() - self._index_time > VAULT_INDEX_TTL:
+            try:
+                self.refresh_index()
+            except Exception as e:
+                log.debug(f"Couldn't refresh the Bitwarden vault index: {e}")
+                return None
+
+        with self._index_lock:
+            if item_name in self._items_by_id:
+                return [self._items_by_id[item_name]]
+            return list(self._items_by_name.get(item_name, []))
+
     def get_item(self, item_name: str, sync_first: bool = True) -> list:
         """
         Get Item and return False if it does not exist else return the item ID
 
         Required Args:
             - item_name: str of name of item
+        Optional Args:
+            - sync_first: bool, if True and our index of the vault is older
+                          than VAULT_INDEX_TTL, sync the vault first
         """
+        # answer from our index of the vault, if we have one
+        items = self._indexed_items(item_name, sync_first)
+        if items is not None:
+            if not items:
+                log.debug(f"No Bitwarden item called {item_name}")
+                return False, None
+            if len(items) > 1:
+                log.debug(f"found more than 1 entry for {item_name}: {items}")
+                return self._ask_about_duplicates(items, item_name)
+            return items[0], self.duplicate_strategy
+
         # always sync vault before checking anything, unless otherwise stated
         if sync_first:
             self.sync()
 
+        if self._serving():
+            try:
+                return self._serve_get_item(item_name)
+            except Exception as e:
+                self._serve_fallback(f"get item {item_name}", e)
+
         # go get the actual item
         response = json.loads(
                 subproc([f'{self.bw_path} get item {item_name} --response'],
@@ -198,21 +443,59 @@ class BwCLI():
                 list_for_dialog.append(self.get_item(id)[0])
 
             # ask the user what to do
-            user_response = AskUserForDuplicateStrategy(list_for_dialog,
-                                                        item_name).run()
+            return self._ask_about_duplicates(list_for_dialog, item_name)
+        else:
+            return response['data'], self.duplicate_strategy
 
-            action = user_response[0]
-            always_do_action = user_response[1]
-            item = user_response[2]
+    def _serve_get_item(self, item_name: str) -> list:
+        """
+        get_item via bw serve. Like "bw get item", we look for items with
+        exactly this name or id, and ask the user what to do if there's more
+        than one
+        """
+        found = self._api("get", "/list/object/items",
+                          params={"search": item_name})['data']
+        items = [item for item in found
+                 if item_name in (item.get('name'), item.get('id'))]
 
-            # if they always want to do this, then set self.duplicate_strategy
-            if always_do_action:
-                # NOTE: we still always ask if there's more than 1 entry returned
-                self.duplicate_strategy = action
+        if not items:
+            log.debug(f"No Bitwarden item called {item_name}")
+            return False, None
 
+        if len(items) > 1:
+            log.debug(f"found more than 1 entry for {item_name}: {items}")
+            item, action = self._ask_about_duplicates(items, item_name)
             return item, action
-        else:
-            return response['data'], self.duplicate_strategy
+
+        return items[0], self.duplicate_strategy
+
+    def _ask_about_duplicates(self, items: list, item_name: str) -> tuple:
+        """
+        ask the user what to do about several items with the same name, and
+        returns the item they chose and the action to take
+        """
+        user_response = self._ask_user(items, item_name)
+
+        action = user_response[0]
+        always_do_action = user_response[1]
+        item = user_response[2]
+
+        # if they always want to do this, then set self.duplicate_strategy
+        if always_do_action:
+            # NOTE: we still always ask if there's more than 1 entry returned
+            self.duplicate_strategy = action
+
+        return item, action
+
+    def _ask_user(self, item, item_name: str) -> list:
+        """
+        ask the user what to do about an existing item, with a Textual app.
+        Apps may be set up in worker threads, but Textual apps have to run in
+        the main thread, so that's where we ask
+        """
+        return call_in_main_thread(
+                lambda: AskUserForDuplicateStrategy(item, item_name).run()
+                )
 
     def create_login(self,
                      name: str = "",
@@ -238,16 +521,97 @@ class BwCLI():
 
         Returns string of the item id created or updated
         """
-        # don't edit anything by default
-        edit = False
+        item_name, item, edit, skip = self._plan_login(name, item_url, strategy)
+        if skip:
+            return
+
+        return self._save_login(item_name, item, edit, item_url, user,
+                                password, fields, org, collection)
 
-        # fix naming for bitwarden items to inlude the url AND name
+    def create_logins(self, logins: dict, max_parallel: int = 4) -> dict:
+        """
+        Create many login items at once. Takes a dict of {key: create_login
+        kwargs} and returns a dict of {key: item id}, e.g.
+
+            ids = bw.create_logins({
+                "smtp": {"name": "app-smtp-credentials", "item_url": hostname,
+                         "user": user, "password": password},
+                "db": {"name": "app-pgsql-credentials", "item_url": hostname,
+                       "user": "app", "password": bw.generate()}
+                })
+
+        We check every item against the vault index and apply the duplicate
+        strategy up front, one item at a time, since "ask" needs the user.
+        Then we write the items, max_parallel at a time if we're using bw
+        serve. The bw cli keeps the vault in a local file, so with the cli we
+        write one item at a time, even across threads.
+        """
+        # logins with the same item name would be the same vault item
+        by_item_name = {}
+        for key, login in logins.items():
+            item_name = self._item_name(login.get('name', ""),
+                                        login.get('item_url', ""))
+            by_item_name.setdefault(item_name, []).append(key)
+        for item_name, keys in by_item_name.items():
+            if len(keys) > 1:
+                log.warning(f"{keys} are all the Bitwarden item {item_name}, "
+                            f"so we'll only save the one for {keys[-1]}")
+
+        # resolve duplicates in this thread, in order
+        writes = {}
+        ids = {}
+        for item_name, keys in by_item_name.items():
+            login = dict(logins[keys[-1]])
+            strategy = login.pop('strategy', None)
+            _, item, edit, skip = self._plan_login(login.get('name', ""),
+                                                   login.get('item_url', ""),
+                                                   strategy)
+            if skip:
+                for key in keys:
+                    ids[key] = None
+            else:
+                writes[item_name] = (keys, item, edit, login)
+
+        def save(item_name: str, item: dict, edit: bool, login: dict) -> str:
+            return self._save_login(item_name, item, edit,
+                                    login.get('item_url', ""),
+                                    login.get('user', ""),
+                                    login.get('password', ""),
+                                    login.get('fields', []),
+                                    login.get('org', None),
+                                    login.get('collection', None))
+
+        workers = max(1, max_parallel) if self._serving() else 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {item_name: pool.submit(save, item_name, item, edit, login)
+                       for item_name, (_, item, edit, login) in writes.items()}
+            for item_name, future in futures.items():
+                for key in writes[item_name][0]:
+                    ids[key] = future.result()
+
+        return {key: ids[key] for key in logins}
+
+    def _item_name(self, name: str, item_url: str) -> str:
+        """
+        fix naming for bitwarden items to inlude the url AND name
+        """
         if name:
             item_name = name
             if item_url:
                 item_name += f"-{item_url}"
         else:
             item_name = item_url
+        return item_name
+
+    def _plan_login(self, name: str, item_url: str, strategy: str = None) -> tuple:
+        """
+        checks for existing items and decides what to do about them, using the
+        duplicate strategy. Returns (item_name, existing item or False, if we
+        should edit that item, if we should skip saving the item entirely)
+        """
+        # don't edit anything by default
+        edit = False
+        item_name = self._item_name(name, item_url)
 
         # go check for existing items
         item_res = self.get_item(item_name)
@@ -258,8 +622,7 @@ class BwCLI():
 
         if item:
             if strategy == "ask":
-                user_response = AskUserForDuplicateStrategy(item,
-                                                            item_name).run()
+                user_response = self._ask_user(item, item_name)
                 strategy = user_response[0]
 
                 # if the user set "always do this action"
@@ -286,8 +649,24 @@ class BwCLI():
                     "will not replace or edit it nor will we create a new item."
                     f"item: {item}"
                     )
-                return
-
+                return item_name, item, edit, True
+
+        return item_name, item, edit, False
+
+    def _save_login(self,
+                    item_name: str,
+                    item: dict,
+                    edit: bool,
+                    item_url: str = "",
+                    user: str = "",
+                    password: str = "",
+                    fields: list = [],
+                    org: str = None,
+                    collection: str = None) -> str:
+        """
+        create a new login item, or edit the existing item if edit is True.
+        Returns string of the item id created or updated
+        """
         # create new item
         if not edit:
             if item:
@@ -296,7 +675,7 @@ class BwCLI():
             else:
                 log.info(f'Creating Bitwarden login item "{item_name}"')
 
-            login_obj = json.dumps({
+            login_item = {
                 "organizationId": org,
                 "collectionIds": collection,
                 "folderId": None,
@@ -313,7 +692,8 @@ class BwCLI():
                 "secureNote": None,
                 "card": None,
                 "identity": None,
-                "reprompt": 0})
+                "reprompt": 0}
+            login_obj = json.dumps(login_item)
 
             encodedBytes = base64.b64encode(login_obj.encode("utf-8"))
             encodedStr = str(encodedBytes, "utf-8")
@@ -333,11 +713,28 @@ class BwCLI():
             cmd = f"{self.bw_path} edit item {item['id']} {encodedStr}"
 
 
+        # edit OR create the item via bw serve, if we can
+        if self._serving():
+            try:
+                if edit:
+                    saved_item = self._api("put", f"/object/item/{item['id']}",
+                                           json=item)
+                else:
+                    saved_item = self._api("post", "/object/item", json=login_item)
+                self._update_index(saved_item)
+                return saved_item['id']
+            except Exception as e:
+                self._serve_fallback(f"save item {item_name}", e)
+
         # edit OR create the item
-        bitwarden_return_item = subproc([cmd + " --response"], quiet=True, env=self.env)
+        with self._cli_lock:
+            bitwarden_return_item = subproc([cmd + " --response"], quiet=True,
+                                            env=self.env)
         log.debug(bitwarden_return_item)
+        saved_item = json.loads(bitwarden_return_item)['data']
+        self._update_index(saved_item)
 
         if edit:
             return item['id']
         else:
-            return json.loads(bitwarden_return_item)['data']['id']
+            return saved_item['id']
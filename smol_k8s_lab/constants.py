@@ -2,15 +2,19 @@
 """
 NAME: constants.py
 DESC: everything to do with initial configuration of a new environment
+
+Importing this module is cheap and has no side effects: the config files,
+the version, and the speech files are only loaded the first time they're
+used, via the module level __getattr__ below (PEP 562).
 """
 
 from getpass import getuser
-from importlib.metadata import version as get_version
-from os import environ, path, uname, makedirs
+from hashlib import sha256
+import logging as log
+from os import environ, path, uname, makedirs, replace
+import pickle
 from pathlib import Path
-from ruamel.yaml import YAML
 from shutil import copyfile
-import tarfile
 from xdg_base_dirs import xdg_cache_home, xdg_config_home
 
 # env
@@ -29,8 +33,6 @@ PWD = path.dirname(__file__)
 
 # for smol-k8s-lab configs and cache
 XDG_CACHE_DIR = path.join(xdg_cache_home(), 'smol-k8s-lab')
-# make sure the cache directory exists (typically ~/.cache/smol-k8s-lab)
-Path(XDG_CACHE_DIR).mkdir(exist_ok=True)
 XDG_CONFIG_DIR = path.join(xdg_config_home(), 'smol-k8s-lab')
 XDG_CONFIG_FILE = path.join(xdg_config_home(), 'smol-k8s-lab/config.yaml')
 
@@ -39,56 +41,135 @@ XDG_KUBE_FILE = path.join(xdg_config_home(), 'kube/config')
 # default to ~/.config/kube/config if no KUBECONFIG or XDG_CONFIG set
 KUBECONFIG = environ.get("KUBECONFIG", XDG_KUBE_FILE)
 KUBE_DIR = path.dirname(KUBECONFIG)
-# create the directory if it doesn't exist
-Path(KUBE_DIR).mkdir(exist_ok=True)
 
-# version of smol-k8s-lab
-VERSION = get_version('smol-k8s-lab')
 # grabs the default packaged config file from default dot files
 DEFAULT_CONFIG_FILE = path.join(PWD, 'config/default_config.yaml')
 
+# sets the default speech files and loads them for each language
+# if you don't see your language, please submit a PR :)
+SPEECH_TEXT = path.join(PWD, 'config/audio')
+
+
+def ensure_dirs() -> None:
+    """
+    make sure the cache directory (typically ~/.cache/smol-k8s-lab) and the
+    directory of the kubeconfig exist
+    """
+    Path(XDG_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+    Path(KUBE_DIR).mkdir(parents=True, exist_ok=True)
+
+
+# parsed yaml files, pickled, so we only parse each version of a file once
+CONFIG_CACHE_DIR = path.join(XDG_CACHE_DIR, 'config')
+
+
+def _config_cache_file(yaml_config_file: str) -> str:
+    name = sha256(path.abspath(yaml_config_file).encode('utf-8')).hexdigest()
+    return path.join(CONFIG_CACHE_DIR, name + '.pickle')
+
+
 def load_yaml(yaml_config_file=XDG_CONFIG_FILE):
     """
     load config yaml files for smol-k8s-lab and return as dicts
+
+    The dicts are the same round trip ruamel.yaml objects (with comments) we'd
+    get from parsing the file, but we keep a pickled copy of them per file,
+    keyed by the file's contents and the versions of smol-k8s-lab and
+    ruamel.yaml, and only parse the file again when one of those changes.
     """
     # create default pathing and config file if it doesn't exist
     if not path.exists(yaml_config_file):
         Path(XDG_CONFIG_DIR).mkdir(parents=True, exist_ok=True)
         copyfile(DEFAULT_CONFIG_FILE, XDG_CONFIG_FILE)
 
+    with open(yaml_config_file, 'rb') as yaml_file:
+        contents = yaml_file.read()
+
+    from ruamel.yaml import YAML, __version__ as ruamel_version
+    key = sha256(contents + f"{__getattr__('VERSION')}"
+                            f"{ruamel_version}".encode('utf-8')).hexdigest()
+
+    cache_file = _config_cache_file(yaml_config_file)
+    try:
+        with open(cache_file, 'rb') as cache:
+            # the key comes first, so we don't unpickle stale configs
+            if pickle.load(cache) == key:
+                return pickle.load(cache)
+    except Exception as e:
+        log.debug(f"No cached copy of {yaml_config_file}: {e}")
+
     yaml = YAML()
-    # open the yaml config file and then return the dict
-    with open(yaml_config_file, 'r') as yaml_file:
-        return yaml.load(yaml_file)
+    # parse the yaml config file and then return the dict
+    config = yaml.load(contents.decode('utf-8'))
 
+    try:
+        Path(CONFIG_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        with open(cache_file + '.tmp', 'wb') as cache:
+            pickle.dump(key, cache, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(config, cache, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(cache_file + '.tmp', cache_file)
+    except Exception as e:
+        log.debug(f"Couldn't cache {yaml_config_file}: {e}")
 
-DEFAULT_CONFIG = load_yaml(DEFAULT_CONFIG_FILE)
-INITIAL_USR_CONFIG = load_yaml()
+    return config
 
-# sets the default speech files and loads them for each language
-# if you don't see your language, please submit a PR :)
-SPEECH_TEXT = path.join(PWD, 'config/audio')
 
-# we default save all generated speech files to your XDG_DATA_HOME env var
-SPEECH_MP3_DIR = path.join(PWD, 'audio')
-en_dir = path.join(SPEECH_MP3_DIR, 'en')
-if not path.exists(en_dir):
-    # create the dirs
-    makedirs(en_dir, exist_ok=True)
-    # open file
-    file = tarfile.open(path.join(SPEECH_MP3_DIR, "audio-en.tar.gz"))
-    # extract files
-    file.extractall(SPEECH_MP3_DIR)
-    # close file
-    file.close()
-
-DEFAULT_DISTRO_OPTIONS = DEFAULT_CONFIG['k8s_distros']
-
-if 'Darwin' in OS[0]:
-    # macOS can't run k3s yet
-    DEFAULT_DISTRO_OPTIONS.pop('k3s')
-    DEFAULT_DISTRO = 'kind'
-else:
-    DEFAULT_DISTRO = 'k3s'
-
-DEFAULT_APPS = DEFAULT_CONFIG['apps']
+def _version() -> str:
+    """
+    version of smol-k8s-lab
+    """
+    from importlib.metadata import version as get_version
+    return get_version('smol-k8s-lab')
+
+
+def _speech_mp3_dir() -> str:
+    """
+    we default save all generated speech files to the audio dir of this
+    package, and extract the english ones the first time they're needed
+    """
+    speech_mp3_dir = path.join(PWD, 'audio')
+    en_dir = path.join(speech_mp3_dir, 'en')
+    if not path.exists(en_dir):
+        import tarfile
+        # create the dirs
+        makedirs(en_dir, exist_ok=True)
+        # extract files
+        with tarfile.open(path.join(speech_mp3_dir, "audio-en.tar.gz")) as file:
+            file.extractall(speech_mp3_dir)
+    return speech_mp3_dir
+
+
+def _default_distro_options() -> dict:
+    default_distro_options = __getattr__('DEFAULT_CONFIG')['k8s_distros']
+    if 'Darwin' in OS[0]:
+        # macOS can't run k3s yet
+        default_distro_options.pop('k3s', None)
+    return default_distro_options
+
+
+# each of these is computed the first time it's accessed, and then saved as a
+# regular module attribute, so __getattr__ is only called once per name
+_LAZY = {
+        "VERSION": _version,
+        "DEFAULT_CONFIG": lambda: load_yaml(DEFAULT_CONFIG_FILE),
+        "INITIAL_USR_CONFIG": lambda: load_yaml(),
+        "SPEECH_MP3_DIR": _speech_mp3_dir,
+        "DEFAULT_DISTRO_OPTIONS": _default_distro_options,
+        "DEFAULT_DISTRO": lambda: 'kind' if 'Darwin' in OS[0] else 'k3s',
+        "DEFAULT_APPS": lambda: __getattr__('DEFAULT_CONFIG')['apps'],
+        }
+
+
+def __getattr__(name: str):
+    # we also call this ourselves, for names that may already be computed
+    if name in globals():
+        return globals()[name]
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = _LAZY[name]()
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_LAZY))
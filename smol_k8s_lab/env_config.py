@@ -4,14 +4,9 @@ NAME: env_config.py
 DESC: everything to do with initial configuration of a new environment via the cli
 """
 # internal libraries and variables
-from .constants import (OS,
-                        VERSION,
-                        DEFAULT_CONFIG,
-                        DEFAULT_APPS,
-                        DEFAULT_DISTRO_OPTIONS,
-                        DEFAULT_DISTRO,
-                        INITIAL_USR_CONFIG,
-                        XDG_CONFIG_FILE)
+# the config files are only loaded when first used, so we don't import them
+from . import constants
+from .constants import OS, XDG_CONFIG_FILE
 from .utils.rich_cli.console_logging import print_panel, header, sub_header
 
 # external libraries and variables
@@ -26,7 +21,7 @@ def check_os_support(supported_os=('Linux', 'Darwin')):
     """
     if OS[0] not in supported_os:
         offical_supported_list = ", ".join(supported_os)
-        msg = (f"[ohno]{OS[0]}[/ohno] isn't officially supported in {VERSION}."
+        msg = (f"[ohno]{OS[0]}[/ohno] isn't officially supported in {constants.VERSION}."
                f" We have only tested the following: {offical_supported_list}")
         print_panel(msg, "⚠️  [warn]WARNING")
 
@@ -42,11 +37,14 @@ def check_os_support(supported_os=('Linux', 'Darwin')):
         return True
 
 
-def process_configs(config: dict = INITIAL_USR_CONFIG):
+def process_configs(config: dict = None):
     """
     process the config in ~/.config/smol-k8s-lab/config.yaml and ensure each
     app has a secret if we're using our default Argo CD repo
     """
+    if config is None:
+        config = constants.INITIAL_USR_CONFIG
+
     k8s_distros = config.get('k8s_distros', None)
     config['k8s_distros'] = process_k8s_distros(k8s_distros)[0]
 
@@ -57,7 +55,7 @@ def process_configs(config: dict = INITIAL_USR_CONFIG):
     header("Checking Application Configuration...")
     # if the config doesn't have the apps section, then we initialize a new one
     # and return that to avoid extra computations on comparing the default conf
-    if not config_apps or DEFAULT_APPS == config_apps:
+    if not config_apps or constants.DEFAULT_APPS == config_apps:
         sub_header("No application configurations found. 🌱 We'll initialize "
                    "them for you")
         initialize = True
@@ -70,7 +68,7 @@ def process_configs(config: dict = INITIAL_USR_CONFIG):
 
     # if no logging was configured, use the defaults
     if not config['smol_k8s_lab'].get('log', None):
-        config['smol_k8s_lab']['log'] = DEFAULT_CONFIG["log"]
+        config['smol_k8s_lab']['log'] = constants.DEFAULT_CONFIG["log"]
 
     # set global lets-encrypt clusterIssuer, timezone, and external secrets
     apps_global_cfg = config.get('apps_global_config',
@@ -81,7 +79,7 @@ def process_configs(config: dict = INITIAL_USR_CONFIG):
         secrets[f'global_{secret_key}'] = value
 
     # Write newly updated YAML data to config file
-    if initialize or DEFAULT_CONFIG != config:
+    if initialize or constants.DEFAULT_CONFIG != config:
         sub_header("✏️ Writing out your newly updated config file")
         yaml = YAML()
 
@@ -110,17 +108,17 @@ def process_app_configs(apps: dict = {}) -> list:
 
     # check if argo cd is enabled and if argo_cd isn't an app in thier config,
     # we create it with defaults
-    argocd_enabled = apps.get('argo_cd', DEFAULT_APPS['argo_cd'])['enabled']
+    argocd_enabled = apps.get('argo_cd', constants.DEFAULT_APPS['argo_cd'])['enabled']
 
     # this is always the same repo, we're not creative
-    default_repo = DEFAULT_APPS['argo_cd']['argo']['repo']
+    default_repo = constants.DEFAULT_APPS['argo_cd']['argo']['repo']
 
     # these are the secrets we also return, so we can create them all at once
     return_secrets = {}
 
     for app_key, app in apps.items():
         # grab the default app config to compare to
-        default_cfg = DEFAULT_APPS.get(app_key, {})
+        default_cfg = constants.DEFAULT_APPS.get(app_key, {})
         # anything with an "enabled" field is default enabled
         default_enabled = default_cfg.get('enabled', True)
         # if the user config doesn't have this section we write in defaults
@@ -207,7 +205,7 @@ def initialize_apps_config() -> list:
     Initializes a fresh apps configuration for smol-k8s-lab by ensuring each
     field is filled out.
     """
-    config = DEFAULT_APPS
+    config = constants.DEFAULT_APPS
     # these are the secrets we also return, so we can create them all at once
     return_secrets = {}
 
@@ -267,7 +265,7 @@ def process_k8s_distros(k8s_distros: dict = {}, prompt: bool = True):
         # verify the distros are supported
         for distro, metadata in k8s_distros.items():
             # if distro is enabled, but is not supported on user's OS
-            if distro not in DEFAULT_DISTRO_OPTIONS:
+            if distro not in constants.DEFAULT_DISTRO_OPTIONS:
                 if metadata.get('enabled', False):
                     print(f"{distro} is not supported on {OS[0]} at this time. :(")
                     # disable that distro so we don't run into errors down the line
@@ -281,11 +279,11 @@ def process_k8s_distros(k8s_distros: dict = {}, prompt: bool = True):
     if not distros_enabled:
         if prompt:
             msg = "[green]Which K8s distro would you like to use for your cluster?"
-            distro = Prompt.ask(msg, choices=DEFAULT_DISTRO_OPTIONS)
+            distro = Prompt.ask(msg, choices=constants.DEFAULT_DISTRO_OPTIONS)
             k8s_distros[distro]['enabled'] = True
         else:
-            k8s_distros[DEFAULT_DISTRO]["enabled"] = True
-            default = DEFAULT_DISTRO
+            k8s_distros[constants.DEFAULT_DISTRO]["enabled"] = True
+            default = constants.DEFAULT_DISTRO
 
     return k8s_distros, default
 
@@ -6,9 +6,11 @@ DESCRIPTION: installs helm repos, updates them, and installs charts for metallb,
     LICENSE: GNU AFFERO GENERAL PUBLIC LICENSE Version 3
 """
 # external libraries
-import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import logging as log
 from rich.prompt import Prompt
+from rich.table import Table
+from time import monotonic
 
 # internal libraries
 from .argocd import configure_argocd
@@ -39,7 +41,8 @@ from .social.jellyfin import configure_jellyfin
 from .storage.juicefs import configure_juicefs
 from .social.peertube import configure_peertube
 from .social.writefreely import configure_writefreely
-from ..utils.rich_cli.console_logging import header
+from ..utils.rich_cli.console_logging import CONSOLE, header
+from ..utils.run.scheduler import TaskGraph
 
 
 def setup_k8s_secrets_management(argocd: ArgoCD,
@@ -157,12 +160,17 @@ def setup_base_apps(k8s_obj: K8s,
                     cnpg_operator_dict: dict = {},
                     argocd_dict: dict = {},
                     plugin_secrets: dict = {},
-                    bw: BwCLI = None) -> ArgoCD:
+                    bw: BwCLI = None,
+                    max_parallel: int = 1) -> ArgoCD:
     """
     Uses Helm to install all base apps that need to be running being argo cd:
         cilium, metallb, ingess-nginx, cert-manager, argo cd, argocd secrets plugin
     All Needed for getting Argo CD up and running.
 
+    cilium goes first, since nothing else can run without a CNI. After that,
+    metallb and cert-manager are installed at the same time, and
+    ingress-nginx as soon as metallb is done, at most max_parallel at once.
+
     Returns an ArgoCD object for further argo actions
     """
     metallb_enabled = metallb_dict.get('enabled', False)
@@ -180,40 +188,59 @@ def setup_base_apps(k8s_obj: K8s,
                  argocd_enabled,
                  argo_secrets_plugin_enabled)
 
+    graph = TaskGraph(max_parallel)
+
     # needed for network policy editor and hubble UI
-    if cilium_enabled:
-        header("Installing [green]cilium[/green] so we have networking tools",
-               '🛜')
-        if cilium_dict['init']['enabled']:
+    if cilium_enabled and cilium_dict['init']['enabled']:
+        def cilium():
+            header("Installing [green]cilium[/green] so we have networking "
+                   "tools", '🛜')
             configure_cilium(cilium_dict)
+        graph.add('cilium', cilium)
 
     # needed for metal (non-cloud provider) installs
-    if metallb_enabled:
-        header("Installing [green]metallb[/green] so we have an IP address pool.",
-               '🛜')
-        if metallb_dict['init']['enabled']:
-            cidr = metallb_dict['init']['values']['address_pool']
-            if not cidr:
-                m = "[green]Please enter a comma seperated list of IPs or CIDRs"
-                cidr = Prompt.ask(m).split(',')
-
+    if metallb_enabled and metallb_dict['init']['enabled']:
+        # ask before we start anything, so the prompt isn't lost in the output
+        # of the other charts being installed at the same time
+        cidr = metallb_dict['init']['values']['address_pool']
+        if not cidr:
+            m = "[green]Please enter a comma seperated list of IPs or CIDRs"
+            cidr = Prompt.ask(m).split(',')
+
+        def metallb():
+            header("Installing [green]metallb[/green] so we have an IP address "
+                   "pool.", '🛜')
             configure_metallb(k8s_obj, cidr)
+        graph.add('metallb', metallb, requires=['cilium'])
 
     # ingress controller: so we can accept traffic from outside the cluster
     if ingress_nginx_enabled:
         # nginx just because that's most supported, treafik support may be added later
-        header("Installing [green]ingress-nginx-controller[/green] to access web"
-               " apps outside the cluster", "🌐")
-        configure_ingress_nginx(k8s_obj, k8s_distro)
+        def ingress_nginx():
+            header("Installing [green]ingress-nginx-controller[/green] to "
+                   "access web apps outside the cluster", "🌐")
+            configure_ingress_nginx(k8s_obj, k8s_distro)
+        # the controller's LoadBalancer service needs an IP from metallb
+        graph.add('ingress-nginx', ingress_nginx, requires=['cilium', 'metallb'])
 
     # manager SSL/TLS certificates via lets-encrypt
-    header("Installing [green]cert-manager[/green] for TLS certificates...", '📜')
     if cert_manager_enabled:
         cert_manager_init_enabled = cert_manager_dict['init'].get('enabled', False)
         cert_manager_init_values = cert_manager_dict['init'].get('values', {})
-        configure_cert_manager(k8s_obj)
-        if not argocd_enabled and cert_manager_init_enabled:
-            create_cluster_issuers(cert_manager_init_values, k8s_obj)
+
+        def cert_manager():
+            header("Installing [green]cert-manager[/green] for TLS "
+                   "certificates...", '📜')
+            configure_cert_manager(k8s_obj)
+            if not argocd_enabled and cert_manager_init_enabled:
+                create_cluster_issuers(cert_manager_init_values, k8s_obj)
+        graph.add('cert-manager', cert_manager, requires=['cilium'])
+
+    try:
+        graph.run()
+    finally:
+        if len(graph.tasks) > 1:
+            graph.print_report("Base app timings")
 
     # then we install argo cd if it's enabled
     if argocd_enabled:
@@ -232,111 +259,139 @@ def setup_base_apps(k8s_obj: K8s,
         return argocd
 
 
-async def setup_federated_apps(
-        argocd: ArgoCD,
-        api_tls_verify: bool = False,
-        forgejo_dict: dict = {},
-        ghost_dict: dict = {},
-        harbor_dict: dict = {},
-        jellyfin_dict: dict = {},
-        home_assistant_dict: dict = {},
-        nextcloud_dict: dict = {},
-        mastodon_dict: dict = {},
-        gotosocial_dict: dict = {},
-        matrix_dict: dict = {},
-        peertube_dict: dict = {},
-        writefreely_dict: dict = {},
-        pvc_storage_class: str = "local-path",
-        zitadel_hostname: str = "",
-        zitadel_obj: Zitadel = None,
-        libretranslate_api_key: str = "",
-        bw: BwCLI = None
-        ) -> None:
+def add_federated_apps(graph: TaskGraph,
+                       argocd: ArgoCD,
+                       apps: dict,
+                       api_tls_verify: bool = False,
+                       pvc_storage_class: str = "local-path",
+                       bw: BwCLI = None) -> None:
     """
-    Setup any federated apps with initialization supported
+    adds an install step to the graph for each enabled federated app, and pops
+    them all from the apps dict.
+
+    Every app waits on the operators step (buckets, databases, and k8up for
+    backups) and the oidc step (zitadel applications). Mastodon also waits on
+    libre_translate for its API key.
     """
+    requires = ['operators', 'oidc']
+
+    def zitadel() -> Zitadel | None:
+        return graph.results.get('oidc', None)
+
+    def add(app: str, step: callable, extra_requires: list = []) -> None:
+        app_dict = apps.pop(app, {})
+        if app_dict.get('enabled', False):
+            graph.add(app, lambda: step(app_dict), requires + extra_requires)
+
     # git server
-    if forgejo_dict.get('enabled', False):
-        await configure_forgejo(argocd,
-                                forgejo_dict,
-                                pvc_storage_class,
-                                zitadel_obj,
-                                bw)
+    add('forgejo', lambda cfg: configure_forgejo(
+        argocd, cfg, pvc_storage_class, zitadel(), bw))
 
     # blogging platforms
-    if ghost_dict.get('enabled', False):
-        await configure_ghost(argocd,
-                              ghost_dict,
-                              pvc_storage_class,
-                              zitadel_obj,
-                              bw)
-
-    if writefreely_dict.get('enabled', False):
-        await configure_writefreely(argocd,
-                                    writefreely_dict,
-                                    pvc_storage_class,
-                                    zitadel_obj,
-                                    bw)
+    add('ghost', lambda cfg: configure_ghost(
+        argocd, cfg, pvc_storage_class, zitadel(), bw))
+    add('writefreely', lambda cfg: configure_writefreely(
+        argocd, cfg, pvc_storage_class, zitadel(), bw))
 
     # oci registry for docker and helm
-    if harbor_dict.get('enabled', False):
-        await configure_harbor(argocd,
-                               harbor_dict,
-                               pvc_storage_class,
-                               zitadel_obj,
-                               bw)
+    add('harbor', lambda cfg: configure_harbor(
+        argocd, cfg, pvc_storage_class, zitadel(), bw))
 
     # home media server
-    if jellyfin_dict.get('enabled', False):
-        await configure_jellyfin(argocd,
-                                 jellyfin_dict,
-                                 pvc_storage_class,
-                                 bw)
+    add('jellyfin', lambda cfg: configure_jellyfin(
+        argocd, cfg, pvc_storage_class, bw))
 
     # home iot management
-    if home_assistant_dict.get('enabled', False):
-        await configure_home_assistant(argocd,
-                                       home_assistant_dict,
-                                       pvc_storage_class,
-                                       api_tls_verify,
-                                       bw)
-
-    if nextcloud_dict.get('enabled', False):
-        await configure_nextcloud(argocd,
-                                  nextcloud_dict,
-                                  pvc_storage_class,
-                                  zitadel_obj,
-                                  bw)
+    add('home_assistant', lambda cfg: configure_home_assistant(
+        argocd, cfg, pvc_storage_class, api_tls_verify, bw))
+
+    add('nextcloud', lambda cfg: configure_nextcloud(
+        argocd, cfg, pvc_storage_class, zitadel(), bw))
 
     # federated social micro blogging apps
-    if mastodon_dict.get('enabled', False):
-        await configure_mastodon(argocd,
-                                 mastodon_dict,
-                                 pvc_storage_class,
-                                 libretranslate_api_key,
-                                 bw)
-
-    if gotosocial_dict.get('enabled', False):
-        await configure_gotosocial(argocd,
-                                   gotosocial_dict,
-                                   pvc_storage_class,
-                                   zitadel_obj,
-                                   bw)
+    add('mastodon', lambda cfg: configure_mastodon(
+        argocd, cfg, pvc_storage_class,
+        graph.results.get('libre_translate', "") or "", bw),
+        ['libre_translate'])
+    add('gotosocial', lambda cfg: configure_gotosocial(
+        argocd, cfg, pvc_storage_class, zitadel(), bw))
 
     # federated video hosting - similar to youtube
-    if peertube_dict.get('enabled', False):
-        await configure_peertube(argocd,
-                                 peertube_dict,
-                                 pvc_storage_class,
-                                 bw)
+    add('peertube', lambda cfg: configure_peertube(
+        argocd, cfg, pvc_storage_class, bw))
 
     # federated chat apps
-    if matrix_dict.get('enabled', False):
-        await configure_matrix(argocd,
-                               matrix_dict,
-                               pvc_storage_class,
-                               zitadel_obj,
-                               bw)
+    add('matrix', lambda cfg: configure_matrix(
+        argocd, cfg, pvc_storage_class, zitadel(), bw))
+
+
+def install_apps(argocd: ArgoCD, apps: dict, max_parallel: int = 1) -> dict:
+    """
+    installs every enabled app in apps as an Argo CD Application, at most
+    max_parallel at a time, and prints a table of how each one went.
+
+    Returns a dict of {app name: True if it already existed, else False}. If
+    any app failed, we still install the rest, and then raise a RuntimeError
+    listing the failed apps.
+    """
+    header("Installing the rest of the Argo CD apps")
+    enabled = {app_key.replace('_', '-'): app_meta['argo']
+               for app_key, app_meta in apps.items() if app_meta['enabled']}
+    if not enabled:
+        log.info("No other Argo CD apps to install")
+        return {}
+
+    # one list of every existing app, instead of one lookup per app
+    try:
+        argocd.app_index(refresh=True)
+    except Exception as e:
+        log.debug(f"Couldn't index Argo CD apps up front: {e}")
+
+    def install(argo_app: str, argo_dict: dict) -> tuple:
+        """
+        returns (True if the app already existed, exception or None, seconds)
+        """
+        start = monotonic()
+        existed, error = False, None
+        try:
+            existed = bool(argocd.install_app(argo_app, argo_dict))
+        except Exception as e:
+            log.error(f"Installing app {argo_app} failed with: {e}")
+            error = e
+        return existed, error, monotonic() - start
+
+    # install one app after the other in this thread if we aren't
+    # parallelizing, so that spinners and prompts behave like they always have
+    if max_parallel <= 1:
+        results = {argo_app: install(argo_app, argo_dict)
+                   for argo_app, argo_dict in enabled.items()}
+    else:
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            futures = {argo_app: pool.submit(install, argo_app, argo_dict)
+                       for argo_app, argo_dict in enabled.items()}
+            results = {argo_app: future.result()
+                       for argo_app, future in futures.items()}
+
+    table = Table(box=None, header_style="cornflower_blue")
+    table.add_column("app")
+    table.add_column("result")
+    table.add_column("took", justify="right")
+    for argo_app, (existed, error, duration) in results.items():
+        if error:
+            result = f"[red]failed[/]: {error}"
+        elif existed:
+            result = "[dim]already exists[/]"
+        else:
+            result = "[green]installed[/]"
+        table.add_row(argo_app, result, f"{duration:.1f}s")
+    CONSOLE.print(table, justify="center")
+
+    failed = [app for app, (_, error, _) in results.items() if error]
+    if failed:
+        raise RuntimeError(f"These Argo CD apps failed to install: {failed}")
+
+    return {argo_app: existed for argo_app, (existed, _, _) in results.items()}
+
 
 async def setup_storage_apps(argocd: ArgoCD,
                              juicefs_dict: dict = {},
@@ -74,14 +74,16 @@ def configure_keycloak(argocd: ArgoCD,
             sub_header("Creating secrets in Bitwarden")
             admin_password = bitwarden.generate()
             postgres_password = bitwarden.generate()
-            bitwarden.create_login(name='keycloak-admin-credentials',
+            bitwarden.create_logins(
+                    {'admin': dict(name='keycloak-admin-credentials',
                                    item_url=keycloak_hostname,
                                    user=secrets['keycloak_admin'],
-                                   password=admin_password)
-            bitwarden.create_login(name='keycloak-postgres-credentials',
-                                   item_url=keycloak_hostname,
-                                   user='keycloak',
-                                   password=postgres_password)
+                                   password=admin_password),
+                     'postgres': dict(name='keycloak-postgres-credentials',
+                                      item_url=keycloak_hostname,
+                                      user='keycloak',
+                                      password=postgres_password)}
+                    )
 
         # if we're not using bitwarden, create the k8s secrets directly
         else:
@@ -5,6 +5,7 @@ from smol_k8s_lab.k8s_apps.identity_provider.zitadel_api import Zitadel
 from smol_k8s_lab.k8s_tools.argocd_util import ArgoCD
 from smol_k8s_lab.utils.rich_cli.console_logging import header
 from smol_k8s_lab.utils.passwords import create_password
+from smol_k8s_lab.utils.run.scheduler import call_in_main_thread
 # from .keycloak import Keycloak
 
 
@@ -55,23 +56,12 @@ def configure_vouch(argocd: ArgoCD,
         # trying to create a string of ""
         preferred_domain = '\"\"'
 
-        # this is handling the vouch-config secret
-        emails = cfg['init']['values']['emails']
-        if not emails:
-            m = ("[green]Please enter a comma seperated list of [yellow]emails[/]"
-                 " that are allowed to access domains behind Vouch")
-            emails = Prompt.ask(m)
-        else:
-            emails = ','.join(emails)
+        # this is handling the vouch-config secret. Other install steps may
+        # be running, so we ask for anything missing in the main thread
+        emails, domains = call_in_main_thread(ask_for_allowed,
+                                              cfg['init']['values']['emails'],
+                                              cfg['init']['values']['domains'])
         log.debug(f"Allowing vouch to be accessed by emails: {emails}")
-
-        domains = cfg['init']['values']['domains']
-        if not domains:
-            m = ("[green]Please enter a comma seperated list of [yellow]domains[/]"
-                 " that are allowed to use Vouch")
-            domains = Prompt.ask(m)
-        else:
-            domains = ','.join(domains)
         log.debug(f"Allowing vouch to be used by these domains: {domains}")
 
         # its unclear why vouch wants this to be 44 characters 🤷
@@ -90,8 +80,11 @@ def configure_vouch(argocd: ArgoCD,
 
             log.info(f"vouch oauth fields are {fields}")
 
+            # every login item we need, created all at once below
+            logins = {}
+
             # create oauth OIDC bitwarden item
-            oauth_id = bitwarden.create_login(
+            logins['oauth'] = dict(
                 name='vouch-oauth-config',
                 user=auth_dict['client_id'],
                 item_url=vouch_hostname,
@@ -107,7 +100,7 @@ def configure_vouch(argocd: ArgoCD,
             log.debug(f"emails_obj is {emails_obj} and domains_obj is {domains_obj}")
 
             # create vouch config bitwarden item
-            vouch_id = bitwarden.create_login(
+            logins['vouch'] = dict(
                     name='vouch-config',
                     user='vouch',
                     item_url=vouch_hostname,
@@ -115,10 +108,12 @@ def configure_vouch(argocd: ArgoCD,
                     fields=[domains_obj, emails_obj, jwt_secret_obj]
                     )
 
+            ids = bitwarden.create_logins(logins)
+
             # update the vouch values for the argocd appset
             argocd.update_appset_secret(
-                    {'vouch_oauth_config_bitwarden_id': oauth_id,
-                     'vouch_config_bitwarden_id': vouch_id}
+                    {'vouch_oauth_config_bitwarden_id': ids['oauth'],
+                     'vouch_config_bitwarden_id': ids['vouch']}
                     )
 
             # reload the bitwarden ESO provider
@@ -177,6 +172,28 @@ def configure_vouch(argocd: ArgoCD,
                    )
 
 
+def ask_for_allowed(emails: list, domains: list) -> tuple:
+    """
+    prompts the user for the emails and domains allowed to use vouch, if
+    they're empty, and returns them each as a comma seperated str
+    """
+    if not emails:
+        m = ("[green]Please enter a comma seperated list of [yellow]emails[/]"
+             " that are allowed to access domains behind Vouch")
+        emails = Prompt.ask(m)
+    else:
+        emails = ','.join(emails)
+
+    if not domains:
+        m = ("[green]Please enter a comma seperated list of [yellow]domains[/]"
+             " that are allowed to use Vouch")
+        domains = Prompt.ask(m)
+    else:
+        domains = ','.join(domains)
+
+    return emails, domains
+
+
 def create_vouch_app(provider_hostname: str,
                      vouch_hostname: str = "",
                      zitadel: Zitadel = None) -> list:
@@ -11,11 +11,38 @@ import jwt
 from requests import request
 from requests.exceptions import SSLError
 from rich.prompt import Prompt
+from threading import Lock
 from time import sleep
 
 # internal libraries
 from smol_k8s_lab.bitwarden.bw_cli import BwCLI
 from smol_k8s_lab.utils.passwords import create_password
+from smol_k8s_lab.utils.run.scheduler import call_in_main_thread
+
+
+def ask_for_user_info(username: str = "",
+                      first_name: str = "",
+                      last_name: str = "",
+                      email: str = "",
+                      gender: str = "") -> tuple:
+    """
+    prompts the user for any of these profile values that are empty, all in
+    a row, and returns (username, first_name, last_name, email, gender)
+    """
+    if not username:
+        username = Prompt.ask("[green]Enter a new username for Zitadel")
+    if not first_name:
+        first_name = Prompt.ask("[green]Enter your First name for your profile")
+    if not last_name:
+        last_name = Prompt.ask("[green]Enter your Last name for your profile")
+    if not email:
+        email = Prompt.ask("[green]Enter your email for your profile")
+    if not gender:
+        gender = Prompt.ask("[green]Please select a gender (more coming soon)",
+                            choices=["GENDER_FEMALE", "GENDER_MALE",
+                                     "GENDER_DIVERSE", "GENDER_UNSPECIFIED"])
+    return username, first_name, last_name, email, gender
+
 
 class Zitadel():
     """
@@ -51,6 +78,10 @@ class Zitadel():
         self.user_id = ""
         self.resource_owner = ""
 
+        # apps may be set up at the same time, and each one reads, changes,
+        # and writes back the same user grant, see update_user_grant()
+        self._grant_lock = Lock()
+
     def check_api_health(self,) -> True:
         """
         Loops and checks https://{self.api_url}healthz for an HTTP status.
@@ -181,18 +212,10 @@ class Zitadel():
         """
         if admin_user:
             username = admin_user
-        if not username:
-            username = Prompt.ask("[green]Enter a new username for Zitadel")
-        if not first_name:
-            first_name = Prompt.ask("[green]Enter your First name for your profile")
-        if not last_name:
-            last_name = Prompt.ask("[green]Enter your Last name for your profile")
-        if not email:
-            email = Prompt.ask("[green]Enter your email for your profile")
-        if not gender:
-            gender = Prompt.ask("[green]Please select a gender (more coming soon)",
-                                choices=["GENDER_FEMALE", "GENDER_MALE",
-                                         "GENDER_DIVERSE", "GENDER_UNSPECIFIED"])
+        # other install steps may be running, so ask in the main thread
+        username, first_name, last_name, email, gender = call_in_main_thread(
+                ask_for_user_info, username, first_name, last_name, email, gender
+                )
 
         # create a 32 character password with a randomly placed special character
         password = create_password(True)
@@ -268,32 +291,34 @@ class Zitadel():
         if not user_id:
             user_id = self.user_id
 
-        url = f"{self.api_url}users/grants/_search"
+        # so two apps don't each drop the role the other one just added
+        with self._grant_lock:
+            url = f"{self.api_url}users/grants/_search"
 
-        payload = dumps({
-                  "userIdQuery": {
-                    "userId": user_id
-                  }
-            })
+            payload = dumps({
+                      "userIdQuery": {
+                        "userId": user_id
+                      }
+                })
 
-        response = request("POST", url, headers=self.headers, data=payload,
-                           verify=self.verify)
-        log.info(response.text)
-        user_roles = response.json()['result'][0]['roleKeys']
-        grant_id = response.json()['result'][0]['id']
-        log.info(f"{user_id} has grant id {grant_id} with roles: {user_roles}")
+            response = request("POST", url, headers=self.headers, data=payload,
+                               verify=self.verify)
+            log.info(response.text)
+            user_roles = response.json()['result'][0]['roleKeys']
+            grant_id = response.json()['result'][0]['id']
+            log.info(f"{user_id} has grant id {grant_id} with roles: {user_roles}")
 
-        # now we can update the user's roles
-        role_keys.extend(user_roles)
-        log.debug(f"Assiging user_id, {user_id} the roles of "
-                  f"[green]{role_keys}[/] in {self.project_id}")
+            # now we can update the user's roles
+            role_keys.extend(user_roles)
+            log.debug(f"Assiging user_id, {user_id} the roles of "
+                      f"[green]{role_keys}[/] in {self.project_id}")
 
-        url = f"{self.api_url}users/{user_id}/grants/{grant_id}"
+            url = f"{self.api_url}users/{user_id}/grants/{grant_id}"
 
-        payload = dumps({"roleKeys": role_keys})
+            payload = dumps({"roleKeys": role_keys})
 
-        response = request("PUT", url, headers=self.headers, data=payload,
-                           verify=self.verify)
+            response = request("PUT", url, headers=self.headers, data=payload,
+                               verify=self.verify)
 
     def create_iam_membership(self, user_id: str, role: str):
         """
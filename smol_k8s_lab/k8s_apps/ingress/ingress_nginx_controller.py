@@ -9,18 +9,19 @@ DESCRIPTION: install the nginx ingress controller
 from smol_k8s_lab.k8s_tools.helm import Helm
 from smol_k8s_lab.k8s_tools.k8s_lib import K8s
 
+# the manifest we install on kind, which doesn't use the helm chart
+KIND_MANIFEST_URL = ('https://raw.githubusercontent.com/kubernetes/ingress-nginx/'
+                     'main/deploy/static/provider/kind/deploy.yaml')
+
 
 def configure_ingress_nginx(k8s_obj: K8s, k8s_distro: str) -> None:
     """
     install nginx ingress controller from manifests for kind and helm for k3s
     """
-    url = ('https://raw.githubusercontent.com/kubernetes/ingress-nginx/main/'
-           'deploy/static/provider/kind/deploy.yaml')
-
     if k8s_distro == 'kind':
         # this is to wait for the deployment to come up
         k8s_obj.apply_manifests(
-                manifest_file_name=url,
+                manifest_file_name=KIND_MANIFEST_URL,
                 namespace="ingress-nginx",
                 deployment="ingress-nginx-controller",
                 selector="app.kubernetes.io/component=controller"
@@ -146,26 +146,24 @@ def setup_bitwarden_items(argocd: ArgoCD,
     """
     sub_header("Creating grafana monitoring stack related secrets in Bitwarden")
 
+    # every login item we need, created all at once below
+    logins = {}
+
     # OIDC credentials
     log.info("Creating OIDC credentials for grafana in Bitwarden")
     if zitadel_hostname:
         if oidc_creds:
             # for the credentials to zitadel
-            oidc_id = bitwarden.create_login(
+            logins['oidc'] = dict(
                     name='grafana-oidc-credentials',
                     item_url=grafana_hostname,
                     user=oidc_creds['client_id'],
                     password=oidc_creds['client_secret']
                     )
-        else:
-            # we assume the credentials already exist if they fail to create
-            oidc_id = bitwarden.get_item(
-                    f"grafana-oidc-credentials-{grafana_hostname}"
-                    )[0]['id']
 
     # valkey credentials
     loki_valkey_password = bitwarden.generate()
-    valkey_id = bitwarden.create_login(
+    logins['valkey'] = dict(
             name='loki-valkey-credentials',
             item_url=grafana_hostname,
             user='valkey',
@@ -173,7 +171,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     restic_repo_obj = create_custom_field('resticRepoPassword', restic_repo_pass)
-    s3_backup_id = bitwarden.create_login(
+    logins['s3_backup'] = dict(
             name='backups-s3-credentials',
             item_url=grafana_hostname,
             user=backups_s3_user,
@@ -183,7 +181,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     endpoint_obj = create_custom_field('endpoint', s3_endpoint)
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='admin-s3-credentials',
             item_url=grafana_hostname,
             user="monitoring-root",
@@ -194,7 +192,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # S3 credentials for loki
     loki_bucket_obj = create_custom_field('bucket', "loki")
     loki_access_key = create_password()
-    s3_loki_id = bitwarden.create_login(
+    logins['s3_loki'] = dict(
             name='loki-s3-credentials',
             item_url=grafana_hostname,
             user="loki",
@@ -205,7 +203,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # S3 credentials for mimir
     mimir_bucket_obj = create_custom_field('bucket', "mimir")
     mimir_access_key = create_password()
-    s3_mimir_id = bitwarden.create_login(
+    logins['s3_mimir'] = dict(
             name='mimir-s3-credentials',
             item_url=grafana_hostname,
             user="mimir",
@@ -213,15 +211,22 @@ def setup_bitwarden_items(argocd: ArgoCD,
             fields=[mimir_bucket_obj, endpoint_obj]
             )
 
+    ids = bitwarden.create_logins(logins)
+    if zitadel_hostname and not oidc_creds:
+        # we assume the credentials already exist if they fail to create
+        ids['oidc'] = bitwarden.get_item(
+                f"grafana-oidc-credentials-{grafana_hostname}"
+                )[0]['id']
+
     # update the monitoring values for the argocd appset
     argocd.update_appset_secret(
             {
-            'grafana_stack_loki_valkey_bitwarden_id': valkey_id,
-            'grafana_stack_oidc_credentials_bitwarden_id': oidc_id,
-            'grafana_stack_loki_s3_credentials_bitwarden_id': s3_loki_id,
-            'grafana_stack_mimir_s3_credentials_bitwarden_id': s3_mimir_id,
-            'grafana_stack_s3_backups_credentials_bitwarden_id': s3_backup_id,
-            'grafana_stack_s3_admin_credentials_bitwarden_id': s3_admin_id
+            'grafana_stack_loki_valkey_bitwarden_id': ids['valkey'],
+            'grafana_stack_oidc_credentials_bitwarden_id': ids['oidc'],
+            'grafana_stack_loki_s3_credentials_bitwarden_id': ids['s3_loki'],
+            'grafana_stack_mimir_s3_credentials_bitwarden_id': ids['s3_mimir'],
+            'grafana_stack_s3_backups_credentials_bitwarden_id': ids['s3_backup'],
+            'grafana_stack_s3_admin_credentials_bitwarden_id': ids['s3_admin']
             }
             )
 
@@ -95,7 +95,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # valkey credentials
     tempo_valkey_password = bitwarden.generate()
-    valkey_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['valkey'] = dict(
             name='tempo-valkey-credentials',
             item_url=tempo_hostname,
             user='valkey',
@@ -107,7 +109,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # S3 credentials for tempo
     tempo_bucket_obj = create_custom_field('bucket', "tempo")
     tempo_access_key = create_password()
-    s3_tempo_id = bitwarden.create_login(
+    logins['s3_tempo'] = dict(
             name='tempo-s3-credentials',
             item_url=tempo_hostname,
             user="tempo",
@@ -115,12 +117,14 @@ def setup_bitwarden_items(argocd: ArgoCD,
             fields=[tempo_bucket_obj, endpoint_obj]
             )
 
+    ids = bitwarden.create_logins(logins)
+
 
     # update the monitoring values for the argocd appset
     argocd.update_appset_secret(
             {
-            'tempo_valkey_bitwarden_id': valkey_id,
-            'tempo_s3_credentials_bitwarden_id': s3_tempo_id
+            'tempo_valkey_bitwarden_id': ids['valkey'],
+            'tempo_s3_credentials_bitwarden_id': ids['s3_tempo']
             }
             )
 
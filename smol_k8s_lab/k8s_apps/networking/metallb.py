@@ -7,27 +7,24 @@ DESCRIPTION: configures metallb
 """
 # internal libraries
 from smol_k8s_lab.k8s_tools.k8s_lib import K8s
+from smol_k8s_lab.utils import manifest_cache
 
 # external libraries
 import logging as log
-import requests
 from ruamel.yaml import YAML
 
+# the live metallb Argo CD app, which has the version of metallb to use
+APPSET_URL = ("https://raw.githubusercontent.com/small-hack/argocd-apps"
+              "/main/metallb/metallb_argocd_app.yaml")
 
-def configure_metallb(k8s_obj: K8s, address_pool: list = []) -> None:
-    """
-    installs metallb from the manifests in their official repo.
-
-    Note: Always uses the live version on main branch of small-hack/argocd-apps
 
-    Optionally accepts address_pool arg, list of ip addresses or CIDRs to create
-    an IPaddressPool and L2Advertisement. If address_pool is not passed in or
-    is "", then we don't create IPaddressPool or L2Advertisement
+def manifest_url() -> str:
+    """
+    returns the URL of the metallb-native manifest for the version of metallb
+    in the live metallb Argo CD app
     """
     # get live metallb version to use
-    appset_url = ("https://raw.githubusercontent.com/small-hack/argocd-apps"
-                  "/main/metallb/metallb_argocd_app.yaml")
-    res = requests.get(appset_url).text
+    res = manifest_cache.fetch(APPSET_URL)
 
     # load the yaml file we just downloaded into memory as a dict object
     yaml = YAML()
@@ -36,11 +33,22 @@ def configure_metallb(k8s_obj: K8s, address_pool: list = []) -> None:
     # version of metallb to install
     version =  obj['spec']['source']['targetRevision']
 
-    url = (f"https://raw.githubusercontent.com/metallb/metallb/{version}/config"
-           "/manifests/metallb-native.yaml")
+    return (f"https://raw.githubusercontent.com/metallb/metallb/{version}/config"
+            "/manifests/metallb-native.yaml")
+
 
+def configure_metallb(k8s_obj: K8s, address_pool: list = []) -> None:
+    """
+    installs metallb from the manifests in their official repo.
+
+    Note: Always uses the live version on main branch of small-hack/argocd-apps
+
+    Optionally accepts address_pool arg, list of ip addresses or CIDRs to create
+    an IPaddressPool and L2Advertisement. If address_pool is not passed in or
+    is "", then we don't create IPaddressPool or L2Advertisement
+    """
     # install manifest and wait
-    k8s_obj.apply_manifests(url,
+    k8s_obj.apply_manifests(manifest_url(),
                             "metallb-system",
                             "controller",
                             "component=controller")
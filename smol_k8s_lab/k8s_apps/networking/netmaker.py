@@ -73,8 +73,11 @@ def configure_netmaker(argocd: ArgoCD,
 
             log.info(f"netmaker postgres fields are {postgres_fields}")
 
+            # every login item we need, created all at once below
+            logins = {}
+
             # create netmaker super admin credentials bitwarden item
-            admin_id = bitwarden.create_login(
+            logins['admin'] = dict(
                 name=f'{netmaker_hostname}-netmaker-admin-credentials',
                 user=netmaker_user,
                 password=netmaker_pass,
@@ -83,7 +86,7 @@ def configure_netmaker(argocd: ArgoCD,
                 )
 
             # create oauth OIDC bitwarden item
-            oauth_id = bitwarden.create_login(
+            logins['oauth'] = dict(
                 name=f'{netmaker_hostname}-netmaker-oauth-config',
                 user=auth_dict['client_id'],
                 item_url=netmaker_hostname,
@@ -92,26 +95,28 @@ def configure_netmaker(argocd: ArgoCD,
                 )
 
             # create the mqtt bitwarden item
-            mq_id = bitwarden.create_login(
+            logins['mq'] = dict(
                     name=f"{netmaker_hostname}-netmaker-mq-credentials",
                     user='netmaker',
                     password=mqPass
                     )
 
             # create the postgres bitwarden item
-            postgres_id = bitwarden.create_login(
+            logins['postgres'] = dict(
                     name=f"{netmaker_hostname}-netmaker-pgsql-credentials",
                     user='netmaker',
                     password=sqlPass,
                     fields=postgres_fields
                     )
 
+            ids = bitwarden.create_logins(logins)
+
             # update the netmaker values for the argocd appset
             argocd.update_appset_secret(
-                    {'netmaker_oauth_config_bitwarden_id': oauth_id,
-                     'netmaker_admin_credentials_bitwarden_id': admin_id,
-                     'netmaker_mq_config_bitwarden_id': mq_id,
-                     'netmaker_pgsql_config_bitwarden_id': postgres_id})
+                    {'netmaker_oauth_config_bitwarden_id': ids['oauth'],
+                     'netmaker_admin_credentials_bitwarden_id': ids['admin'],
+                     'netmaker_mq_config_bitwarden_id': ids['mq'],
+                     'netmaker_pgsql_config_bitwarden_id': ids['postgres']})
 
             # reload the bitwarden ESO provider
             try:
@@ -23,9 +23,12 @@ def configure_postgres_operator(argocd: ArgoCD,
             access_id = config['init']['values']['s3_backup_access_id']
             secret_key = config['init']['values']['s3_backup_secret_key']
             if bw:
+                # every login item we need, created all at once below
+                logins = {}
+
                 # s3 credentials for zalando postgres operator access
                 pgsql_s3_pass = create_password()
-                s3_id = bw.create_login(
+                logins['s3'] = dict(
                         name='postgres-operator-s3-credentials',
                         item_url=hostname,
                         user="postgres-operator",
@@ -34,7 +37,7 @@ def configure_postgres_operator(argocd: ArgoCD,
 
                 # s3 credentials for admin access to e.g. seaweedfs
                 pgsql_s3_admin_pass = create_password()
-                s3_admin_id = bw.create_login(
+                logins['s3_admin'] = dict(
                         name='postgres-operator-admin-s3-credentials',
                         item_url=hostname,
                         user='postgres-operator-root',
@@ -42,18 +45,20 @@ def configure_postgres_operator(argocd: ArgoCD,
                         )
 
                 # s3 credentials for *remote* backups e.g. b2
-                s3_backups_id = bw.create_login(
+                logins['s3_backups'] = dict(
                         name='postgres-operator-backups-s3-credentials',
                         item_url=hostname,
                         user=access_id,
                         password=secret_key
                         )
 
+                ids = bw.create_logins(logins)
+
                 # update the postgres_operator values for the argocd appset
                 argocd.update_appset_secret(
-                        {'postgres_operator_s3_admin_credentials_bitwarden_id': s3_admin_id,
-                         'postgres_operator_s3_user_credentials_bitwarden_id': s3_id,
-                         'postgres_operator_s3_backups_credentials_bitwarden_id': s3_backups_id}
+                        {'postgres_operator_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+                         'postgres_operator_s3_user_credentials_bitwarden_id': ids['s3'],
+                         'postgres_operator_s3_backups_credentials_bitwarden_id': ids['s3_backups']}
                         )
 
         # actual installation of the minio app
@@ -274,7 +274,10 @@ def setup_bitwarden_items(argocd: ArgoCD,
                                                s3_endpoint.replace("https://",
                                                                    ""))
     forgejo_s3_bucket_obj = create_custom_field("s3Bucket", "forgejo")
-    s3_id = bitwarden.create_login(
+
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='forgejo-user-s3-credentials',
             item_url=forgejo_hostname,
             user=s3_access_id,
@@ -287,7 +290,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     pgsql_s3_key = create_password()
-    s3_db_id = bitwarden.create_login(
+    logins['s3_db'] = dict(
             name='forgejo-postgres-s3-credentials',
             item_url=forgejo_hostname,
             user="forgejo-postgres",
@@ -295,7 +298,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='forgejo-admin-s3-credentials',
             item_url=forgejo_hostname,
             user="forgejo-root",
@@ -304,7 +307,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='forgejo-backups-s3-credentials',
             item_url=forgejo_hostname,
             user=backups_s3_user,
@@ -314,7 +317,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # valkey credentials
     forgejo_valkey_password = bitwarden.generate()
-    valkey_id = bitwarden.create_login(
+    logins['valkey'] = dict(
             name='forgejo-valkey-credentials',
             item_url=forgejo_hostname,
             user='forgejo',
@@ -325,7 +328,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     forgejo_pgsql_password = bitwarden.generate()
     postrges_pass_obj = create_custom_field("postgresPassword",
                                             forgejo_pgsql_password)
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='forgejo-pgsql-credentials',
             item_url=forgejo_hostname,
             user='forgejo',
@@ -336,7 +339,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # SMTP credentials
     forgejo_smtp_host_obj = create_custom_field("smtpHostname", mail_host)
     forgejo_smtp_port_obj = create_custom_field("smtpPort", mail_port)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='forgejo-smtp-credentials',
             item_url=forgejo_hostname,
             user=mail_user,
@@ -346,7 +349,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # admin credentials for forgejo itself
     admin_password = create_password()
-    admin_id = bitwarden.create_login(
+    logins['admin'] = dict(
             name='forgejo-admin-credentials',
             item_url=forgejo_hostname,
             user="forgejo",
@@ -358,30 +361,32 @@ def setup_bitwarden_items(argocd: ArgoCD,
     if oidc_creds:
         log.debug("Creating OIDC credentials for forgejo in Bitwarden...")
         issuer_obj = create_custom_field("issuer", f"https://{zitadel_hostname}")
-        oidc_id = bitwarden.create_login(
+        logins['oidc'] = dict(
                 name='forgejo-oidc-credentials',
                 item_url=forgejo_hostname,
                 user=oidc_creds['client_id'],
                 password=oidc_creds['client_secret'],
                 fields=[issuer_obj]
                 )
-    else:
-        oidc_id = bitwarden.get_item(
+
+    ids = bitwarden.create_logins(logins)
+    if not oidc_creds:
+        ids['oidc'] = bitwarden.get_item(
                 f"forgejo-oidc-credentials-{forgejo_hostname}"
                 )[0]['id']
 
     # update the forgejo values for the argocd appset
     # 'forgejo_admin_credentials_bitwarden_id': admin_id,
     argocd.update_appset_secret(
-            {'forgejo_smtp_credentials_bitwarden_id': smtp_id,
-             'forgejo_oidc_credentials_bitwarden_id': oidc_id,
-             'forgejo_postgres_credentials_bitwarden_id': db_id,
-             'forgejo_valkey_bitwarden_id': valkey_id,
-             'forgejo_admin_credentials_bitwarden_id': admin_id,
-             'forgejo_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'forgejo_s3_postgres_credentials_bitwarden_id': s3_db_id,
-             'forgejo_s3_forgejo_credentials_bitwarden_id': s3_id,
-             'forgejo_s3_backups_credentials_bitwarden_id': s3_backups_id})
+            {'forgejo_smtp_credentials_bitwarden_id': ids['smtp'],
+             'forgejo_oidc_credentials_bitwarden_id': ids['oidc'],
+             'forgejo_postgres_credentials_bitwarden_id': ids['db'],
+             'forgejo_valkey_bitwarden_id': ids['valkey'],
+             'forgejo_admin_credentials_bitwarden_id': ids['admin'],
+             'forgejo_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'forgejo_s3_postgres_credentials_bitwarden_id': ids['s3_db'],
+             'forgejo_s3_forgejo_credentials_bitwarden_id': ids['s3'],
+             'forgejo_s3_backups_credentials_bitwarden_id': ids['s3_backups']})
 
     # reload the bitwarden ESO provider
     try:
@@ -7,7 +7,7 @@ from smol_k8s_lab.k8s_tools.restores import (restore_seaweedfs,
                                              k8up_restore_pvc)
 from smol_k8s_lab.utils.passwords import create_password
 from smol_k8s_lab.utils.rich_cli.console_logging import sub_header, header
-from smol_k8s_lab.utils.run.subproc import subproc
+from smol_k8s_lab.utils.run.subproc import asubproc
 from smol_k8s_lab.utils.value_from import extract_secret, process_backup_vals
 
 # external libraries
@@ -173,9 +173,9 @@ async def configure_ghost(argocd: ArgoCD,
             argocd.wait_for_app('ghost-web-app')
 
             # create admin credentials
-            password = create_user(ghost_admin_username,
-                                   ghost_admin_email,
-                                   cfg['argo']['namespace'])
+            password = await create_user(ghost_admin_username,
+                                         ghost_admin_email,
+                                         cfg['argo']['namespace'])
             if bitwarden:
                 sub_header("Creating secrets in Bitwarden")
                 bitwarden.create_login(
@@ -192,7 +192,7 @@ async def configure_ghost(argocd: ArgoCD,
             refresh_bweso(argocd, ghost_hostname, bitwarden)
 
 
-def create_user(user: str, email: str, pod_namespace: str) -> str:
+async def create_user(user: str, email: str, pod_namespace: str) -> str:
     """
     given a username, email, and namespace of the ghost pod, we'll create a
     new ghost user using a kubectl exec command and then we return
@@ -206,7 +206,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
             " --no-headers "
             "-o custom-columns=NAME:.metadata.name"
             )
-    pod = subproc([pod_cmd]).rstrip()
+    pod = (await asubproc([pod_cmd])).rstrip()
     log.info(f"ghost web app pod is: {pod}")
 
     # generate a random password
@@ -218,7 +218,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
            f'--username {user} --email {email} --password \'{password}\'"')
 
     # then process the output from the command
-    subproc([cmd], shell=True, universal_newlines=True)
+    await asubproc([cmd], shell=True, universal_newlines=True)
 
     # then run the user promotion (to admin) command
     cmd = (f'kubectl exec -n {pod_namespace} {pod} -- /bin/sh -c '
@@ -226,7 +226,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
            f'account promote --username {user}"')
 
     # then process the output from the command
-    subproc([cmd], shell=True, universal_newlines=True).split()[3]
+    (await asubproc([cmd], shell=True, universal_newlines=True)).split()[3]
 
     return password
 
@@ -313,7 +313,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
                                                s3_endpoint.replace("https://",
                                                                    ""))
     ghost_s3_bucket_obj = create_custom_field("s3Bucket", "ghost")
-    s3_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='ghost-user-s3-credentials',
             item_url=ghost_hostname,
             user=s3_access_id,
@@ -326,7 +328,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='ghost-admin-s3-credentials',
             item_url=ghost_hostname,
             user="ghost-root",
@@ -335,7 +337,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='ghost-backups-s3-credentials',
             item_url=ghost_hostname,
             user=backups_s3_user,
@@ -347,7 +349,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     ghost_mysql_password = bitwarden.generate()
     mysql_pass_obj = create_custom_field("mysqlPassword",
                                          ghost_mysql_password)
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='ghost-mysql-credentials',
             item_url=ghost_hostname,
             user='ghost',
@@ -358,7 +360,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # SMTP credentials
     ghost_smtp_host_obj = create_custom_field("smtpHostname", mail_host)
     ghost_smtp_port_obj = create_custom_field("smtpPort", mail_port)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='ghost-smtp-credentials',
             item_url=ghost_hostname,
             user=mail_user,
@@ -381,27 +383,29 @@ def setup_bitwarden_items(argocd: ArgoCD,
     if oidc_creds:
         log.debug("Creating OIDC credentials for ghost in Bitwarden...")
         issuer_obj = create_custom_field("issuer", f"https://{zitadel_hostname}")
-        oidc_id = bitwarden.create_login(
+        logins['oidc'] = dict(
                 name='ghost-oidc-credentials',
                 item_url=ghost_hostname,
                 user=oidc_creds['client_id'],
                 password=oidc_creds['client_secret'],
                 fields=[issuer_obj]
                 )
-    else:
-        oidc_id = bitwarden.get_item(
+
+    ids = bitwarden.create_logins(logins)
+    if not oidc_creds:
+        ids['oidc'] = bitwarden.get_item(
                 f"ghost-oidc-credentials-{ghost_hostname}"
                 )[0]['id']
 
     # update the ghost values for the argocd appset
     # 'ghost_admin_credentials_bitwarden_id': admin_id,
     argocd.update_appset_secret(
-            {'ghost_smtp_credentials_bitwarden_id': smtp_id,
-             'ghost_oidc_credentials_bitwarden_id': oidc_id,
-             'ghost_mysql_credentials_bitwarden_id': db_id,
-             'ghost_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'ghost_s3_ghost_credentials_bitwarden_id': s3_id,
-             'ghost_s3_backups_credentials_bitwarden_id': s3_backups_id})
+            {'ghost_smtp_credentials_bitwarden_id': ids['smtp'],
+             'ghost_oidc_credentials_bitwarden_id': ids['oidc'],
+             'ghost_mysql_credentials_bitwarden_id': ids['db'],
+             'ghost_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'ghost_s3_ghost_credentials_bitwarden_id': ids['s3'],
+             'ghost_s3_backups_credentials_bitwarden_id': ids['s3_backups']})
 
     # reload the bitwarden ESO provider
     try:
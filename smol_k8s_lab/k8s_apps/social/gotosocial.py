@@ -9,7 +9,7 @@ from smol_k8s_lab.k8s_tools.restores import (restore_seaweedfs,
                                              restore_cnpg_cluster)
 from smol_k8s_lab.utils.passwords import create_password
 from smol_k8s_lab.utils.rich_cli.console_logging import sub_header, header
-from smol_k8s_lab.utils.run.subproc import subproc
+from smol_k8s_lab.utils.run.subproc import asubproc
 from smol_k8s_lab.utils.value_from import extract_secret, process_backup_vals
 
 # external libraries
@@ -182,9 +182,9 @@ async def configure_gotosocial(
             argocd.wait_for_app('gotosocial-web-app')
 
             # create admin credentials
-            password = create_user(gotosocial_admin_username,
-                                   gotosocial_admin_email,
-                                   cfg['argo']['namespace'])
+            password = await create_user(gotosocial_admin_username,
+                                         gotosocial_admin_email,
+                                         cfg['argo']['namespace'])
             if bitwarden:
                 sub_header("Creating secrets in Bitwarden")
                 bitwarden.create_login(
@@ -201,7 +201,7 @@ async def configure_gotosocial(
             refresh_bweso(argocd, gotosocial_hostname, bitwarden)
 
 
-def create_user(user: str, email: str, pod_namespace: str) -> str:
+async def create_user(user: str, email: str, pod_namespace: str) -> str:
     """
     given a username, email, and namespace of the gotosocial pod, we'll create a
     new gotosocial user using a kubectl exec command and then we return
@@ -215,7 +215,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
             " --no-headers "
             "-o custom-columns=NAME:.metadata.name"
             )
-    pod = subproc([pod_cmd]).rstrip()
+    pod = (await asubproc([pod_cmd])).rstrip()
     log.info(f"gotosocial web app pod is: {pod}")
 
     # generate a random password
@@ -227,7 +227,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
            f'--username {user} --email {email} --password \'{password}\'"')
 
     # then process the output from the command
-    subproc([cmd], shell=True, universal_newlines=True)
+    await asubproc([cmd], shell=True, universal_newlines=True)
 
     # then run the user promotion (to admin) command
     cmd = (f'kubectl exec -n {pod_namespace} {pod} -- /bin/sh -c '
@@ -235,7 +235,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
            f'account promote --username {user}"')
 
     # then process the output from the command
-    subproc([cmd], shell=True, universal_newlines=True).split()[3]
+    (await asubproc([cmd], shell=True, universal_newlines=True)).split()[3]
 
     return password
 
@@ -331,7 +331,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
                                                s3_endpoint.replace("https://",
                                                                    ""))
     gotosocial_s3_bucket_obj = create_custom_field("s3Bucket", "gotosocial")
-    s3_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='gotosocial-user-s3-credentials',
             item_url=gotosocial_hostname,
             user=s3_access_id,
@@ -344,7 +346,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     pgsql_s3_key = create_password()
-    s3_db_id = bitwarden.create_login(
+    logins['s3_db'] = dict(
             name='gotosocial-postgres-s3-credentials',
             item_url=gotosocial_hostname,
             user="gotosocial-postgres",
@@ -352,7 +354,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='gotosocial-admin-s3-credentials',
             item_url=gotosocial_hostname,
             user="gotosocial-root",
@@ -361,7 +363,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='gotosocial-backups-s3-credentials',
             item_url=gotosocial_hostname,
             user=backups_s3_user,
@@ -373,7 +375,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     gotosocial_pgsql_password = bitwarden.generate()
     postrges_pass_obj = create_custom_field("postgresPassword",
                                             gotosocial_pgsql_password)
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='gotosocial-pgsql-credentials',
             item_url=gotosocial_hostname,
             user='gotosocial',
@@ -384,7 +386,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # SMTP credentials
     gotosocial_smtp_host_obj = create_custom_field("smtpHostname", mail_host)
     gotosocial_smtp_port_obj = create_custom_field("smtpPort", mail_port)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='gotosocial-smtp-credentials',
             item_url=gotosocial_hostname,
             user=mail_user,
@@ -407,28 +409,30 @@ def setup_bitwarden_items(argocd: ArgoCD,
     if oidc_creds:
         log.debug("Creating OIDC credentials for gotosocial in Bitwarden...")
         issuer_obj = create_custom_field("issuer", f"https://{zitadel_hostname}")
-        oidc_id = bitwarden.create_login(
+        logins['oidc'] = dict(
                 name='gotosocial-oidc-credentials',
                 item_url=gotosocial_hostname,
                 user=oidc_creds['client_id'],
                 password=oidc_creds['client_secret'],
                 fields=[issuer_obj]
                 )
-    else:
-        oidc_id = bitwarden.get_item(
+
+    ids = bitwarden.create_logins(logins)
+    if not oidc_creds:
+        ids['oidc'] = bitwarden.get_item(
                 f"gotosocial-oidc-credentials-{gotosocial_hostname}"
                 )[0]['id']
 
     # update the gotosocial values for the argocd appset
     # 'gotosocial_admin_credentials_bitwarden_id': admin_id,
     argocd.update_appset_secret(
-            {'gotosocial_smtp_credentials_bitwarden_id': smtp_id,
-             'gotosocial_oidc_credentials_bitwarden_id': oidc_id,
-             'gotosocial_postgres_credentials_bitwarden_id': db_id,
-             'gotosocial_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'gotosocial_s3_postgres_credentials_bitwarden_id': s3_db_id,
-             'gotosocial_s3_gotosocial_credentials_bitwarden_id': s3_id,
-             'gotosocial_s3_backups_credentials_bitwarden_id': s3_backups_id})
+            {'gotosocial_smtp_credentials_bitwarden_id': ids['smtp'],
+             'gotosocial_oidc_credentials_bitwarden_id': ids['oidc'],
+             'gotosocial_postgres_credentials_bitwarden_id': ids['db'],
+             'gotosocial_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'gotosocial_s3_postgres_credentials_bitwarden_id': ids['s3_db'],
+             'gotosocial_s3_gotosocial_credentials_bitwarden_id': ids['s3'],
+             'gotosocial_s3_backups_credentials_bitwarden_id': ids['s3_backups']})
 
     # reload the bitwarden ESO provider
     try:
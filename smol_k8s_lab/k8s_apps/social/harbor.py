@@ -304,7 +304,10 @@ def setup_bitwarden_items(argocd: ArgoCD,
                                                s3_endpoint.replace("https://",
                                                                    ""))
     harbor_s3_bucket_obj = create_custom_field("s3Bucket", "harbor")
-    s3_id = bitwarden.create_login(
+
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='harbor-user-s3-credentials',
             item_url=harbor_hostname,
             user=s3_access_id,
@@ -318,7 +321,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # postgresql S3 creds
     pgsql_s3_key = create_password()
-    s3_db_id = bitwarden.create_login(
+    logins['s3_db'] = dict(
             name='harbor-postgres-s3-credentials',
             item_url=harbor_hostname,
             user="harbor-postgres",
@@ -327,7 +330,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # harbor admin S3 creds
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='harbor-admin-s3-credentials',
             item_url=harbor_hostname,
             user="harbor-root",
@@ -336,7 +339,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='harbor-backups-s3-credentials',
             item_url=harbor_hostname,
             user=backups_s3_user,
@@ -348,7 +351,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     harbor_pgsql_password = bitwarden.generate()
     postrges_pass_obj = create_custom_field("postgresPassword",
                                             harbor_pgsql_password)
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='harbor-pgsql-credentials',
             item_url=harbor_hostname,
             user='harbor',
@@ -358,7 +361,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # valkey credentials
     harbor_valkey_password = bitwarden.generate()
-    valkey_id = bitwarden.create_login(
+    logins['valkey'] = dict(
             name='harbor-valkey-credentials',
             item_url=harbor_hostname,
             user='harbor',
@@ -367,7 +370,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # SMTP credentials
     harbor_smtp_host_obj = create_custom_field("smtpHostname", mail_host)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='harbor-smtp-credentials',
             item_url=harbor_hostname,
             user=mail_user,
@@ -379,7 +382,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     admin_password = create_password()
     # for harbor encryption key, must be 16 characters
     secret_key_obj = create_custom_field("secretKey", create_password(False, 16))
-    admin_id = bitwarden.create_login(
+    logins['admin'] = dict(
             name='harbor-admin-credentials',
             item_url=harbor_hostname,
             user=admin_user,
@@ -390,7 +393,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # initial registry credentials for harbor
     registry_username = create_password(False, 12)
     registry_password = create_password()
-    registry_id = bitwarden.create_login(
+    logins['registry'] = dict(
             name='harbor-registry-credentials',
             item_url=harbor_hostname,
             user=registry_username,
@@ -401,30 +404,32 @@ def setup_bitwarden_items(argocd: ArgoCD,
     if oidc_creds:
         log.debug("Creating OIDC credentials for harbor in Bitwarden...")
         issuer_obj = create_custom_field("issuer", f"https://{zitadel_hostname}")
-        oidc_id = bitwarden.create_login(
+        logins['oidc'] = dict(
                 name='harbor-oidc-credentials',
                 item_url=harbor_hostname,
                 user=oidc_creds['client_id'],
                 password=oidc_creds['client_secret'],
                 fields=[issuer_obj]
                 )
-    else:
-        oidc_id = bitwarden.get_item(
+
+    ids = bitwarden.create_logins(logins)
+    if not oidc_creds:
+        ids['oidc'] = bitwarden.get_item(
                 f"harbor-oidc-credentials-{harbor_hostname}"
                 )[0]['id']
 
     # update the harbor values for the argocd appset
     argocd.update_appset_secret(
-            {'harbor_smtp_credentials_bitwarden_id': smtp_id,
-             'harbor_oidc_credentials_bitwarden_id': oidc_id,
-             'harbor_postgres_credentials_bitwarden_id': db_id,
-             'harbor_valkey_bitwarden_id': valkey_id,
-             'harbor_registry_credentials_bitwarden_id': registry_id,
-             'harbor_admin_credentials_bitwarden_id': admin_id,
-             'harbor_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'harbor_s3_postgres_credentials_bitwarden_id': s3_db_id,
-             'harbor_s3_harbor_credentials_bitwarden_id': s3_id,
-             'harbor_s3_backups_credentials_bitwarden_id': s3_backups_id})
+            {'harbor_smtp_credentials_bitwarden_id': ids['smtp'],
+             'harbor_oidc_credentials_bitwarden_id': ids['oidc'],
+             'harbor_postgres_credentials_bitwarden_id': ids['db'],
+             'harbor_valkey_bitwarden_id': ids['valkey'],
+             'harbor_registry_credentials_bitwarden_id': ids['registry'],
+             'harbor_admin_credentials_bitwarden_id': ids['admin'],
+             'harbor_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'harbor_s3_postgres_credentials_bitwarden_id': ids['s3_db'],
+             'harbor_s3_harbor_credentials_bitwarden_id': ids['s3'],
+             'harbor_s3_backups_credentials_bitwarden_id': ids['s3_backups']})
 
     # reload the bitwarden ESO provider
     try:
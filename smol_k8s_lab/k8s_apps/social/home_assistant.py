@@ -228,7 +228,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
     admin_name_field = create_custom_field('name', admin_name)
     admin_lang_field = create_custom_field('language', admin_language)
     admin_password = bitwarden.generate()
-    admin_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['admin'] = dict(
             name=f'home-assistant-admin-credentials-{home_assistant_hostname}',
             item_url=home_assistant_hostname,
             user=admin_user,
@@ -238,7 +240,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='home-assistant-backups-s3-credentials',
             item_url=home_assistant_hostname,
             user=backups_s3_user,
@@ -246,10 +248,12 @@ def setup_bitwarden_items(argocd: ArgoCD,
             fields=[restic_repo_pass_obj]
             )
 
+    ids = bitwarden.create_logins(logins)
+
     # update the home-assistant values for the argocd appset
     argocd.update_appset_secret(
-            {'home_assistant_admin_credentials_bitwarden_id': admin_id,
-             'home_assistant_s3_backups_credentials_bitwarden_id': s3_backups_id}
+            {'home_assistant_admin_credentials_bitwarden_id': ids['admin'],
+             'home_assistant_s3_backups_credentials_bitwarden_id': ids['s3_backups']}
             )
 
 
@@ -8,7 +8,7 @@ from smol_k8s_lab.k8s_tools.restores import (restore_seaweedfs,
                                              restore_cnpg_cluster)
 from smol_k8s_lab.utils.passwords import create_password
 from smol_k8s_lab.utils.rich_cli.console_logging import sub_header, header
-from smol_k8s_lab.utils.run.subproc import subproc
+from smol_k8s_lab.utils.run.subproc import asubproc
 from smol_k8s_lab.utils.value_from import extract_secret, process_backup_vals
 
 # external libraries
@@ -170,9 +170,9 @@ async def configure_mastodon(argocd: ArgoCD,
             argocd.wait_for_app('mastodon-web-app')
 
             # create admin credentials
-            password = create_user(mastodon_admin_username,
-                                   mastodon_admin_email,
-                                   cfg['argo']['namespace'])
+            password = await create_user(mastodon_admin_username,
+                                         mastodon_admin_email,
+                                         cfg['argo']['namespace'])
             if bitwarden:
                 sub_header("Creating secrets in Bitwarden")
                 bitwarden.create_login(
@@ -189,7 +189,7 @@ async def configure_mastodon(argocd: ArgoCD,
             refresh_bweso(argocd, mastodon_hostname, mastodon_libretranslate_hostname, libre_api_key, bitwarden)
 
 
-def create_user(user: str, email: str, pod_namespace: str) -> str:
+async def create_user(user: str, email: str, pod_namespace: str) -> str:
     """
     given a username, email, and namespace of the mastodon pod, we'll create a
     new mastodon user via tootctl using a kubectl exec command and then we return
@@ -203,7 +203,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
             " --no-headers "
             "-o custom-columns=NAME:.metadata.name"
             )
-    pod = subproc([pod_cmd]).rstrip()
+    pod = (await asubproc([pod_cmd])).rstrip()
     log.info(f"Mastodon web app pod is: {pod}")
 
     # then run the user creation command
@@ -211,9 +211,9 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
            f'accounts create {user} --email {email} --confirmed --role Owner"')
 
     # then process the output from the command and return it
-    res = subproc([cmd],
-                  shell=True,
-                  universal_newlines=True).split()[3]
+    res = (await asubproc([cmd],
+                          shell=True,
+                          universal_newlines=True)).split()[3]
     print(f"password returned is: {res}")
     return res
 
@@ -330,7 +330,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
                                                s3_endpoint.replace("https://",
                                                                    ""))
     mastodon_s3_bucket_obj = create_custom_field("s3Bucket", "mastodon")
-    s3_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='mastodon-user-s3-credentials',
             item_url=mastodon_hostname,
             user=s3_access_id,
@@ -343,7 +345,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     pgsql_s3_key = create_password()
-    s3_db_id = bitwarden.create_login(
+    logins['s3_db'] = dict(
             name='mastodon-postgres-s3-credentials',
             item_url=mastodon_hostname,
             user="mastodon-postgres",
@@ -351,7 +353,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='mastodon-admin-s3-credentials',
             item_url=mastodon_hostname,
             user="mastodon-root",
@@ -360,7 +362,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='mastodon-backups-s3-credentials',
             item_url=mastodon_hostname,
             user=backups_s3_user,
@@ -370,7 +372,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # elastic search password
     mastodon_elasticsearch_password = bitwarden.generate()
-    elastic_id = bitwarden.create_login(
+    logins['elastic'] = dict(
             name='mastodon-elasticsearch-credentials',
             item_url=mastodon_hostname,
             user='mastodon',
@@ -381,7 +383,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     mastodon_pgsql_password = bitwarden.generate()
     postrges_pass_obj = create_custom_field("postgresPassword",
                                             mastodon_pgsql_password)
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='mastodon-pgsql-credentials',
             item_url=mastodon_hostname,
             user='mastodon',
@@ -391,7 +393,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # valkey credentials
     mastodon_valkey_password = bitwarden.generate()
-    valkey_id = bitwarden.create_login(
+    logins['valkey'] = dict(
             name='mastodon-valkey-credentials',
             item_url=mastodon_hostname,
             user='mastodon',
@@ -400,7 +402,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # SMTP credentials
     mastodon_smtp_host_obj = create_custom_field("smtpHostname", mail_host)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='mastodon-smtp-credentials',
             item_url=mastodon_hostname,
             user=mail_user,
@@ -449,7 +451,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             rake_secrets['ACTIVE_RECORD_ENCRYPTION_PRIMARY_KEY']
             )
 
-    secrets_id = bitwarden.create_login(
+    logins['secrets'] = dict(
             name='mastodon-server-secrets',
             item_url=mastodon_hostname,
             user="mastodon",
@@ -466,7 +468,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     endpoint = create_custom_field('endpoint', mastodon_libretranslate_hostname)
-    libretranslate_api_key_id = bitwarden.create_login(
+    logins['libretranslate_api_key'] = dict(
             name=f'mastodon-libretranslate-credentials-{mastodon_hostname}',
             item_url=mastodon_libretranslate_hostname,
             user="n/a",
@@ -474,19 +476,21 @@ def setup_bitwarden_items(argocd: ArgoCD,
             fields=[endpoint]
             )
 
+    ids = bitwarden.create_logins(logins)
+
     # update the mastodon values for the argocd appset
     # 'mastodon_admin_credentials_bitwarden_id': admin_id,
     argocd.update_appset_secret(
-            {'mastodon_smtp_credentials_bitwarden_id': smtp_id,
-             'mastodon_postgres_credentials_bitwarden_id': db_id,
-             'mastodon_valkey_bitwarden_id': valkey_id,
-             'mastodon_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'mastodon_s3_postgres_credentials_bitwarden_id': s3_db_id,
-             'mastodon_s3_mastodon_credentials_bitwarden_id': s3_id,
-             'mastodon_s3_backups_credentials_bitwarden_id': s3_backups_id,
-             'mastodon_elasticsearch_credentials_bitwarden_id': elastic_id,
-             'mastodon_server_secrets_bitwarden_id': secrets_id,
-             'mastodon_libretranslate_bitwarden_id': libretranslate_api_key_id})
+            {'mastodon_smtp_credentials_bitwarden_id': ids['smtp'],
+             'mastodon_postgres_credentials_bitwarden_id': ids['db'],
+             'mastodon_valkey_bitwarden_id': ids['valkey'],
+             'mastodon_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'mastodon_s3_postgres_credentials_bitwarden_id': ids['s3_db'],
+             'mastodon_s3_mastodon_credentials_bitwarden_id': ids['s3'],
+             'mastodon_s3_backups_credentials_bitwarden_id': ids['s3_backups'],
+             'mastodon_elasticsearch_credentials_bitwarden_id': ids['elastic'],
+             'mastodon_server_secrets_bitwarden_id': ids['secrets'],
+             'mastodon_libretranslate_bitwarden_id': ids['libretranslate_api_key']})
 
     # reload the bitwarden ESO provider
     try:
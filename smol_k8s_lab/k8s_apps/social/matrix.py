@@ -421,7 +421,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
     matrix_s3_host_obj = create_custom_field("s3Hostname",
                                              s3_endpoint.replace("https://", ""))
     matrix_s3_bucket_obj = create_custom_field("s3Bucket", s3_bucket)
-    s3_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='matrix-user-s3-credentials',
             item_url=matrix_hostname,
             user=s3_access_id,
@@ -434,7 +436,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     pgsql_s3_key = create_password()
-    s3_db_id = bitwarden.create_login(
+    logins['s3_db'] = dict(
             name='matrix-postgres-s3-credentials',
             item_url=matrix_hostname,
             user="matrix-postgres",
@@ -442,7 +444,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='matrix-admin-s3-credentials',
             item_url=matrix_hostname,
             user="matrix-root",
@@ -451,7 +453,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='matrix-backups-s3-credentials',
             item_url=matrix_hostname,
             user=backups_s3_user,
@@ -464,7 +466,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
                                       f"matrix-postgres-rw.{matrix_namespace}.svc")
     # the database name
     db_obj = create_custom_field("database", "matrix")
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='matrix-pgsql-credentials',
             item_url=matrix_hostname,
             user='matrix',
@@ -478,7 +480,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     mas_db_obj = create_custom_field("database", "mas")
     # MAS doesn't support TLS auth to databases yet
     mas_db_pw = create_password()
-    mas_db_id = bitwarden.create_login(
+    logins['mas_db'] = dict(
             name='mas-pgsql-credentials',
             item_url=matrix_hostname,
             user='mas',
@@ -492,7 +494,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
                 "sslkey=/etc/secrets/syncv3/tls.key "
                 "sslcert=/etc/secrets/syncv3/tls.crt "
                 "sslrootcert=/etc/secrets/ca/ca.crt")
-    sync_db_id = bitwarden.create_login(
+    logins['sync_db'] = dict(
             name='syncv3-pgsql-credentials',
             item_url=matrix_hostname,
             user='syncv3',
@@ -501,7 +503,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # SMTP credentials
     matrix_smtp_host_obj = create_custom_field("smtpHostname", mail_host)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='matrix-smtp-credentials',
             item_url=matrix_hostname,
             user=mail_user,
@@ -511,7 +513,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # registration key
     matrix_registration_key = bitwarden.generate()
-    reg_id = bitwarden.create_login(
+    logins['reg'] = dict(
             name='matrix-registration-key',
             item_url=matrix_hostname,
             user="admin",
@@ -523,7 +525,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     alertmanager_as_token_obj = create_custom_field("as_token", alertmanager_as_token)
     alertmanager_hs_token = bitwarden.generate()
     alertmanager_hs_token_obj = create_custom_field("hs_token", alertmanager_hs_token)
-    alertmanager_id = bitwarden.create_login(
+    logins['alertmanager'] = dict(
             name='matrix-alertmanager-bridge',
             item_url=matrix_hostname,
             user="none",
@@ -535,7 +537,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     discord_as_token_obj = create_custom_field("as_token", discord_as_token)
     discord_hs_token = bitwarden.generate()
     discord_hs_token_obj = create_custom_field("hs_token", discord_hs_token)
-    discord_id = bitwarden.create_login(
+    logins['discord'] = dict(
             name='matrix-discord-bridge',
             item_url=matrix_hostname,
             user="none",
@@ -543,7 +545,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     # matrix sliding sync
-    sync_id = bitwarden.create_login(
+    logins['sync'] = dict(
             name='matrix-syncv3-credentials',
             item_url=matrix_hostname,
             user="syncv3",
@@ -563,7 +565,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             idp_name_obj = create_custom_field("idp_name", idp_name)
 
             # for the credentials to zitadel
-            oidc_id = bitwarden.create_login(
+            logins['oidc'] = dict(
                     name='matrix-oidc-credentials',
                     item_url=matrix_hostname,
                     user=oidc_creds['client_id'],
@@ -576,39 +578,41 @@ def setup_bitwarden_items(argocd: ArgoCD,
             acct_url_obj = create_custom_field("account_management_url", issuer_url)
             issuer_obj = create_custom_field("issuer", mas_issuer)
             provider_ulid_obj = create_custom_field("provider_id", mas_provider_ulid)
-            mas_id = bitwarden.create_login(
+            logins['mas'] = dict(
                     name='matrix-authentication-service-credentials',
                     item_url=matrix_hostname,
                     user=mas_client_id,
                     password=mas_client_secret,
                     fields=[issuer_obj, mas_token_obj, acct_url_obj, provider_ulid_obj]
                     )
-        else:
-            # we assume the credentials already exist if they fail to create
-            oidc_id = bitwarden.get_item(
-                    f"matrix-oidc-credentials-{matrix_hostname}"
-                    )[0]['id']
-            mas_id = bitwarden.get_item(
-                    f"matrix-authentication-service-credentials-{matrix_hostname}"
-                    )[0]['id']
+
+    ids = bitwarden.create_logins(logins)
+    if zitadel_hostname and not oidc_creds:
+        # we assume the credentials already exist if they fail to create
+        ids['oidc'] = bitwarden.get_item(
+                f"matrix-oidc-credentials-{matrix_hostname}"
+                )[0]['id']
+        ids['mas'] = bitwarden.get_item(
+                f"matrix-authentication-service-credentials-{matrix_hostname}"
+                )[0]['id']
 
     # update the matrix values for the argocd appset
     # 'matrix_trusted_key_servers_bitwarden_id': trusted_key_servers_id}
     argocd.update_appset_secret(
-            {'matrix_registration_credentials_bitwarden_id': reg_id,
-             'matrix_smtp_credentials_bitwarden_id': smtp_id,
-             'matrix_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'matrix_s3_postgres_credentials_bitwarden_id': s3_db_id,
-             'matrix_s3_matrix_credentials_bitwarden_id': s3_id,
-             'matrix_s3_backups_credentials_bitwarden_id': s3_backups_id,
-             'matrix_postgres_credentials_bitwarden_id': db_id,
-             'matrix_sliding_sync_bitwarden_id': sync_id,
-             'matrix_mas_postgres_credentials_bitwarden_id': mas_db_id,
-             'matrix_sliding_sync_postgres_credentials_bitwarden_id': sync_db_id,
-             'matrix_oidc_credentials_bitwarden_id': oidc_id,
-             'matrix_authentication_service_bitwarden_id': mas_id,
-             'matrix_alertmanager_bitwarden_id': alertmanager_id,
-             'matrix_discord_bitwarden_id': discord_id,
+            {'matrix_registration_credentials_bitwarden_id': ids['reg'],
+             'matrix_smtp_credentials_bitwarden_id': ids['smtp'],
+             'matrix_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'matrix_s3_postgres_credentials_bitwarden_id': ids['s3_db'],
+             'matrix_s3_matrix_credentials_bitwarden_id': ids['s3'],
+             'matrix_s3_backups_credentials_bitwarden_id': ids['s3_backups'],
+             'matrix_postgres_credentials_bitwarden_id': ids['db'],
+             'matrix_sliding_sync_bitwarden_id': ids['sync'],
+             'matrix_mas_postgres_credentials_bitwarden_id': ids['mas_db'],
+             'matrix_sliding_sync_postgres_credentials_bitwarden_id': ids['sync_db'],
+             'matrix_oidc_credentials_bitwarden_id': ids['oidc'],
+             'matrix_authentication_service_bitwarden_id': ids['mas'],
+             'matrix_alertmanager_bitwarden_id': ids['alertmanager'],
+             'matrix_discord_bitwarden_id': ids['discord'],
              'matrix_idp_name': idp_name,
              'matrix_idp_id': idp_id}
             )
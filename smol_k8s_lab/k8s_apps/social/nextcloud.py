@@ -9,6 +9,7 @@ from smol_k8s_lab.k8s_tools.restores import (restore_seaweedfs,
                                              restore_cnpg_cluster)
 from smol_k8s_lab.utils.passwords import create_password
 from smol_k8s_lab.utils.rich_cli.console_logging import sub_header, header
+from smol_k8s_lab.utils.run.scheduler import call_in_main_thread
 from smol_k8s_lab.utils.run.subproc import subproc
 from smol_k8s_lab.utils.value_from import extract_secret, process_backup_vals
 
@@ -116,19 +117,11 @@ async def configure_nextcloud(
                                    access_key="nextcloud",
                                    secret_key=s3_access_key)
 
-        # configure SMTP
-        if not mail_host:
-            mail_host = Prompt.ask(
-                    "[green]Please enter the SMTP host for nextcoud"
-                    )
-
-        if not mail_user:
-            m = f"[green]Please enter an SMTP user for Nextcloud on server, {mail_host}"
-            mail_user = Prompt.ask(m)
-
-        if not mail_pass:
-            m = f"[green]Please enter the SMTP password of {mail_user} on {mail_host}"
-            mail_pass = Prompt.ask(m, password=True)
+        # configure SMTP. Other install steps may be running, so we ask for
+        # anything missing in the main thread
+        mail_host, mail_user, mail_pass = call_in_main_thread(
+                ask_for_smtp, mail_host, mail_user, mail_pass
+                )
 
         # configure OIDC
         if zitadel and not restore_enabled:
@@ -229,6 +222,27 @@ async def configure_nextcloud(
                           bitwarden)
 
 
+def ask_for_smtp(mail_host: str, mail_user: str, mail_pass: str) -> tuple:
+    """
+    prompts the user for any of the SMTP host, user, and password that are
+    empty, and returns (mail_host, mail_user, mail_pass)
+    """
+    if not mail_host:
+        mail_host = Prompt.ask(
+                "[green]Please enter the SMTP host for nextcoud"
+                )
+
+    if not mail_user:
+        m = f"[green]Please enter an SMTP user for Nextcloud on server, {mail_host}"
+        mail_user = Prompt.ask(m)
+
+    if not mail_pass:
+        m = f"[green]Please enter the SMTP password of {mail_user} on {mail_host}"
+        mail_pass = Prompt.ask(m, password=True)
+
+    return mail_host, mail_user, mail_pass
+
+
 def restore_nextcloud(argocd: ArgoCD,
                       nextcloud_hostname: str,
                       collabora_hostname: str,
@@ -387,7 +401,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # s3 credentials creation
     bucket_obj = create_custom_field('bucket', "nextcloud-data")
     endpoint_obj = create_custom_field('endpoint', s3_endpoint)
-    s3_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='nextcloud-user-s3-credentials',
             item_url=nextcloud_hostname,
             user="nextcloud",
@@ -396,7 +412,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     pgsql_s3_key = create_password()
-    s3_db_id = bitwarden.create_login(
+    logins['s3_db'] = dict(
             name='nextcloud-postgres-s3-credentials',
             item_url=nextcloud_hostname,
             user="nextcloud-postgres",
@@ -404,7 +420,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='nextcloud-admin-s3-credentials',
             item_url=nextcloud_hostname,
             user="nextcloud-root",
@@ -413,7 +429,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='nextcloud-backups-s3-credentials',
             item_url=nextcloud_hostname,
             user=backups_s3_user,
@@ -425,23 +441,19 @@ def setup_bitwarden_items(argocd: ArgoCD,
     if oidc_creds:
         log.debug("Creating OIDC credentials for Nextcloud in Bitwarden...")
         issuer_obj = create_custom_field("issuer", f"https://{zitadel_hostname}")
-        oidc_id = bitwarden.create_login(
+        logins['oidc'] = dict(
                 name='nextcloud-oidc-credentials',
                 item_url=nextcloud_hostname,
                 user=oidc_creds['client_id'],
                 password=oidc_creds['client_secret'],
                 fields=[issuer_obj]
                 )
-    else:
-        oidc_id = bitwarden.get_item(
-                f"nextcloud-oidc-credentials-{nextcloud_hostname}"
-                )[0]['id']
 
     # admin credentials + metrics server info token
     token = bitwarden.generate()
     admin_password = bitwarden.generate()
     serverinfo_token_obj = create_custom_field("serverInfoToken", token)
-    admin_id = bitwarden.create_login(
+    logins['admin'] = dict(
             name='nextcloud-admin-credentials',
             item_url=nextcloud_hostname,
             user=admin_user,
@@ -450,7 +462,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     # collabora admin credentials for initial owner user
-    collabora_admin_id = bitwarden.create_login(
+    logins['collabora_admin'] = dict(
             name=f'collabora-admin-credentials-{collabora_hostname}',
             item_url=collabora_hostname,
             user=collabora_user,
@@ -459,7 +471,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # smtp credentials
     smtpHost = create_custom_field("hostname", mail_host)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='nextcloud-smtp-credentials',
             item_url=nextcloud_hostname,
             user=mail_user,
@@ -468,7 +480,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     # postgres db credentials creation
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='nextcloud-pgsql-credentials',
             item_url=nextcloud_hostname,
             user='nextcloud',
@@ -477,25 +489,31 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # redis credentials creation
     nextcloud_redis_password = bitwarden.generate()
-    redis_id = bitwarden.create_login(
+    logins['redis'] = dict(
             name='nextcloud-redis-credentials',
             item_url=nextcloud_hostname,
             user='nextcloud',
             password=nextcloud_redis_password
             )
 
+    ids = bitwarden.create_logins(logins)
+    if not oidc_creds:
+        ids['oidc'] = bitwarden.get_item(
+                f"nextcloud-oidc-credentials-{nextcloud_hostname}"
+                )[0]['id']
+
     # update the nextcloud values for the argocd appset
     argocd.update_appset_secret(
-            {'nextcloud_admin_credentials_bitwarden_id': admin_id,
-             'nextcloud_oidc_credentials_bitwarden_id': oidc_id,
-             'nextcloud_smtp_credentials_bitwarden_id': smtp_id,
-             'nextcloud_postgres_credentials_bitwarden_id': db_id,
-             'nextcloud_redis_bitwarden_id': redis_id,
-             'nextcloud_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'nextcloud_s3_postgres_credentials_bitwarden_id': s3_db_id,
-             'nextcloud_s3_nextcloud_credentials_bitwarden_id': s3_id,
-             'nextcloud_s3_backups_credentials_bitwarden_id': s3_backups_id,
-             'collabora_admin_credentials_bitwarden_id': collabora_admin_id
+            {'nextcloud_admin_credentials_bitwarden_id': ids['admin'],
+             'nextcloud_oidc_credentials_bitwarden_id': ids['oidc'],
+             'nextcloud_smtp_credentials_bitwarden_id': ids['smtp'],
+             'nextcloud_postgres_credentials_bitwarden_id': ids['db'],
+             'nextcloud_redis_bitwarden_id': ids['redis'],
+             'nextcloud_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'nextcloud_s3_postgres_credentials_bitwarden_id': ids['s3_db'],
+             'nextcloud_s3_nextcloud_credentials_bitwarden_id': ids['s3'],
+             'nextcloud_s3_backups_credentials_bitwarden_id': ids['s3_backups'],
+             'collabora_admin_credentials_bitwarden_id': ids['collabora_admin']
             })
 
 
@@ -7,7 +7,7 @@ from smol_k8s_lab.k8s_tools.restores import (restore_seaweedfs,
                                              k8up_restore_pvc)
 from smol_k8s_lab.utils.passwords import create_password
 from smol_k8s_lab.utils.rich_cli.console_logging import sub_header, header
-from smol_k8s_lab.utils.run.subproc import subproc
+from smol_k8s_lab.utils.run.subproc import asubproc
 from smol_k8s_lab.utils.value_from import extract_secret, process_backup_vals
 
 # external libraries
@@ -175,9 +175,9 @@ async def configure_writefreely(
             argocd.wait_for_app('writefreely-web-app')
 
             # create admin credentials
-            password = create_user(writefreely_admin_username,
-                                   writefreely_admin_email,
-                                   cfg['argo']['namespace'])
+            password = await create_user(writefreely_admin_username,
+                                         writefreely_admin_email,
+                                         cfg['argo']['namespace'])
             if bitwarden:
                 sub_header("Creating secrets in Bitwarden")
                 bitwarden.create_login(
@@ -194,7 +194,7 @@ async def configure_writefreely(
             refresh_bweso(argocd, writefreely_hostname, bitwarden)
 
 
-def create_user(user: str, email: str, pod_namespace: str) -> str:
+async def create_user(user: str, email: str, pod_namespace: str) -> str:
     """
     given a username, email, and namespace of the writefreely pod, we'll create a
     new writefreely user using a kubectl exec command and then we return
@@ -208,7 +208,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
             " --no-headers "
             "-o custom-columns=NAME:.metadata.name"
             )
-    pod = subproc([pod_cmd]).rstrip()
+    pod = (await asubproc([pod_cmd])).rstrip()
     log.info(f"writefreely web app pod is: {pod}")
 
     # generate a random password
@@ -220,7 +220,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
            f'--username {user} --email {email} --password \'{password}\'"')
 
     # then process the output from the command
-    subproc([cmd], shell=True, universal_newlines=True)
+    await asubproc([cmd], shell=True, universal_newlines=True)
 
     # then run the user promotion (to admin) command
     cmd = (f'kubectl exec -n {pod_namespace} {pod} -- /bin/sh -c '
@@ -228,7 +228,7 @@ def create_user(user: str, email: str, pod_namespace: str) -> str:
            f'account promote --username {user}"')
 
     # then process the output from the command
-    subproc([cmd], shell=True, universal_newlines=True).split()[3]
+    (await asubproc([cmd], shell=True, universal_newlines=True)).split()[3]
 
     return password
 
@@ -315,7 +315,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
                                                s3_endpoint.replace("https://",
                                                                    ""))
     writefreely_s3_bucket_obj = create_custom_field("s3Bucket", "writefreely")
-    s3_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='writefreely-user-s3-credentials',
             item_url=writefreely_hostname,
             user=s3_access_id,
@@ -328,7 +330,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
             )
 
     admin_s3_key = create_password()
-    s3_admin_id = bitwarden.create_login(
+    logins['s3_admin'] = dict(
             name='writefreely-admin-s3-credentials',
             item_url=writefreely_hostname,
             user="writefreely-root",
@@ -337,7 +339,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='writefreely-backups-s3-credentials',
             item_url=writefreely_hostname,
             user=backups_s3_user,
@@ -349,7 +351,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     writefreely_mysql_password = bitwarden.generate()
     mysql_pass_obj = create_custom_field("mysqlPassword",
                                          writefreely_mysql_password)
-    db_id = bitwarden.create_login(
+    logins['db'] = dict(
             name='writefreely-mysql-credentials',
             item_url=writefreely_hostname,
             user='writefreely',
@@ -360,7 +362,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
     # SMTP credentials
     writefreely_smtp_host_obj = create_custom_field("smtpHostname", mail_host)
     writefreely_smtp_port_obj = create_custom_field("smtpPort", mail_port)
-    smtp_id = bitwarden.create_login(
+    logins['smtp'] = dict(
             name='writefreely-smtp-credentials',
             item_url=writefreely_hostname,
             user=mail_user,
@@ -383,27 +385,29 @@ def setup_bitwarden_items(argocd: ArgoCD,
     if oidc_creds:
         log.debug("Creating OIDC credentials for writefreely in Bitwarden...")
         issuer_obj = create_custom_field("issuer", f"https://{zitadel_hostname}")
-        oidc_id = bitwarden.create_login(
+        logins['oidc'] = dict(
                 name='writefreely-oidc-credentials',
                 item_url=writefreely_hostname,
                 user=oidc_creds['client_id'],
                 password=oidc_creds['client_secret'],
                 fields=[issuer_obj]
                 )
-    else:
-        oidc_id = bitwarden.get_item(
+
+    ids = bitwarden.create_logins(logins)
+    if not oidc_creds:
+        ids['oidc'] = bitwarden.get_item(
                 f"writefreely-oidc-credentials-{writefreely_hostname}"
                 )[0]['id']
 
     # update the writefreely values for the argocd appset
     # 'writefreely_admin_credentials_bitwarden_id': admin_id,
     argocd.update_appset_secret(
-            {'writefreely_smtp_credentials_bitwarden_id': smtp_id,
-             'writefreely_oidc_credentials_bitwarden_id': oidc_id,
-             'writefreely_mysql_credentials_bitwarden_id': db_id,
-             'writefreely_s3_admin_credentials_bitwarden_id': s3_admin_id,
-             'writefreely_s3_writefreely_credentials_bitwarden_id': s3_id,
-             'writefreely_s3_backups_credentials_bitwarden_id': s3_backups_id})
+            {'writefreely_smtp_credentials_bitwarden_id': ids['smtp'],
+             'writefreely_oidc_credentials_bitwarden_id': ids['oidc'],
+             'writefreely_mysql_credentials_bitwarden_id': ids['db'],
+             'writefreely_s3_admin_credentials_bitwarden_id': ids['s3_admin'],
+             'writefreely_s3_writefreely_credentials_bitwarden_id': ids['s3'],
+             'writefreely_s3_backups_credentials_bitwarden_id': ids['s3_backups']})
 
     # reload the bitwarden ESO provider
     try:
@@ -124,7 +124,9 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     juicefs_s3_bucket_obj = create_custom_field("s3Bucket", bucket_name)
 
-    s3_id = bitwarden.create_login(
+    # every login item we need, created all at once below
+    logins = {}
+    logins['s3'] = dict(
             name='juicefs-s3-credentials',
             item_url=juicefs_hostname,
             user=s3_access_key_id,
@@ -138,7 +140,7 @@ def setup_bitwarden_items(argocd: ArgoCD,
 
     # credentials for remote backups of the s3 PVC
     restic_repo_pass_obj = create_custom_field("resticRepoPassword", restic_repo_pass)
-    s3_backups_id = bitwarden.create_login(
+    logins['s3_backups'] = dict(
             name='juicefs-backups-s3-credentials',
             item_url=juicefs_hostname,
             user=backups_s3_user,
@@ -150,18 +152,20 @@ def setup_bitwarden_items(argocd: ArgoCD,
     juicefs_valkey_password = bitwarden.generate()
 
     # create the valkey secret in bitwarden
-    valkey_id = bitwarden.create_login(
+    logins['valkey'] = dict(
        name='juicefs-valkey-credentials',
        item_url=juicefs_hostname,
        user='valkey',
        password=juicefs_valkey_password
        )
 
+    ids = bitwarden.create_logins(logins)
+
     # update the juicefs values for the argocd appset
     argocd.update_appset_secret(
-            {'juicefs_s3_credentials_bitwarden_id': s3_id,
-             'juicefs_s3_backups_credentials_bitwarden_id': s3_backups_id,
-             'juicefs_valkey_credentials_bitwarden_id': valkey_id,
+            {'juicefs_s3_credentials_bitwarden_id': ids['s3'],
+             'juicefs_s3_backups_credentials_bitwarden_id': ids['s3_backups'],
+             'juicefs_valkey_credentials_bitwarden_id': ids['valkey'],
              'juicefs_valkey_pvc_storage_class': juicefs_valkey_pvc_storage_class,
              'juicefs_valkey_pvc_size': juicefs_valkey_pvc_size
              }
@@ -1,4 +1,5 @@
 # internal smol-k8s-lab libraries
+from ..constants import XDG_CACHE_DIR
 from ..k8s_tools.k8s_lib import K8s
 from ..utils.rich_cli.console_logging import sub_header, header
 from ..utils.run.subproc import subproc
@@ -7,85 +8,120 @@ from .kind import create_kind_cluster, delete_kind_cluster
 from .k3d import create_k3d_cluster, delete_k3d_cluster
 from .k3s import install_k3s_cluster, uninstall_k3s
 
+# external libraries
+from kubernetes import client, config
+
 # external libraries from standard lib
-from json import loads
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from json import dump, load
 import logging as log
+from os import path, replace
+from pathlib import Path
 from platform import machine, system
 from sys import exit
 
 
-def check_all_contexts() -> list:
+# the clusters we found last time, so the TUI can show them right away
+CLUSTER_CACHE = path.join(XDG_CACHE_DIR, 'clusters.json')
+
+
+def guess_distro(cluster_name: str, version: str) -> str:
     """
-    gets current context and returns and list of tuples like:
-        [(cluster_name, distro, version, platform)]
+    guess which k8s distro a cluster is, from its name and version
     """
-    start_context = subproc(["kubectl config current-context"],
-                            error_ok=True, quiet=True)
-    print(f"Current context at the start is {start_context}")
+    # if k3s is in the git version, it could be k3s OR k3d
+    if "k3d" in cluster_name:
+        return "k3d"
+    if "k3s" in cluster_name or "k3s" in version:
+        return "k3s"
 
-    all_contexts = subproc(["kubectl config get-contexts --no-headers"],
-                           error_ok=True, quiet=True)
-    return_contexts = []
+    # it might still be k3s if created outside of smol-k8s-lab, but
+    # if distro not k3s/k3d, we kinda guess :)
+    for distro_name in ["kind", "gke", "aks", "eks"]:
+        if distro_name in cluster_name:
+            return distro_name
 
-    if all_contexts:
-        # split all contexts outputs into a list of context lines
-        for k8s_context in all_contexts.split('\n'):
+    # default the k8s distro to unknown in case we can't figure it out
+    return "unknown"
 
-            # split each context into fields
-            fields = k8s_context.split()
 
-            # HACK: I honestly have no clue why fields is empty sometimes &
-            # don't have time to troubleshoot it either 🤦
-            if fields:
-                # set the cluster name, making sure to not get the * context
-                if fields[0] and fields[0] != "*":
-                    cluster_name = fields[0]
-                    # change context only if it isn't already the current-context
-                    subproc([f"kubectl config use-context {cluster_name}"])
-                else:
-                    cluster_name = fields[1]
-
-                # get the version info for the distro and platform
-                version_json = loads(subproc(["kubectl version -o json"]))
-
-                # for k3s, this is nested in serverVersion
-                # for kind or k3d, it may not be present if docker is not enabled
-                server_version = version_json.get('serverVersion', None)
-                if server_version:
-                    version = server_version['gitVersion']
-                    os = server_version['platform']
-                else:
-                    log.error("Couldn't get server verison or platform. Is docker running?")
-                    version = "unknown"
-                    os = system() + "/" + machine()
-
-                # default the k8s distro to unknown in case we can't figure it out
-                distro = "unknown"
-
-                # if k3s is in the git version, it could be k3s OR k3d
-                if "k3d" in cluster_name:
-                    distro = "k3d"
-                elif "k3d" not in cluster_name:
-                    if "k3s" in cluster_name or "k3s" in version:
-                        distro = "k3s"
-                    else:
-                        # it might still be k3s if created outside of smol-k8s-lab
-                        # so we check the version
-
-                        # if distro not k3s/k3d, we kinda guess :)
-                        for distro_name in ["kind", "gke", "aks", "eks"]:
-                            if distro_name in cluster_name:
-                                distro = distro_name
-                                break
-
-                context_tuple = (cluster_name, distro, version, os)
-
-                return_contexts.append(context_tuple)
-
-        # set the cluster back to the starting context if we changed it
-        subproc([f"kubectl config use-context {start_context}"])
-
-    return return_contexts
+def probe_context(k8s_context: str, timeout: int = 5) -> tuple:
+    """
+    get the version and platform of the cluster of a context, with its own API
+    client, so we never change the user's current context. Returns a tuple of
+    (cluster_name, distro, version, platform)
+    """
+    try:
+        configuration = client.Configuration()
+        config.load_kube_config(context=k8s_context,
+                                client_configuration=configuration,
+                                persist_config=False)
+        # fail fast, instead of retrying clusters that are down
+        configuration.retries = False
+        api_client = client.ApiClient(configuration)
+        try:
+            info = client.VersionApi(api_client).get_code(_request_timeout=timeout)
+        finally:
+            api_client.close()
+        version = info.git_version
+        os = info.platform
+    except Exception as e:
+        # for kind or k3d, the cluster may not be up if docker is not running
+        log.debug(f"Couldn't get server version or platform of {k8s_context}. "
+                  f"Is docker running? Error was: {e}")
+        version = "unknown"
+        os = system() + "/" + machine()
+
+    return (k8s_context, guess_distro(k8s_context, version), version, os)
+
+
+def cached_contexts() -> list:
+    """
+    returns the clusters check_all_contexts found last time, or []
+    """
+    try:
+        with open(CLUSTER_CACHE, 'r') as cache:
+            return [tuple(row) for row in load(cache)]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def check_all_contexts(on_result: callable = None, max_parallel: int = 8) -> list:
+    """
+    checks the cluster of every context in your kubeconfig at the same time,
+    and returns a list of tuples like:
+        [(cluster_name, distro, version, platform)]
+
+    on_result: optional callable, called with each tuple as soon as we have it
+    """
+    try:
+        contexts = [ctx['name'] for ctx in config.list_kube_config_contexts()[0]]
+    except Exception as e:
+        log.debug(f"Couldn't list the contexts in your kubeconfig: {e}")
+        contexts = []
+
+    return_contexts = {}
+    if contexts:
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(contexts))) as pool:
+            futures = [pool.submit(probe_context, ctx) for ctx in contexts]
+            for future in as_completed(futures):
+                context_tuple = future.result()
+                return_contexts[context_tuple[0]] = context_tuple
+                if on_result:
+                    on_result(context_tuple)
+
+    # keep the order of the kubeconfig
+    results = [return_contexts[ctx] for ctx in contexts]
+
+    try:
+        Path(XDG_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        with open(CLUSTER_CACHE + '.tmp', 'w') as cache:
+            dump(results, cache)
+        replace(CLUSTER_CACHE + '.tmp', CLUSTER_CACHE)
+    except OSError as e:
+        log.debug(f"Couldn't cache the clusters we found: {e}")
+
+    return results
 
 
 def check_contexts_for_cluster(cluster_name: str,
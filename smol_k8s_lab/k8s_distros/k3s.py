@@ -54,7 +54,7 @@ def install_k3s_cluster(cluster_name: str,
     with open(k3s_yaml_file, 'w') as k3s_cfg:
         yaml.dump(config_dict, k3s_cfg)
 
-    subproc([install_cmd], spinner=False)
+    subproc([install_cmd], spinner=False, stream=True)
 
     # adds our newly created cluster for k3s to the user's kubeconfig
     update_user_kubeconfig(cluster_name)
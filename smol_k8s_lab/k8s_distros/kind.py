@@ -52,7 +52,7 @@ def create_kind_cluster(cluster_name: str,
                       control_plane_nodes, worker_nodes)
 
     cmd = f"kind create cluster --name {cluster_name} --config={kind_cfg}"
-    subproc([cmd])
+    subproc([cmd], stream=True)
 
     return True
 
@@ -1,9 +1,24 @@
 # it was only a matter of time before I had to query argocd directly
 import logging as log
 from .k8s_lib import K8s
+from .k8s_watch import Wait, field_equals, get_field
 from ..utils.run.subproc import subproc
+from base64 import b64decode
+from contextlib import contextmanager
+from datetime import datetime
 from json import loads
-from time import sleep
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from threading import Lock, RLock, get_ident
+from time import sleep, monotonic
+
+# Argo CD's custom resources
+GROUP = "argoproj.io"
+VERSION = "v1alpha1"
+# the finalizer that makes Argo CD delete an app's resources along with it
+RESOURCES_FINALIZER = "resources-finalizer.argocd.argoproj.io"
+# seconds we trust our index of Applications before listing them again
+APP_INDEX_TTL = 10
 
 
 class ArgoCD():
@@ -15,26 +30,145 @@ class ArgoCD():
                  namespace: str,
                  argo_cd_domain: str,
                  k8s_obj: K8s|None = None,
-                 secrets_backend: str = "") -> None:
+                 secrets_backend: str = "",
+                 backend: str = "k8s") -> None:
         """
         secrets_backend: str, if set to "bitwarden", resets bitwarden eso
         provider when updating Argo CD Appset Secret Plugin
+
+        backend: str, "k8s" to manage Application, ApplicationSet, and
+                 AppProject resources directly via the Kubernetes API, or
+                 "cli" to use the argocd cli in --core mode. We fall back to
+                 the cli if the Kubernetes API fails us. If there's no k8s_obj,
+                 we always use the cli.
         """
 
         # setup Argo CD to talk directly to k8s
-        log.debug(f"setting namespace to {namespace} and configuring argocd "
-                  "to use k8s for auth")
-        subproc([f'kubectl config set-context --current --namespace={namespace}',
-                 f'argocd login {argo_cd_domain} --core'])
+        log.debug(f"setting namespace to {namespace}")
+        subproc([f'kubectl config set-context --current --namespace={namespace}'])
         self.namespace = namespace
         self.hostname = argo_cd_domain
         self.k8s = k8s_obj
         self.secrets_backend = secrets_backend
+        # apps may be set up in parallel, but they all share one appset secret
+        self._appset_secret_lock = RLock()
+        # appset secret vars waiting to be written, see batch_appset_secret()
+        self._pending_secret_vars = {}
+        self._batch_depth = 0
+        # we count writes to the appset secret, and remember which write the
+        # plugin was last reloaded after, so we reload at most once per write
+        # and only hold the lock above while writing the secret itself
+        self._secret_version = 0
+        self._reloaded_version = 0
+        self._reload_lock = Lock()
+        self._reloading_thread = None
+
+        if k8s_obj:
+            self.backend = backend
+            self.custom_api = client.CustomObjectsApi(k8s_obj.api_client)
+        else:
+            self.backend = "cli"
+
+        # index of every Application, by name, so we don't look them up one
+        # at a time. See app_index()
+        self._app_index = None
+        self._app_index_time = 0.0
+        self._app_index_lock = Lock()
+
+        # we only log into argocd if we actually need the cli
+        self._cli_logged_in = False
+        if self.backend == "cli":
+            self._cli_login()
+
+    def _cli_login(self) -> None:
+        """
+        configure the argocd cli to use k8s for auth, if we haven't already
+        """
+        if not self._cli_logged_in:
+            log.debug("configuring argocd to use k8s for auth")
+            subproc([f'argocd login {self.hostname} --core'])
+            self._cli_logged_in = True
+
+    def _use_api(self) -> bool:
+        return self.backend == "k8s"
+
+    def _fallback(self, action: str, error: Exception) -> None:
+        """
+        log that the kubernetes API failed us and make sure the cli is ready
+        """
+        log.debug(f"Could not {action} via the Kubernetes API, so we'll use "
+                  f"the argocd cli instead. Error was: {error}")
+        self._cli_login()
+
+    def get_app(self, app: str, kind: str = "applications") -> dict:
+        """
+        returns an Argo CD Application (or ApplicationSet if kind is
+        "applicationsets") as a dict, or an empty dict if it doesn't exist
+        """
+        try:
+            return self.custom_api.get_namespaced_custom_object(
+                    GROUP, VERSION, self.namespace, kind, app)
+        except ApiException as e:
+            if e.status == 404:
+                return {}
+            raise
+
+    def app_index(self, refresh: bool = False) -> dict:
+        """
+        returns a dict of every Argo CD Application by name, with its health
+        and sync status, e.g. {"nextcloud": {"health": "Healthy",
+        "sync": "Synced"}}. We list all the Applications at once and reuse
+        that for APP_INDEX_TTL seconds, or until we create or delete an app.
+        """
+        with self._app_index_lock:
+            stale = monotonic() - self._app_index_time > APP_INDEX_TTL
+            if refresh or stale or self._app_index is None:
+                apps = self.custom_api.list_namespaced_custom_object(
+                        GROUP, VERSION, self.namespace, "applications")
+                self._app_index = {
+                        app['metadata']['name']: {
+                            "health": get_field(app, "status.health.status", ""),
+                            "sync": get_field(app, "status.sync.status", "")
+                            }
+                        for app in apps.get('items', [])
+                        }
+                self._app_index_time = monotonic()
+                log.debug(f"Indexed {len(self._app_index)} Argo CD Applications")
+            return self._app_index
+
+    def invalidate_app_index(self) -> None:
+        """
+        forget our index of Applications, e.g. after we create or delete one
+        """
+        with self._app_index_lock:
+            self._app_index = None
+
+    def _add_to_app_index(self, app: str) -> None:
+        """
+        record an app we just created in our index, so we don't have to list
+        every app again. Its status is unknown till we next list them
+        """
+        with self._app_index_lock:
+            if self._app_index is not None:
+                self._app_index[app] = {"health": "", "sync": ""}
+
+    def get_app_status(self, app: str) -> dict:
+        """
+        returns the health and sync status of an app from our index, or an
+        empty dict if the app doesn't exist
+        """
+        return self.app_index().get(app, {})
 
     def check_if_app_exists(self, app: str) -> bool:
         """
         check if argocd application has already been installed
         """
+        if self._use_api():
+            try:
+                return app in self.app_index()
+            except Exception as e:
+                self._fallback(f"list apps to find {app}", e)
+
         res = subproc([f"argocd app get {app}"], error_ok=True)
         if app in res:
             return True
@@ -50,6 +184,15 @@ class ArgoCD():
         """
         syncs an argocd app and returns the result
         """
+        # the app may need appset secret vars we haven't written yet
+        self.flush_appset_secret()
+
+        if self._use_api():
+            try:
+                return self._api_sync_app(app, replace, force)
+            except Exception as e:
+                self._fallback(f"sync app {app}", e)
+
         # build sync command
         cmd = "argocd app sync --retry-limit 3 --loglevel warn "
         if replace:
@@ -78,6 +221,64 @@ class ArgoCD():
 
             counter += 1
 
+    def _api_sync_app(self,
+                      app: str,
+                      replace: bool = False,
+                      force: bool = False,
+                      timeout: int|None = None) -> str:
+        """
+        start a sync operation the same way the argocd cli does, by setting
+        the Application's operation field, and wait for it to finish. Like
+        argocd app sync, by default we wait as long as it takes
+        """
+        # we tag the operation so we know when *our* sync is done
+        sync_id = datetime.now().isoformat()
+        operation = {
+                "initiatedBy": {"username": "smol-k8s-lab"},
+                "info": [{"name": "smol-k8s-lab-sync", "value": sync_id}],
+                "retry": {"limit": 3},
+                "sync": {"syncStrategy": {"hook": {"force": force}}}
+                }
+        if replace:
+            operation["sync"]["syncOptions"] = ["Replace=true"]
+
+        # like the argocd cli, don't replace an operation that's running, but
+        # unlike the cli, wait for it to finish instead of failing
+        def no_operation_running(obj: dict) -> bool:
+            phase = get_field(obj, "status.operationState.phase")
+            return not obj.get('operation') and phase not in ["Running",
+                                                              "Terminating"]
+
+        current = self.custom_api.get_namespaced_custom_object(
+                GROUP, VERSION, self.namespace, "applications", app)
+        if not no_operation_running(current):
+            log.info(f"Waiting on the operation already running for {app}")
+            self.k8s.watcher.wait_for(
+                    Wait("applications.argoproj.io", self.namespace,
+                         no_operation_running, name=app),
+                    timeout)
+
+        log.info(f"Syncing Argo CD app {app}")
+        self.custom_api.patch_namespaced_custom_object(
+                GROUP, VERSION, self.namespace, "applications", app,
+                {"operation": operation})
+
+        def our_sync_finished(obj: dict) -> bool:
+            state = get_field(obj, "status.operationState", {}) or {}
+            info = get_field(state, "operation.info", []) or []
+            ours = {"name": "smol-k8s-lab-sync", "value": sync_id} in info
+            return ours and state.get('phase') in ["Succeeded", "Failed", "Error"]
+
+        obj = self.k8s.watcher.wait_for(
+                Wait("applications.argoproj.io", self.namespace,
+                     our_sync_finished, name=app),
+                timeout)
+        state = obj['status']['operationState']
+        res = f"{app} sync {state['phase']}: {state.get('message', '')}"
+        if state['phase'] != "Succeeded":
+            log.warning(res)
+        return res
+
     def delete_app(self,
                    app: str,
                    spinner: bool = True,
@@ -85,6 +286,85 @@ class ArgoCD():
         """
         delete an app and associated appsets, and returns the result for all
         """
+        if self._use_api():
+            try:
+                app_res = self._api_delete_app(app)
+            except Exception as e:
+                self._fallback(f"delete app {app}", e)
+                app_res = self._cli_delete_app(app, spinner, force)
+        else:
+            app_res = self._cli_delete_app(app, spinner, force)
+
+        self.invalidate_app_index()
+
+        # delete any remaining pods, just in case
+        res = self.k8s.delete_namespaced_pods(app)
+        if res:
+            app_res += res
+        print(app_res)
+
+        return app_res
+
+    def _appsets_for(self, app: str) -> list:
+        """
+        the appsets we create for apps made up of several Argo CD apps
+        """
+        appsets = ["web-app-set",
+                   "seaweedfs-appset",
+                   "s3-provider-app-set",
+                   "s3-pvc-app-set",
+                   "pvc-appset",
+                   "external-secrets-app-set"]
+
+        if app in ["nextcloud", "matrix", "mastodon", "zitadel"]:
+            return [f"{app}-{appset}" for appset in appsets]
+        return []
+
+    def _api_delete_app(self, app: str) -> str:
+        """
+        delete an app and its appsets via the Kubernetes API, making sure Argo
+        CD also deletes all the resources the app created, like the cli does
+        """
+        app_res = ""
+
+        # clean up old appsets first, so they don't recreate the app
+        for appset in self._appsets_for(app):
+            try:
+                self.custom_api.delete_namespaced_custom_object(
+                        GROUP, VERSION, self.namespace, "applicationsets", appset)
+                app_res += f"applicationset '{appset}' deleted\n"
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+
+        # sometimes seaweedfs gets stuck...
+        seaweedfs_app = self.get_app(f"{app}-seaweedfs-app")
+        phase = get_field(seaweedfs_app, "status.operationState.phase")
+        if phase == "Running":
+            self.custom_api.patch_namespaced_custom_object(
+                    GROUP, VERSION, self.namespace, "applications",
+                    f"{app}-seaweedfs-app",
+                    {"status": {"operationState": {"phase": "Terminating"}}})
+            app_res += f"operation of {app}-seaweedfs-app terminated\n"
+
+        existing = self.get_app(app)
+        if not existing:
+            return app_res + f"application '{app}' not found\n"
+
+        finalizers = get_field(existing, "metadata.finalizers", []) or []
+        if RESOURCES_FINALIZER not in finalizers:
+            self.custom_api.patch_namespaced_custom_object(
+                    GROUP, VERSION, self.namespace, "applications", app,
+                    {"metadata": {"finalizers": finalizers + [RESOURCES_FINALIZER]}})
+
+        self.custom_api.delete_namespaced_custom_object(
+                GROUP, VERSION, self.namespace, "applications", app)
+        return app_res + f"application '{app}' deleted\n"
+
+    def _cli_delete_app(self, app: str, spinner: bool, force: bool) -> str:
+        """
+        delete an app and its appsets with the argocd cli
+        """
         # build delete command
         cmd = "argocd app delete -y "
         if force:
@@ -97,35 +377,22 @@ class ArgoCD():
             app_res = ""
 
         # clean up old appsets as well
-        appsets = ["web-app-set",
-                   "seaweedfs-appset",
-                   "s3-provider-app-set",
-                   "s3-pvc-app-set",
-                   "pvc-appset",
-                   "external-secrets-app-set"]
-
-        if app in ["nextcloud", "matrix", "mastodon", "zitadel"]:
-            for appset in appsets:
-                res = subproc([f"argocd appset delete -y {app}-{appset}"],
-                              error_ok=True, spinner=spinner)
-                if res:
-                    app_res += res
+        appsets = self._appsets_for(app)
+        for appset in appsets:
+            res = subproc([f"argocd appset delete -y {appset}"],
+                          error_ok=True, spinner=spinner)
+            if res:
+                app_res += res
 
+        if appsets:
             # sometimes seaweedfs gets stuck...
             res = subproc([f"argocd app terminate-op {app}-seaweedfs-app"],
                           error_ok=True, spinner=spinner)
             if res:
                 app_res += res
 
-        # delete any remaining pods, just in case
-        res = self.k8s.delete_namespaced_pods(app)
-        if res:
-            app_res += res
-        print(app_res)
-
         return app_res
 
-
     def install_app(self, app: str, argo_dict: dict, wait: bool = False) -> bool|None:
         """
         create and Argo CD app directly from the command line using passed in
@@ -136,6 +403,9 @@ class ArgoCD():
             return True
         else:
             log.info(f"Installing an Argo CD app called {app} :)")
+            # the app may need appset secret vars we haven't written yet
+            self.flush_appset_secret()
+
             repo = argo_dict['repo']
             path = argo_dict['path']
             revision = argo_dict['revision']
@@ -160,30 +430,81 @@ class ArgoCD():
                                        app_cluster,
                                        set(source_repos))
 
-            cmd = (f"argocd app create {app} --upsert "
-                   f"--repo {repo} "
-                   f"--path {path} "
-                   f"--revision {revision} "
-                   "--sync-policy automated "
-                   "--sync-option ApplyOutOfSyncOnly=true "
-                   "--self-heal "
-                   f"--dest-namespace {app_namespace} "
-                   f"--dest-server {app_cluster}")
+            created = False
+            if self._use_api():
+                try:
+                    self._api_create_app(app, argo_dict, app_cluster)
+                    created = True
+                except Exception as e:
+                    self._fallback(f"create app {app}", e)
+
+            if not created:
+                cmd = (f"argocd app create {app} --upsert "
+                       f"--repo {repo} "
+                       f"--path {path} "
+                       f"--revision {revision} "
+                       "--sync-policy automated "
+                       "--sync-option ApplyOutOfSyncOnly=true "
+                       "--self-heal "
+                       f"--dest-namespace {app_namespace} "
+                       f"--dest-server {app_cluster}")
 
-            if argo_dict['directory_recursion']:
-                cmd += " --directory-recurse"
+                if argo_dict['directory_recursion']:
+                    cmd += " --directory-recurse"
 
-            response = subproc([cmd])
-            log.debug(response)
+                response = subproc([cmd])
+                log.debug(response)
+
+            self._add_to_app_index(app)
 
             # wait for the app to be healthy if requested by the user
             if wait:
                 self.wait_for_app(app)
 
+    def _api_create_app(self, app: str, argo_dict: dict, app_cluster: str) -> None:
+        """
+        create (or update) an Application resource, with the same spec that
+        argocd app create would have given it
+        """
+        source = {"repoURL": argo_dict['repo'],
+                  "path": argo_dict['path'],
+                  "targetRevision": argo_dict['revision']}
+        if argo_dict['directory_recursion']:
+            source["directory"] = {"recurse": True}
+
+        application = {
+            "apiVersion": f"{GROUP}/{VERSION}",
+            "kind": "Application",
+            "metadata": {"name": app, "namespace": self.namespace},
+            "spec": {
+                # argocd app create uses the default project unless told otherwise
+                "project": "default",
+                "source": source,
+                "destination": {"namespace": argo_dict['namespace'],
+                                "server": app_cluster},
+                "syncPolicy": {"automated": {"selfHeal": True},
+                               "syncOptions": ["ApplyOutOfSyncOnly=true"]}
+                }
+            }
+        self.k8s._apply_manifest_docs([application])
+        log.debug(f"Created Argo CD Application {app}")
+
     def wait_for_app(self, app: str, retry: bool = False) -> None:
         """
         checks the status of an Argo CD app and waits till it is ready
         """
+        if self._use_api():
+            try:
+                # like argocd app wait, we wait as long as it takes
+                self.k8s.watcher.wait_for(
+                        Wait("applications.argoproj.io", self.namespace,
+                             field_equals("status.health.status", "Healthy"),
+                             name=app),
+                        timeout=None)
+                return
+            except Exception as e:
+                self._fallback(f"wait for app {app}", e)
+
         if retry:
             # set error to true by default
             error = True
@@ -200,6 +521,31 @@ class ArgoCD():
         else:
             subproc([f"argocd app wait {app} --health --loglevel warn"])
 
+    def get_cluster(self, cluster: str) -> dict:
+        """
+        returns the name and server of a cluster registered with Argo CD, from
+        its cluster secret, matching either the cluster's name or server
+        """
+        if self._use_api():
+            try:
+                secrets = self.k8s.core_v1_api.list_namespaced_secret(
+                        self.namespace,
+                        label_selector="argocd.argoproj.io/secret-type=cluster")
+                for secret in secrets.items:
+                    data = {key: b64decode(value).decode('utf-8')
+                            for key, value in (secret.data or {}).items()
+                            if key in ["name", "server"]}
+                    if cluster in data.values():
+                        return data
+                # the in-cluster cluster has no secret, but the cli knows it
+                log.debug(f"No cluster secret found for {cluster}, so we'll "
+                          "ask the argocd cli")
+                self._cli_login()
+            except Exception as e:
+                self._fallback(f"get cluster {cluster}", e)
+
+        return loads(subproc([f"argocd cluster get {cluster} -o json"]))
+
     def create_project(self,
                        project_name: str,
                        app: str,
@@ -246,7 +592,7 @@ class ArgoCD():
                 server = "https://kubernetes.default.svc"
                 name = "in-cluster"
             else:
-                cluster_json = loads(subproc(f"argocd cluster get {clusters} -o json"))
+                cluster_json = self.get_cluster(clusters)
                 name = cluster_json["name"]
                 server = cluster_json["server"]
 
@@ -259,25 +605,109 @@ class ArgoCD():
         except Exception as e:
             log.warn(e)
 
+    @contextmanager
+    def batch_appset_secret(self):
+        """
+        context manager that holds on to appset secret var updates and writes
+        them all at once, with one reload of the appset secret plugin, when
+        the block ends or right before an app is installed or synced. e.g.
+
+        with argocd.batch_appset_secret():
+            argocd.update_appset_secret({"a": "b"})
+            argocd.update_appset_secret({"c": "d"})
+        """
+        with self._appset_secret_lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._appset_secret_lock:
+                self._batch_depth -= 1
+                done = self._batch_depth == 0
+            if done:
+                self.flush_appset_secret()
+
+    def flush_appset_secret(self) -> None:
+        """
+        write any appset secret vars we've been holding on to, and make sure
+        everything that reads them has been reloaded since
+        """
+        # we're syncing the plugin itself, as part of a reload
+        if self._reloading_thread == get_ident():
+            return
+
+        with self._appset_secret_lock:
+            if self._pending_secret_vars:
+                fields = self._pending_secret_vars
+                log.debug(f"Writing {len(fields)} buffered appset secret vars")
+                self._patch_appset_secret(fields)
+                # only forget them once they're written, so a failed write
+                # doesn't lose them
+                self._pending_secret_vars = {}
+            version = self._secret_version
+
+        self._reload_appset_secret_readers(version)
+
     def update_appset_secret(self, fields: dict, argo_managed: bool = True) -> None:
         """
         pass in k8s context and dict of fields to add to the argocd appset secret
-        and reload the deployment
+        and reload the deployment. Inside batch_appset_secret(), we only write
+        the fields when the batch is flushed.
+        """
+        with self._appset_secret_lock:
+            # if the plugin isn't managed by Argo CD yet, write it right away
+            if self._batch_depth and argo_managed:
+                self._pending_secret_vars.update(fields)
+                return
+
+            self._patch_appset_secret({**self._pending_secret_vars, **fields})
+            self._pending_secret_vars = {}
+            version = self._secret_version
+
+        self._reload_appset_secret_readers(version, argo_managed)
+
+    def _patch_appset_secret(self, fields: dict) -> None:
+        """
+        update the appset secret. Call with self._appset_secret_lock held
         """
         self.k8s.update_secret_key('appset-secret-vars',
                                    self.namespace,
                                    fields,
                                    'secret_vars.yaml')
+        self._secret_version += 1
 
-        if argo_managed:
-            # reload the argocd appset secret plugin
-            self.sync_app('appset-secrets-plugin', spinner=True, replace=True, force=True)
-            self.wait_for_app('appset-secrets-plugin')
-        else:
-            sleep(9)
-            # self.k8s.reload_deployment("appset-secrets-plugin", self.namespace)
-
-        # if bweso enabled, reload the bitwarden ESO provider
-        if self.secrets_backend == "bitwarden":
-            self.sync_app('bitwarden-eso-provider', spinner=True, replace=True, force=True)
-            self.wait_for_app('bitwarden-eso-provider')
+    def _reload_appset_secret_readers(self,
+                                      version: int,
+                                      argo_managed: bool = True) -> None:
+        """
+        reload everything that reads the appset secret, unless that already
+        happened after the given write. Only one thread reloads at a time, and
+        one reload covers every write made before it started.
+        """
+        with self._reload_lock:
+            if self._reloaded_version >= version:
+                return
+
+            with self._appset_secret_lock:
+                version = self._secret_version
+
+            self._reloading_thread = get_ident()
+            try:
+                if argo_managed:
+                    # reload the argocd appset secret plugin
+                    self.sync_app('appset-secrets-plugin', spinner=True,
+                                  replace=True, force=True)
+                    self.wait_for_app('appset-secrets-plugin')
+                else:
+                    sleep(9)
+                    # self.k8s.reload_deployment("appset-secrets-plugin", self.namespace)
+
+                # if bweso enabled, reload the bitwarden ESO provider
+                if self.secrets_backend == "bitwarden":
+                    self.sync_app('bitwarden-eso-provider', spinner=True,
+                                  replace=True, force=True)
+                    self.wait_for_app('bitwarden-eso-provider')
+            finally:
+                self._reloading_thread = None
+
+            self._reloaded_version = version
@@ -1,6 +1,7 @@
 # local libs
-from smol_k8s_lab.utils.run.subproc import subproc
 from smol_k8s_lab.k8s_tools.k8s_lib import K8s
+from smol_k8s_lab.k8s_tools.k8s_watch import (Wait, field_equals, job_complete,
+                                              job_failed)
 from smol_k8s_lab.k8s_apps.social.nextcloud_occ_commands import Nextcloud
 from smol_k8s_lab.utils.minio_lib import BetterMinio
 
@@ -87,17 +88,13 @@ def create_pvc_restic_backup(app: str,
     k8s.apply_custom_resources([backup_yaml])
 
     # wait for backup to complete
-    wait_cmd = (f"kubectl wait job -n {namespace} --for=condition=complete "
-                f"backup-{backup_name}-0 --timeout=15m")
-    print(wait_cmd)
-    while True:
-        log.debug(f"Waiting for backup job: backup-{backup_name}-0")
-        res = subproc([wait_cmd], error_ok=True, spinner=quiet)
-        log.debug(res)
-        if "NotFound" in res:
-            sleep(1)
-        else:
-            break
+    # like kubectl wait --timeout=15m, we give up after 15m and carry on
+    log.info(f"Waiting for backup job: backup-{backup_name}-0")
+    k8s.watcher.wait_for(Wait("job", namespace, job_complete,
+                              name=f"backup-{backup_name}-0",
+                              failed=job_failed),
+                         timeout=900,
+                         error_ok=True)
 
     if app == "nextcloud":
         # turn nextcloud maintenance_mode off after the backup
@@ -137,16 +134,13 @@ def create_cnpg_cluster_backup(app: str,
     k8s.apply_custom_resources([cnpg_backup])
 
     # wait for backup to complete
-    wait_cmd = (f"kubectl get -n {namespace} --no-headers "
-                "-o custom-columns=PHASE:.status.phase "
-                f"backups.postgresql.cnpg.io/{backup_name}")
-    while True:
-        log.error(f"Waiting on backups.postgresql.cnpg.io/{backup_name} to complete")
-        res = subproc([wait_cmd], error_ok=True, spinner=quiet)
-        log.error(res)
-        if "completed" in res:
-            break
-        sleep(1)
+    log.info(f"Waiting on backups.postgresql.cnpg.io/{backup_name} to complete")
+    backup = k8s.watcher.wait_for(
+            Wait("backups.postgresql.cnpg.io", namespace,
+                 field_equals("status.phase", "completed"),
+                 name=backup_name,
+                 failed=field_equals("status.phase", "failed")),
+            timeout=None)
 
     # get credentials and setup s3 object to check if all wal archives are there
     credentials = k8s.get_secret("s3-postgres-credentials", namespace)
@@ -157,11 +151,7 @@ def create_cnpg_cluster_backup(app: str,
     all_wals = f"{cluster_name}/wals"
 
     # after the backup is completed, check which wal archive it says is the last one
-    end_wal_cmd = (
-            f"kubectl get -n {namespace} backups.postgresql.cnpg.io/{backup_name}"
-            f" -o custom-columns=endwal:.status.endWal --no-headers"
-            )
-    end_wal = subproc([end_wal_cmd]).strip()
+    end_wal = backup['status']['endWal']
     end_wal_folder = f"{all_wals}/{end_wal[:16]}/{end_wal}"
     log.error(f"Wal folder we expect for {cluster_name} backup is: '{end_wal_folder}'")
     check_for_specific_wal(s3, cluster_name, all_wals, end_wal)
@@ -5,15 +5,22 @@ LICENSE: AGPLv4
 """
 
 # internal libraries
+from ..constants import XDG_CACHE_DIR, XDG_CONFIG_DIR
+from ..utils import manifest_cache
 from ..utils.run.subproc import subproc
 from ..utils.rich_cli.console_logging import header, sub_header
 
 # external libraries
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from json import dump, load, loads
 import logging as log
-import requests
+from os import path, replace, stat
+from pathlib import Path
 from ruamel.yaml import YAML
 from shutil import which
+from threading import Lock
+from time import time
 
 # these are the URLs of each manually installed helm chart, so that the appset matches
 APPSET_URLS = {
@@ -26,6 +33,180 @@ APPSET_URLS = {
         }
 
 
+# chart versions we've looked up, with when we looked them up, so we only check
+# the live appsets once every CHART_VERSION_TTL seconds
+CHART_VERSION_CACHE = path.join(XDG_CACHE_DIR, 'chart_versions.json')
+CHART_VERSION_TTL = 6 * 60 * 60
+# if smol_k8s_lab.lock_chart_versions is true, we pin the versions we find here
+CHART_VERSION_LOCKFILE = path.join(XDG_CONFIG_DIR, 'chart_versions.lock.json')
+
+# we only refresh a helm repo's index if it's older than this many seconds
+HELM_REPO_MAX_AGE = 60 * 60
+
+_chart_versions = {}
+_chart_versions_lock = Lock()
+_use_lockfile = False
+
+# every helm release in the cluster, by (namespace, release name), from a
+# single helm list. None means we haven't listed them yet
+_releases = None
+_releases_lock = Lock()
+
+# where helm keeps the index of each repo, from helm env. None means we
+# haven't asked helm yet
+_repo_cache_dir = None
+_repo_cache_dir_lock = Lock()
+
+
+def _read_json(file_name: str) -> dict:
+    try:
+        with open(file_name, 'r') as json_file:
+            return load(json_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(file_name: str, contents: dict) -> None:
+    Path(path.dirname(file_name)).mkdir(parents=True, exist_ok=True)
+    with open(file_name + '.tmp', 'w') as json_file:
+        dump(contents, json_file, indent=2, sort_keys=True)
+    replace(file_name + '.tmp', file_name)
+
+
+def set_helm_repo_max_age(seconds: int) -> None:
+    """
+    set how old a helm repo's index can be before we refresh it
+    """
+    global HELM_REPO_MAX_AGE
+    HELM_REPO_MAX_AGE = seconds
+
+
+def use_chart_version_lockfile(enabled: bool = True) -> None:
+    """
+    if enabled, we use the chart versions in CHART_VERSION_LOCKFILE, and add
+    any versions we have to look up to it, so later runs use the same ones
+    """
+    global _use_lockfile
+    _use_lockfile = enabled
+
+
+def get_chart_version(appset: str) -> str:
+    """
+    returns the version of the helm chart used by one of the live appsets in
+    APPSET_URLS. We check, in order: the lockfile (if enabled), the versions
+    we've already looked up this run, the versions we looked up in the last
+    CHART_VERSION_TTL seconds, and then finally the live appset itself.
+    """
+    with _chart_versions_lock:
+        if _use_lockfile:
+            locked = _read_json(CHART_VERSION_LOCKFILE).get(appset, "")
+            if locked:
+                return locked
+        if appset in _chart_versions:
+            return _chart_versions[appset]
+        cached = _read_json(CHART_VERSION_CACHE).get(appset, {})
+        if cached and time() - cached.get('time', 0) < CHART_VERSION_TTL:
+            _chart_versions[appset] = cached['version']
+            return cached['version']
+
+    # use the ruamel.yaml library to load the yaml
+    yaml = YAML(typ='safe')
+    obj = yaml.load(manifest_cache.fetch(APPSET_URLS[appset]))
+
+    # this is an app
+    if obj['kind'] == "Application":
+        version = obj['spec']['source']['targetRevision']
+    # this is an appset
+    else:
+        # return the current version of the app
+        version = obj['spec']['template']['spec']['source']['targetRevision']
+    log.debug(f"The {appset} appset uses chart version {version}")
+
+    with _chart_versions_lock:
+        _chart_versions[appset] = version
+        cache = _read_json(CHART_VERSION_CACHE)
+        cache[appset] = {"version": version, "time": time()}
+        _write_json(CHART_VERSION_CACHE, cache)
+        if _use_lockfile:
+            lockfile = _read_json(CHART_VERSION_LOCKFILE)
+            lockfile[appset] = version
+            _write_json(CHART_VERSION_LOCKFILE, lockfile)
+
+    return version
+
+
+def prefetch_chart_versions(appsets: list, max_parallel: int = 8) -> None:
+    """
+    look up the chart versions of several appsets in APPSET_URLS at once.
+    Only pass the appsets of charts we're going to install, since each one we
+    haven't cached is a download
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = {appset: pool.submit(get_chart_version, appset)
+                   for appset in appsets}
+        for appset, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                log.debug(f"Couldn't look up chart version for {appset}: {e}")
+
+
+def releases(refresh: bool = False) -> dict:
+    """
+    returns every helm release in the current k8s context as a dict of
+    {(namespace, release name): release}, where release is a dict from
+    helm list -o json. We only run helm list once per run, unless refresh is
+    True, and then keep it up to date as we install and uninstall charts.
+    """
+    global _releases
+    with _releases_lock:
+        if _releases is not None and not refresh:
+            return _releases
+
+        res = subproc(["helm list -A -o json"], quiet=True, error_ok=True)
+        try:
+            listed = {(release['namespace'], release['name']): release
+                      for release in loads(res)}
+        except (TypeError, ValueError, KeyError):
+            # don't remember a failed list, so we try again next time
+            log.debug(f"Couldn't list helm releases: {res}")
+            return {}
+
+        log.debug(f"Found {len(listed)} helm releases")
+        _releases = listed
+        return _releases
+
+
+def repo_cache_dir() -> str:
+    """
+    returns the directory helm downloads repo indexes to, or "" if helm
+    can't tell us. We only run helm env once per run
+    """
+    global _repo_cache_dir
+    with _repo_cache_dir_lock:
+        if _repo_cache_dir is None:
+            res = subproc(["helm env"], quiet=True, error_ok=True) or ""
+            _repo_cache_dir = ""
+            for line in res.splitlines():
+                if line.startswith("HELM_REPOSITORY_CACHE="):
+                    _repo_cache_dir = line.split("=", 1)[1].strip('"')
+        return _repo_cache_dir
+
+
+def _record_release(namespace: str, release_name: str, release: dict = {}) -> None:
+    """
+    update the release inventory after we install, upgrade, or (if release
+    is empty) uninstall a release
+    """
+    with _releases_lock:
+        if _releases is None:
+            return
+        if release:
+            _releases[(namespace, release_name)] = release
+        else:
+            _releases.pop((namespace, release_name), None)
+
+
 class Helm:
     """
     Local helm management of repos:
@@ -41,22 +222,65 @@ class Helm:
         """
         perform add, update, and removal of helm chart repos
         """
-        def __init__(self, repo_dict: dict):
+        def __init__(self, repo_dict: dict, max_age: int = None):
             """
             must pass in a repo_dict of {'repo_name': 'repo url'}
+
+            max_age: int, seconds after which we refresh a repo's index.
+                     Defaults to HELM_REPO_MAX_AGE
             """
             self.repo_dict = repo_dict
+            self.max_age = HELM_REPO_MAX_AGE if max_age is None else max_age
+
+        def existing(self) -> dict:
+            """
+            returns a dict of {'repo_name': 'repo url'} of the repos helm has
+            """
+            # helm errors if there are no repos at all, so that's ok
+            res = subproc(["helm repo list -o json"], quiet=True, error_ok=True)
+            try:
+                return {repo['name']: repo['url'] for repo in loads(res)}
+            except (TypeError, ValueError, KeyError):
+                return {}
+
+        def index_age(self, repo_name: str) -> float:
+            """
+            returns the seconds since the index of a repo was downloaded, or
+            None if we can't find it
+            """
+            index = path.join(repo_cache_dir(), f"{repo_name}-index.yaml")
+            try:
+                return time() - stat(index).st_mtime
+            except OSError:
+                return None
 
         def add(self):
             """
-            helm repo add a dict of repos
+            helm repo add a dict of repos, but only the ones helm doesn't
+            already have, and refresh only the indexes older than max_age
             """
+            existing = self.existing()
             cmds = []
+            stale = []
             for repo_name, repo_url in self.repo_dict.items():
-                cmds.append(f'helm repo add {repo_name} {repo_url}')
+                if existing.get(repo_name, "").rstrip('/') != repo_url.rstrip('/'):
+                    # helm downloads the index when it adds a repo
+                    cmds.append(f'helm repo add --force-update {repo_name} {repo_url}')
+                    continue
+
+                age = self.index_age(repo_name)
+                if age is None or age > self.max_age:
+                    stale.append(repo_name)
+                else:
+                    log.debug(f"helm repo {repo_name} was updated {int(age)}s ago")
 
             # update any repos that are out of date
-            cmds.append("helm repo update")
+            if stale:
+                cmds.append(f"helm repo update {' '.join(stale)}")
+
+            if not cmds:
+                log.info("All helm repos are already up to date")
+                return
 
             # fire all of these off at once
             subproc(cmds)
@@ -96,14 +320,35 @@ class Helm:
             self.values_file = values_file
             self.set_options = set_options
 
-        def check_existing(self,):
+        def installed(self) -> dict:
             """
-            check if we already have an existing install
+            returns this release from the release inventory, or {} if it's
+            not installed
             """
-            cmd = (f'helm list --short --filter {self.release_name} '
-                   f' -n {self.namespace}')
-            return subproc([cmd], quiet=True)
+            return releases().get((self.namespace, self.release_name), {})
 
+        def check_existing(self,) -> str:
+            """
+            check if we already have an existing install. Returns the release
+            name if we do, and "" if we don't
+            """
+            return self.release_name if self.installed() else ""
+
+        def check_drift(self) -> None:
+            """
+            warn if the installed chart version isn't the one we'd install
+            """
+            installed = self.installed()
+            try:
+                wanted = self.chart_version or self.get_appset_version()
+            except Exception as e:
+                log.debug(f"Couldn't check {self.release_name} for drift: {e}")
+                return
+
+            if installed and not installed.get('chart', '').endswith(f"-{wanted}"):
+                log.warning(f"{self.release_name} in {self.namespace} is "
+                            f"{installed.get('chart')}, but we'd install "
+                            f"version {wanted}")
 
         def install(self,
                     wait: bool = False,
@@ -118,17 +363,15 @@ class Helm:
             if not upgrade:
                 if self.check_existing():
                     log.info(f"{self.release_name} is already installed :)")
+                    self.check_drift()
                     return True
 
             cmd = (f'helm upgrade {self.release_name} {self.chart_name}'
                    f' --install -n {self.namespace} --create-namespace')
             # f' --atomic')
 
-            if self.chart_version:
-                cmd += f' --version {self.chart_version}'
-            else:
-                version = self.get_appset_version()
-                cmd += f' --version {version}'
+            version = self.chart_version or self.get_appset_version()
+            cmd += f' --version {version}'
 
             if self.values_file:
                 cmd += f' --values {self.values_file}'
@@ -140,29 +383,24 @@ class Helm:
             if wait:
                 cmd += ' --wait --wait-for-jobs'
 
-            subproc([cmd])
+            # waiting can take minutes, so show helm's output as it happens
+            subproc([cmd], stream=wait)
+
+            # helm list names the chart without the repo, e.g. cilium-1.15.1
+            chart = self.chart_name.split('/')[-1]
+            _record_release(self.namespace, self.release_name,
+                            {"name": self.release_name,
+                             "namespace": self.namespace,
+                             "chart": f"{chart}-{version}",
+                             "status": "deployed"})
 
         def get_appset_version(self) -> str:
             """
             go get the version of the helm chart installed by the live appset
             """
-            # get the contents of the remote url
             if "postgres-cluster" in self.release_name:
-                res = requests.get(APPSET_URLS['cnpg-cluster']).text
-            else:
-                res = requests.get(APPSET_URLS[self.release_name]).text
-
-            # use the ruamel.yaml library to load the yaml
-            yaml = YAML()
-            obj = yaml.load(res)
-
-            # this is an app
-            if obj['kind'] == "Application":
-                return obj['spec']['source']['targetRevision']
-            # this is an appset
-            else:
-                # return the current version of the app
-                return obj['spec']['template']['spec']['source']['targetRevision']
+                return get_chart_version('cnpg-cluster')
+            return get_chart_version(self.release_name)
 
         def uninstall(self):
             """
@@ -170,6 +408,7 @@ class Helm:
             """
             cmd = f'helm uninstall {self.release_name} -n {self.namespace}'
             subproc([cmd])
+            _record_release(self.namespace, self.release_name)
             return True
 
 
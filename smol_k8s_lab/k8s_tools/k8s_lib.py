@@ -1,9 +1,11 @@
 # external libraries
 from base64 import b64decode as b64dec
 from base64 import standard_b64encode as b64enc
+from datetime import datetime, timezone
 from json import loads
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
+from kubernetes.dynamic import DynamicClient
 import logging as log
 from os import path
 from ruamel.yaml import YAML
@@ -11,6 +13,8 @@ from time import sleep
 
 # internal libraries
 from ..constants import XDG_CACHE_DIR
+from .k8s_watch import K8sWatcher, Wait, pod_ready
+from ..utils import manifest_cache
 from ..utils.run.subproc import subproc, simple_loading_bar
 
 
@@ -23,10 +27,36 @@ class K8s():
         """
         This is mostly for storing the k8s config
         """
-        config.load_kube_config()
+        configuration = client.Configuration()
+        config.load_kube_config(client_configuration=configuration)
+        # apps may be set up in parallel, so keep enough connections around
+        configuration.connection_pool_maxsize = 16
         client.rest.logger.setLevel(log.WARNING)
-        self.api_client = client.ApiClient()
+
+        # every API below shares this one client and its connection pool
+        self.api_client = client.ApiClient(configuration)
         self.core_v1_api = client.CoreV1Api(self.api_client)
+        self.apps_v1_api = client.AppsV1Api(self.api_client)
+        # this is created on first use, because it runs API discovery
+        self._dynamic_client = None
+        # waits on resources via the watch API, over the same connection pool
+        self.watcher = K8sWatcher(self.api_client)
+
+    @property
+    def dynamic_client(self) -> DynamicClient:
+        """
+        client for applying any kind of resource, including custom resources
+        """
+        if not self._dynamic_client:
+            self._dynamic_client = DynamicClient(self.api_client)
+        return self._dynamic_client
+
+    def _fallback(self, action: str, error: Exception) -> None:
+        """
+        log that the kubernetes API failed us and that we're using kubectl
+        """
+        log.debug(f"Could not {action} via the Kubernetes API, so we'll use "
+                  f"kubectl instead. Error was: {error}")
 
     def create_secret(self,
                       name: str,
@@ -82,6 +112,18 @@ class K8s():
         """
         log.debug(f"Getting secret: {name} in namespace: {namespace}")
 
+        try:
+            secret = self.core_v1_api.read_namespaced_secret(name, namespace)
+            # same format as kubectl get secret -o json
+            return self.api_client.sanitize_for_serialization(secret)
+        except ApiException as e:
+            if e.status == 404:
+                log.debug(f"Secret {name} in namespace {namespace} not found")
+                return {}
+            self._fallback("get secret", e)
+        except Exception as e:
+            self._fallback("get secret", e)
+
         res = subproc([f"kubectl get secret -n {namespace} {name} -o json"],
                       quiet=True)
         return loads(res)
@@ -92,15 +134,24 @@ class K8s():
         """
         log.debug(f"Deleting secret: {name} in namespace: {namespace}")
 
+        try:
+            self.core_v1_api.delete_namespaced_secret(name, namespace)
+            return
+        except Exception as e:
+            self._fallback("delete secret", e)
+
         subproc([f"kubectl delete secret -n {namespace} {name}"])
 
     def get_nodes(self,) -> list|str:
         """
-        get all nodes fo current cluster and returns them in a list
+        get all nodes fo current cluster and returns them in a list of
+        strings, one per node, just like kubectl get nodes --no-headers=true
         """
-        # todo: figure out how to parse this data
-        # node_list_sdk = self.core_v1_api.list_node()['items']
-        # print(node_list_sdk)
+        try:
+            return [" ".join(self._node_row(node).values())
+                    for node in self.core_v1_api.list_node().items]
+        except Exception as e:
+            self._fallback("list nodes", e)
 
         list_cmd = "kubectl get nodes --no-headers=true"
 
@@ -112,6 +163,15 @@ class K8s():
         checks for specific node and returns info on it as a dict if it exists.
         returns empty dict if node does not return any info
         """
+        try:
+            return self._node_row(self.core_v1_api.read_node(node))
+        except ApiException as e:
+            if e.status == 404:
+                return {}
+            self._fallback("get node", e)
+        except Exception as e:
+            self._fallback("get node", e)
+
         return_dict = {}
         node_list_cmd = subproc([f"kubectl get node {node} --no-headers=true"],
                                 error_ok=True)
@@ -128,6 +188,35 @@ class K8s():
 
         return return_dict
 
+    def _node_row(self, node: client.V1Node) -> dict:
+        """
+        returns the same info about a node that kubectl get node prints
+        """
+        status = "NotReady"
+        for condition in node.status.conditions or []:
+            if condition.type == "Ready" and condition.status == "True":
+                status = "Ready"
+        if node.spec.unschedulable:
+            status += ",SchedulingDisabled"
+
+        prefix = "node-role.kubernetes.io/"
+        roles = [label.replace(prefix, "") for label in node.metadata.labels or {}
+                 if label.startswith(prefix)]
+
+        # kubectl prints the age as the largest unit that fits, e.g. 3d or 5m
+        age = datetime.now(timezone.utc) - node.metadata.creation_timestamp
+        seconds = int(age.total_seconds())
+        for unit, unit_seconds in [("d", 86400), ("h", 3600), ("m", 60), ("s", 1)]:
+            if seconds >= unit_seconds or unit == "s":
+                age_str = f"{seconds // unit_seconds}{unit}"
+                break
+
+        return {"name": node.metadata.name,
+                "status": status,
+                "role": ",".join(sorted(roles)) or "<none>",
+                "age": age_str,
+                "version": node.status.node_info.kubelet_version}
+
     def get_namespace(self, name: str) -> bool:
         """
         checks for specific namespace and returns True if it exists,
@@ -161,23 +250,42 @@ class K8s():
         """
         # check the current pod name
         pods = self.get_pod_names(name, namespace)
-        if pods:
-            pod_name = pods[0]
+        pod_name = pods[0] if pods else ""
 
-        # scale deployment down
-        subproc([f"kubectl scale deploy -n {namespace} {name} --replicas=0",
-                 f"kubectl rollout status deployment -n {namespace} {name}"])
+        try:
+            # scale deployment down
+            self._scale_deployment(name, namespace, 0)
+        except Exception as e:
+            self._fallback("scale deployment", e)
+            subproc([f"kubectl scale deploy -n {namespace} {name} --replicas=0",
+                     f"kubectl rollout status deployment -n {namespace} {name}"])
 
         # make sure the old pod is gone
-        while True:
-            if not pod_name:
-                break
-            if pod_name not in self.get_pod_names(name, namespace):
-                break
+        while pod_name and pod_name in self.get_pod_names(name, namespace):
+            sleep(1)
+
+        try:
+            # scale deployment back up
+            self._scale_deployment(name, namespace, replicas)
+        except Exception as e:
+            self._fallback("scale deployment", e)
+            subproc([f"kubectl scale deploy -n {namespace} {name} --replicas={replicas}",
+                     f"kubectl rollout status deployment -n {namespace} {name}"])
+
+    def _scale_deployment(self,
+                          name: str,
+                          namespace: str,
+                          replicas: int,
+                          timeout: int|None = None) -> None:
+        """
+        scale a deployment and wait till the rollout is done, like kubectl
+        scale followed by kubectl rollout status, which never gives up
+        """
+        log.info(f"Scaling deployment {name} in {namespace} to {replicas}")
+        self.apps_v1_api.patch_namespaced_deployment_scale(
+                name, namespace, {"spec": {"replicas": replicas}})
 
-        # scale deployment back up
-        subproc([f"kubectl scale deploy -n {namespace} {name} --replicas={replicas}",
-                 f"kubectl rollout status deployment -n {namespace} {name}"])
+        self._wait_for_rollout(name, namespace, timeout)
 
     def get_pod_names(self,
                       name: str,
@@ -186,12 +294,20 @@ class K8s():
         """
         get the pod name from a deployment or job based on the label
         """
+        selector = f"app.kubernetes.io/instance={name}"
+        if extra_label:
+            selector += "," + extra_label
+
+        try:
+            pods = self.core_v1_api.list_namespaced_pod(namespace,
+                                                        label_selector=selector)
+            return [pod.metadata.name for pod in pods.items]
+        except Exception as e:
+            self._fallback("list pods", e)
+
         pod_cmd = (f"kubectl get pods -n {namespace} --no-headers"
                    " -o custom-columns=NAME:.metadata.name"
-                   f" -l app.kubernetes.io/instance={name}")
-
-        if extra_label:
-            pod_cmd += "," + extra_label
+                   f" -l {selector}")
 
         pods = subproc([pod_cmd])
 
@@ -243,8 +359,40 @@ class K8s():
                         selector: str = "component=controller"):
         """
         applies a manifest and waits with a nice loading bar if deployment name
-        is passed in
+        is passed in. manifest_file_name can be a local file or a URL.
         """
+        try:
+            self._apply_manifest_docs(self._load_manifest(manifest_file_name),
+                                      namespace)
+            applied = True
+        except Exception as e:
+            self._fallback(f"apply {manifest_file_name}", e)
+            applied = False
+
+        # the waits stay outside the try above: if they time out, the manifest
+        # is already applied, so falling back to kubectl would only apply it
+        # and wait all over again
+        if applied:
+            if deployment:
+                try:
+                    self._wait_for_rollout(deployment, namespace)
+                except TimeoutError:
+                    raise
+                except Exception as e:
+                    # only the watch failed, so we just wait with kubectl
+                    self._fallback(f"wait for deployment/{deployment}", e)
+                    subproc([f"kubectl rollout status -n {namespace} "
+                             f"deployment/{deployment}"])
+                self.wait(namespace, selector=selector, timeout=300)
+            return True
+
+        # kubectl can apply our cached copy of a remote manifest too
+        if manifest_file_name.startswith(("https://", "http://")):
+            try:
+                manifest_file_name = manifest_cache.cached_file(manifest_file_name)
+            except Exception as e:
+                log.debug(f"No cached copy of {manifest_file_name}: {e}")
+
         if not namespace:
             cmds = [f"kubectl apply --wait -f {manifest_file_name}"]
         else:
@@ -262,18 +410,91 @@ class K8s():
         subproc(cmds)
         return True
 
+    def _load_manifest(self, manifest_file_name: str) -> list[dict]:
+        """
+        returns every yaml document in a local manifest file or a URL
+        """
+        if manifest_file_name.startswith(("https://", "http://")):
+            manifest = manifest_cache.fetch(manifest_file_name)
+        else:
+            with open(manifest_file_name, 'r') as manifest_file:
+                manifest = manifest_file.read()
+
+        yaml = YAML(typ='safe')
+        return [doc for doc in yaml.load_all(manifest) if doc]
+
+    def _apply_manifest_docs(self,
+                             manifest_docs: list[dict],
+                             namespace: str = "") -> None:
+        """
+        server side apply a list of resource dicts, like kubectl apply
+        """
+        for doc in manifest_docs:
+            # a v1 List is just a wrapper around more resources
+            if doc.get('kind', '').endswith('List') and 'items' in doc:
+                self._apply_manifest_docs(doc['items'], namespace)
+                continue
+
+            resource = self.dynamic_client.resources.get(
+                    api_version=doc['apiVersion'], kind=doc['kind'])
+
+            resource_namespace = None
+            if resource.namespaced:
+                resource_namespace = doc['metadata'].get('namespace', namespace)
+                resource_namespace = resource_namespace or "default"
+
+            log.debug(f"Applying {doc['kind']} {doc['metadata']['name']}")
+            self.dynamic_client.server_side_apply(
+                    resource,
+                    body=doc,
+                    namespace=resource_namespace,
+                    field_manager="smol-k8s-lab",
+                    force_conflicts=True)
+
+    def _wait_for_rollout(self,
+                          name: str,
+                          namespace: str,
+                          timeout: int|None = None) -> None:
+        """
+        wait for a deployment to finish rolling out, like kubectl rollout
+        status. If timeout is None, we never give up, which is what kubectl
+        rollout status does by default
+        """
+        def rolled_out(deploy: dict) -> bool:
+            wanted = deploy['spec'].get('replicas', 0)
+            status = deploy.get('status', {})
+            return status.get('observedGeneration', 0) >= deploy['metadata']['generation'] \
+                and status.get('updatedReplicas', 0) == wanted \
+                and status.get('availableReplicas', 0) == wanted
+
+        self.watcher.wait_for(Wait("deployment", namespace, rolled_out, name=name),
+                              timeout)
+
     def apply_custom_resources(self, custom_resource_dict_list: list[dict]):
         """
         Does a kube apply on a custom resource dict, and retries if it fails
         using loading bar for progress
         """
+        log.debug(custom_resource_dict_list)
+
+        # anything we can't apply via the API, we retry via kubectl below
+        retry_list = []
+        for custom_resource_dict in custom_resource_dict_list:
+            try:
+                self._apply_manifest_docs([custom_resource_dict])
+            except Exception as e:
+                self._fallback(f"apply {custom_resource_dict['kind']}", e)
+                retry_list.append(custom_resource_dict)
+
+        if not retry_list:
+            return
+
         k_cmd = 'kubectl apply --wait -f '
         commands = {}
-        log.debug(custom_resource_dict_list)
         yaml = YAML()
 
         # Write YAML data to f'{XDG_CACHE_DIR}/{resource_name}.yaml'.
-        for custom_resource_dict in custom_resource_dict_list:
+        for custom_resource_dict in retry_list:
             resource_name = "_".join([custom_resource_dict['kind'],
                                       custom_resource_dict['metadata']['name']])
             yaml_file_name = path.join(XDG_CACHE_DIR, f'{resource_name}.yaml')
@@ -290,54 +511,77 @@ class K8s():
                           secret_name: str,
                           secret_namespace: str,
                           updated_values_dict: dict,
-                          in_line_key_name: str = 'secret_vars.yaml') -> None:
+                          in_line_key_name: str = 'secret_vars.yaml',
+                          retries: int = 5) -> None:
         """
         update a key in a k8s secret
         if in_line_key_name is set to a key name, you can specify a base key in a
         secret that contains an inline yaml block
-        """
 
-        # get current secret data, but catch if there's no secret at all
-        try:
-            secret_data = self.get_secret(secret_name, secret_namespace)['data']
-        except Exception as e:
-            log.error(f"Error getting secret: {e}")
-            log.info("creating new secret")
-            if in_line_key_name:
+        We patch only the changed keys, and send the resourceVersion we read, so
+        if someone else updated the secret in the meantime, the API server
+        refuses our patch (409 Conflict) and we read it and try again, up to
+        retries times.
+        """
+        for attempt in range(retries):
+            # get current secret, but catch if there's no secret at all
+            try:
+                secret = self.core_v1_api.read_namespaced_secret(secret_name,
+                                                                 secret_namespace)
+            except ApiException as e:
+                if e.status != 404:
+                    log.error(f"Error getting secret: {e}")
+                log.info("creating new secret")
                 self.create_secret(secret_name,
                                    secret_namespace,
                                    updated_values_dict,
                                    in_line_key_name)
+                # return immediately so we don't do the rest of the function
+                return
+
+            secret_data = secret.data or {}
+            patch_data = {}
+
+            # if this is a secret with a filename key and then inline yaml inside...
+            if in_line_key_name:
+                yaml = YAML(typ='safe')
+                file_key = secret_data.get(in_line_key_name, "")
+                decoded_data = b64dec(str.encode(file_key)).decode('utf8')
+                # load the yaml as a python dictionary
+                in_line_yaml = yaml.load(decoded_data) or {}
+                changed = {key: value for key, value in updated_values_dict.items()
+                           if in_line_yaml.get(key) != value}
+                if changed:
+                    in_line_yaml.update(changed)
+                    dump_yaml = YAML(typ=['rt', 'string'])
+                    new_data = dump_yaml.dump_to_string(in_line_yaml)
+                    patch_data[in_line_key_name] = b64enc(
+                            new_data.encode('utf8')).decode('utf8')
             else:
-                self.create_secret(secret_name,
-                                   secret_namespace,
-                                   updated_values_dict)
-            # return immediately so we don't do the rest of the function
-            return
+                for key, updated_value in updated_values_dict.items():
+                    encoded = b64enc(str(updated_value).encode('utf8')).decode('utf8')
+                    if secret_data.get(key) != encoded:
+                        patch_data[key] = encoded
 
-        # if this is a secret with a filename key and then inline yaml inside...
-        if in_line_key_name:
-            yaml = YAML(typ='safe')
-            file_key = secret_data[in_line_key_name]
-            decoded_data  = b64dec(str.encode(file_key)).decode('utf8')
-            # load the yaml as a python dictionary
-            in_line_yaml = yaml.load(decoded_data)
-            # for each key, updated_value in updated_values_dict
-            for key, updated_value in updated_values_dict.items():
-               # update the in-line yaml
-               in_line_yaml[key] = updated_value
-            self.delete_secret(secret_name, secret_namespace)
-            # update the inline yaml for the dict we'll feed back to
-            self.create_secret(secret_name,
-                               secret_namespace,
-                               in_line_yaml,
-                               in_line_key_name)
-        else:
-            for key, updated_value in updated_values_dict.items():
-               # update the keys in the secret yaml one by one
-               secret_data[key] = b64enc(bytes(updated_value))
-            self.delete_secret(secret_name, secret_namespace)
-            self.create_secret(secret_name, secret_namespace, secret_data)
+            if not patch_data:
+                log.debug(f"Secret {secret_name} already up to date")
+                return
+
+            body = {"metadata": {"resourceVersion": secret.metadata.resource_version},
+                    "data": patch_data}
+            try:
+                self.core_v1_api.patch_namespaced_secret(secret_name,
+                                                         secret_namespace,
+                                                         body)
+                return
+            except ApiException as e:
+                if e.status != 409:
+                    raise
+                log.debug(f"Secret {secret_name} changed while we were updating "
+                          f"it, retrying (attempt {attempt + 1} of {retries})")
+
+        raise RuntimeError(f"Could not update secret {secret_name} after "
+                           f"{retries} attempts, because it kept changing")
 
     def run_k8s_cmd(self,
                     pod_name: str,
@@ -363,27 +607,45 @@ class K8s():
              namespace: str,
              name: str = "",
              instance: str = "",
-             quiet: bool = False) -> str:
+             quiet: bool = False,
+             selector: str = "",
+             timeout: int = 600) -> str:
         """
         wait for a given deployment, statefulset, pod, or job to complete or be ready.
-        must pass in either name or instance args.
+        must pass in either name, instance, or selector args.
 
         args:
             namespace  - str, namespace of resource to wait on
             name       - str, optional name of resource to wait on
             instance   - str, optional value for app.kubernetes.io/instance label
+            selector   - str, optional label selector for the pods to wait on
+            timeout    - int, seconds to wait for the pods to be ready, once
+                         there are any
         """
+        if instance:
+            selector = f"app.kubernetes.io/instance={instance}"
+        elif not name and not selector:
+            log.error("Expected [i]name[/i] or [i]instance[/i] for wait command")
+            return
+
+        try:
+            return self._wait_for_pods_ready(namespace, name, selector, timeout)
+        except TimeoutError as e:
+            # kubectl wait also just gives up with an error message
+            log.error(str(e))
+            return str(e)
+        except Exception as e:
+            self._fallback("wait on pods", e)
+
         wait_cmd = (
-                f'kubectl wait pod -n {namespace} --for=condition=ready --timeout=10m'
+                f'kubectl wait pod -n {namespace} --for=condition=ready '
+                f'--timeout={timeout}s'
                 )
 
-        if instance:
-            wait_cmd += f" -l app.kubernetes.io/instance={instance}"
-        elif name:
-            wait_cmd += f" {name}"
+        if selector:
+            wait_cmd += f" -l {selector}"
         else:
-            log.error("Expected [i]name[/i] or [i]instance[/i] for wait command")
-            return
+            wait_cmd += f" {name}"
 
         # keep retrying till we find the thing...
         while True:
@@ -398,3 +660,20 @@ class K8s():
             else:
                 log.debug("No matching resource found, waiting 3 seconds...")
                 sleep(3)
+
+    def _wait_for_pods_ready(self,
+                             namespace: str,
+                             name: str = "",
+                             selector: str = "",
+                             timeout: int = 600) -> str:
+        """
+        watch till there's at least one matching pod and all matching pods
+        are ready. Like retrying kubectl wait till it finds something, we
+        wait as long as it takes for a pod to show up, and only then give the
+        pods timeout seconds to be ready. Returns the same message kubectl
+        wait would.
+        """
+        wait = Wait("pod", namespace, pod_ready, name=name, label_selector=selector)
+        self.watcher.wait_for(wait, timeout, from_first_match=True)
+        log.info("found resource and waited on it")
+        return "\n".join(f"pod/{pod} condition met" for pod in wait.matches)
@@ -0,0 +1,342 @@
+"""
+       Name: k8s_watch
+DESCRIPTION: wait on Kubernetes resources using the watch API, so that we
+             return the moment a Job, Pod, Backup, or Restore is done, instead
+             of sleeping and polling
+     AUTHOR: @jessebot
+    LICENSE: GNU AFFERO GENERAL PUBLIC LICENSE Version 3
+"""
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import client, watch
+from kubernetes.client.rest import ApiException
+import logging as log
+from time import monotonic
+
+
+# plural names of the custom resources we wait on, with their group/version
+CUSTOM_RESOURCES = {
+        "backups.k8up.io": ("k8up.io", "v1", "backups"),
+        "restores.k8up.io": ("k8up.io", "v1", "restores"),
+        "backups.postgresql.cnpg.io": ("postgresql.cnpg.io", "v1", "backups"),
+        "applications.argoproj.io": ("argoproj.io", "v1alpha1", "applications")
+        }
+
+
+def get_field(obj: dict, field_path: str, default=None):
+    """
+    get a nested field from a resource dict using a dotted path, e.g.
+    get_field(pod, "status.phase")
+    """
+    for key in field_path.split('.'):
+        if not isinstance(obj, dict) or key not in obj:
+            return default
+        obj = obj[key]
+    return obj
+
+
+def has_condition(condition_type: str, status: str = "True") -> callable:
+    """
+    returns a predicate that is True when a resource has a status condition
+    of condition_type with the given status, e.g. has_condition("Complete")
+    """
+    def predicate(obj: dict) -> bool:
+        for condition in get_field(obj, "status.conditions", []) or []:
+            if condition.get('type') == condition_type and \
+                    str(condition.get('status')) == status:
+                return True
+        return False
+    return predicate
+
+
+def field_equals(field_path: str, value) -> callable:
+    """
+    returns a predicate that is True when a field is equal to value, e.g.
+    field_equals("status.phase", "completed")
+    """
+    def predicate(obj: dict) -> bool:
+        return get_field(obj, field_path) == value
+    return predicate
+
+
+def pod_ready(obj: dict) -> bool:
+    """
+    True if a pod is ready, or already completed like the pod of a job
+    """
+    return get_field(obj, "status.phase") == "Succeeded" or \
+        has_condition("Ready")(obj)
+
+
+# common predicates, so callers don't have to build their own
+job_complete = has_condition("Complete")
+job_failed = has_condition("Failed")
+
+
+class Wait():
+    """
+    one thing to wait for: a named resource, or every resource matching a
+    label selector, until predicate(resource) is True
+    """
+    def __init__(self,
+                 resource: str,
+                 namespace: str,
+                 predicate: callable,
+                 name: str = "",
+                 label_selector: str = "",
+                 failed: callable = None):
+        """
+        resource:       str, "pod", "job", "deployment", or a key of
+                        CUSTOM_RESOURCES, e.g. "restores.k8up.io"
+        namespace:      str, namespace of the resource
+        predicate:      callable, takes the resource as a dict, returns bool
+        name:           str, name of the resource to wait on
+        label_selector: str, e.g. "app.kubernetes.io/instance=nextcloud".
+                        all matching resources must satisfy predicate
+        failed:         optional callable, if it returns True for a resource,
+                        we stop waiting and raise a RuntimeError
+        """
+        if not name and not label_selector:
+            raise ValueError("Wait needs either a name or a label_selector")
+        self.resource = resource
+        self.namespace = namespace
+        self.predicate = predicate
+        self.name = name
+        self.labels = parse_selector(label_selector)
+        self.failed = failed
+        # every resource we've seen that matches, by name
+        self.matches = {}
+        # when we give up, as a monotonic() time. None means never, see start
+        self.deadline = None
+        self._timeout = None
+        self._from_first_match = False
+
+    def __repr__(self) -> str:
+        target = self.name or self.label_selector
+        return f"{self.resource}/{target} in {self.namespace}"
+
+    @property
+    def label_selector(self) -> str:
+        return ",".join(f"{k}={v}" for k, v in self.labels.items())
+
+    @property
+    def selectors(self) -> dict:
+        """
+        kwargs to only list and watch the resources we're waiting on
+        """
+        if self.name:
+            return {"field_selector": f"metadata.name={self.name}"}
+        return {"label_selector": self.label_selector}
+
+    def start(self, timeout: int|None, from_first_match: bool = False) -> None:
+        """
+        start the clock on this wait. If timeout is None, we never give up.
+        If from_first_match is True, we wait as long as it takes for a
+        matching resource to show up, and only then give it timeout seconds,
+        like retrying kubectl wait till it finds something
+        """
+        self._timeout = timeout
+        self._from_first_match = from_first_match
+        self.deadline = None
+        if timeout is not None and not (from_first_match and not self.matches):
+            self.deadline = monotonic() + timeout
+
+    def matches_resource(self, obj: dict) -> bool:
+        """
+        if this resource is one we're waiting on
+        """
+        if self.name:
+            return get_field(obj, "metadata.name") == self.name
+        labels = get_field(obj, "metadata.labels", {}) or {}
+        return all(labels.get(key) == value for key, value in self.labels.items())
+
+    def update(self, event_type: str, obj: dict) -> None:
+        """
+        record the latest version of a matching resource
+        """
+        if not self.matches_resource(obj):
+            return
+        name = get_field(obj, "metadata.name")
+        if event_type == "DELETED":
+            self.matches.pop(name, None)
+        else:
+            self.matches[name] = obj
+            if self.deadline is None and self._from_first_match and \
+                    self._timeout is not None:
+                self.deadline = monotonic() + self._timeout
+            if self.failed and self.failed(obj):
+                raise RuntimeError(f"{self} failed: {obj.get('status', {})}")
+
+    @property
+    def done(self) -> bool:
+        return bool(self.matches) and all(self.predicate(obj)
+                                          for obj in self.matches.values())
+
+
+def parse_selector(label_selector: str) -> dict:
+    """
+    turns "a=b,c=d" into {"a": "b", "c": "d"}. Only equality is supported
+    """
+    labels = {}
+    for part in label_selector.split(','):
+        if part.strip():
+            key, _, value = part.partition('=')
+            labels[key.strip()] = value.strip().lstrip('=')
+    return labels
+
+
+class K8sWatcher():
+    """
+    Waits on Kubernetes resources via the watch API. All the waits on the
+    same kind of resource in the same namespace share one watch connection,
+    which only lists and watches the resource we're waiting on, if there's
+    just one.
+    """
+    def __init__(self, api_client: client.ApiClient):
+        self.api_client = api_client
+        self.core_v1_api = client.CoreV1Api(api_client)
+        self.apps_v1_api = client.AppsV1Api(api_client)
+        self.batch_v1_api = client.BatchV1Api(api_client)
+        self.custom_api = client.CustomObjectsApi(api_client)
+
+    def _list_args(self, resource: str, namespace: str) -> tuple:
+        """
+        returns the list function and args to list or watch a resource type
+        """
+        if resource == "pod":
+            return self.core_v1_api.list_namespaced_pod, [namespace]
+        if resource == "job":
+            return self.batch_v1_api.list_namespaced_job, [namespace]
+        if resource == "deployment":
+            return self.apps_v1_api.list_namespaced_deployment, [namespace]
+        if resource in CUSTOM_RESOURCES:
+            group, version, plural = CUSTOM_RESOURCES[resource]
+            return (self.custom_api.list_namespaced_custom_object,
+                    [group, version, namespace, plural])
+        raise ValueError(f"We don't know how to watch {resource}")
+
+    def _to_dict(self, obj) -> dict:
+        """
+        custom resources are already dicts, but the rest are model objects
+        """
+        if isinstance(obj, dict):
+            return obj
+        return self.api_client.sanitize_for_serialization(obj)
+
+    def wait_for(self,
+                 wait: Wait,
+                 timeout: int|None = 600,
+                 error_ok: bool = False,
+                 from_first_match: bool = False) -> dict:
+        """
+        block until wait is done and return the (last) matching resource.
+        See wait_for_all for the args. Returns {} if we gave up and error_ok
+        """
+        if not self.wait_for_all([wait], timeout, error_ok, from_first_match):
+            return {}
+        return list(wait.matches.values())[-1]
+
+    def wait_for_all(self,
+                     waits: list[Wait],
+                     timeout: int|None = 600,
+                     error_ok: bool = False,
+                     from_first_match: bool = False) -> bool:
+        """
+        block until every Wait is done. Raises a TimeoutError if any one of
+        them takes longer than timeout seconds. If timeout is None, we wait
+        as long as it takes. If from_first_match is True, each wait's timeout
+        only starts once something matches it, see Wait.start
+
+        If error_ok is True, we log a timeout or a failed resource instead of
+        raising, and return False, like kubectl wait giving up.
+        """
+        groups = {}
+        for wait in waits:
+            wait.start(timeout, from_first_match)
+            groups.setdefault((wait.resource, wait.namespace), []).append(wait)
+
+        try:
+            if len(groups) == 1:
+                self._watch_group(*list(groups.items())[0])
+            else:
+                with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                    futures = [pool.submit(self._watch_group, key, group)
+                               for key, group in groups.items()]
+                    for future in futures:
+                        future.result()
+        except (TimeoutError, RuntimeError) as e:
+            if not error_ok:
+                raise
+            log.error(f"Stopped waiting: {e}")
+            return False
+        return True
+
+    def _watch_group(self, key: tuple, waits: list[Wait]) -> None:
+        """
+        list once, then watch from that resourceVersion till all waits are
+        done. If the resourceVersion is too old (410 Gone), list again.
+        """
+        resource, namespace = key
+        list_func, args = self._list_args(resource, namespace)
+        # we can't OR selectors together, so a shared watch sees everything
+        # of this kind in the namespace, and each Wait picks out its own
+        selectors = waits[0].selectors if len(waits) == 1 else {}
+
+        while True:
+            # initial list, so we don't miss anything that's already done
+            listing = self._to_dict(list_func(*args, **selectors))
+            for obj in listing.get('items', []):
+                for wait in waits:
+                    wait.update("ADDED", obj)
+            resource_version = get_field(listing, "metadata.resourceVersion")
+
+            try:
+                while not all(wait.done for wait in waits):
+                    # the api server ends each watch after at most 5 minutes
+                    watch_seconds = 300
+                    now = monotonic()
+                    remaining = {w: int(w.deadline - now) for w in waits
+                                 if not w.done and w.deadline is not None}
+                    if remaining:
+                        late = [w for w, left in remaining.items() if left <= 0]
+                        if late:
+                            raise TimeoutError(f"Timed out waiting on {late}")
+                        watch_seconds = min(min(remaining.values()), watch_seconds)
+
+                    watch_end = now + watch_seconds
+                    log.debug(f"Watching {resource} in {namespace} from "
+                              f"resourceVersion {resource_version}")
+                    stream = watch.Watch().stream(
+                            list_func, *args,
+                            resource_version=resource_version,
+                            timeout_seconds=watch_seconds,
+                            allow_watch_bookmarks=True,
+                            **selectors)
+                    for event in stream:
+                        obj = self._to_dict(event['object'])
+                        if event['type'] == "ERROR":
+                            if obj.get('code') == 410:
+                                raise ApiException(status=410)
+                            log.debug(f"Watch error on {resource}: {obj}")
+                            continue
+
+                        resource_version = get_field(
+                                obj, "metadata.resourceVersion", resource_version)
+                        if event['type'] == "BOOKMARK":
+                            continue
+
+                        for wait in waits:
+                            wait.update(event['type'], obj)
+                        if all(wait.done for wait in waits):
+                            stream.close()
+                            break
+                        # a wait may have just found its first match, and so
+                        # started its clock, so rewatch if it's due before
+                        # this watch ends
+                        if any(w.deadline is not None and w.deadline < watch_end
+                               for w in waits if not w.done):
+                            stream.close()
+                            break
+                return
+            except ApiException as e:
+                if e.status != 410:
+                    raise
+                log.debug(f"resourceVersion for {resource} expired, relisting")
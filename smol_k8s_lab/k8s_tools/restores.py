@@ -8,6 +8,8 @@ DESCRIPTION: restore stuff with k8up (restic on k8s) and cnpg operator
 from smol_k8s_lab.constants import XDG_CACHE_DIR
 from smol_k8s_lab.k8s_tools.argocd_util import ArgoCD
 from smol_k8s_lab.k8s_tools.k8s_lib import K8s
+from smol_k8s_lab.k8s_tools.k8s_watch import (Wait, field_equals, job_complete,
+                                              job_failed)
 from smol_k8s_lab.k8s_tools.helm import Helm
 from smol_k8s_lab.utils.run.subproc import subproc
 from smol_k8s_lab.utils.minio_lib import BetterMinio
@@ -22,6 +24,50 @@ from time import sleep
 import yaml
 
 
+# the manifests each app's restore applies from its argo repo, as they're
+# appended to argo.path, so we can prefetch them before the cluster is up.
+# External secrets are only applied when we have bitwarden
+_EXTERNAL_SECRETS = "external_secrets_argocd_appset.yaml"
+_PVC = "pvc_argocd_appset.yaml"
+_SEAWEEDFS = ["s3_pvc_appset.yaml", "s3_provider_argocd_appset.yaml"]
+RESTORE_MANIFESTS = {
+        'forgejo': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'ghost': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'gotosocial': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'grafana_stack': ["/" + _EXTERNAL_SECRETS, *_SEAWEEDFS],
+        'harbor': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'jellyfin': [_EXTERNAL_SECRETS, _PVC],
+        'mastodon': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'matrix': ["/" + _EXTERNAL_SECRETS, *_SEAWEEDFS],
+        'netmaker': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'nextcloud': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'peertube': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'writefreely': [_EXTERNAL_SECRETS, _PVC, *_SEAWEEDFS],
+        'zitadel': ["/" + _EXTERNAL_SECRETS, *_SEAWEEDFS]
+        }
+
+
+def restore_manifest_urls(apps: dict, bitwarden: bool = False) -> list:
+    """
+    returns the URLs of the manifests that the restores of the enabled apps
+    in apps (the apps section of the config) will apply
+    """
+    urls = []
+    for app, manifests in RESTORE_MANIFESTS.items():
+        cfg = apps.get(app, {})
+        restore = cfg.get('init', {}).get('restore', {})
+        if not cfg.get('enabled', False) or not restore.get('enabled', False):
+            continue
+
+        argo = cfg['argo']
+        for manifest in manifests:
+            if manifest.endswith(_EXTERNAL_SECRETS) and not bitwarden:
+                continue
+            urls.append("https://raw.githubusercontent.com/small-hack/argocd-apps/"
+                        f"{argo['revision']}/{argo['path']}{manifest}")
+    return urls
+
+
 def restore_seaweedfs(argocd: ArgoCD,
                       app: str,
                       namespace: str,
@@ -50,19 +96,27 @@ def restore_seaweedfs(argocd: ArgoCD,
             f"{argocd_path}s3_pvc_appset.yaml")
     argocd.k8s.apply_manifests(pvc_appset, argocd.namespace)
 
+    # start both restores, and then wait on them together, on one watch
+    restores = []
     for swfs_pvc, snapshot_id in snapshots.items():
         # build a k8up restore file and apply it
-        k8up_restore_pvc(argocd.k8s,
-                         app,
-                         swfs_pvc,
-                         namespace,
-                         s3_endpoint,
-                         s3_bucket,
-                         access_key_id,
-                         secret_access_key,
-                         restic_repo_password,
-                         snapshot_id,
-                         "s3-backups-podconfig")
+        restores.append(k8up_restore_pvc(argocd.k8s,
+                                         app,
+                                         swfs_pvc,
+                                         namespace,
+                                         s3_endpoint,
+                                         s3_bucket,
+                                         access_key_id,
+                                         secret_access_key,
+                                         restic_repo_password,
+                                         snapshot_id,
+                                         "s3-backups-podconfig",
+                                         wait=False))
+
+    log.info(f"Waiting on k8up restores: {restores}")
+    argocd.k8s.watcher.wait_for_all(restores, timeout=None)
+    for restore in restores:
+        tail_pod_logs(argocd.k8s, namespace, restore.name)
 
     # deploy the seaweedfs appset, which will use the restored PVCs above
     seaweedfs_appset = (
@@ -87,9 +141,13 @@ def k8up_restore_pvc(k8s_obj: K8s,
                      secret_access_key: str,
                      restic_repo_password: str,
                      snapshot_id: str = "latest",
-                     pod_config: str = "backups-podconfig"):
+                     pod_config: str = "backups-podconfig",
+                     wait: bool = True) -> Wait:
     """
-    builds a k8up restore manifest and applies it
+    builds a k8up restore manifest and applies it. If wait is True, we wait
+    till the restore is done. Either way, we return the Wait for the restore,
+    so you can start several restores and then wait on them all at once with
+    K8sWatcher.wait_for_all
     """
     # we timestamp this restore job just in case there's others around
     now = datetime.now().strftime('%Y-%m-%d-%H-%M')
@@ -145,23 +203,19 @@ def k8up_restore_pvc(k8s_obj: K8s,
     # apply the k8up restore job
     k8s_obj.apply_custom_resources([restore_dict])
 
-    # loop on check to make sure the restore is done before continuing
-    check_cmd = (f"kubectl get restore -n {namespace} --no-headers -o "
-                 f"custom-columns=COMPLETION:.status.finished {pvc}-{now}")
-    while True:
-        restore_done = subproc([check_cmd]).strip()
-        log.debug(f"restore done returns {restore_done}")
+    restore = Wait("restores.k8up.io", namespace,
+                   field_equals("status.finished", True),
+                   name=f"{pvc}-{now}")
+    if not wait:
+        return restore
 
-        pod_cmd = (f"kubectl get pods -n {namespace} --no-headers -o "
-                   f"custom-columns=NAME:.metadata.name | grep {pvc}-{now}")
-        pod = subproc([pod_cmd], universal_newlines=True, shell=True)
-        subproc([f"kubectl logs -n {namespace} --tail=5 {pod}"], error_ok=True)
+    # wait till the restore is done before continuing
+    log.info(f"Waiting on k8up restore: {restore.name}")
+    k8s_obj.watcher.wait_for(restore, timeout=None)
 
-        if restore_done != "true":
-            # sleep then try again
-            sleep(5)
-        else:
-            break
+    # tail the logs out for the restore pod now that we're done
+    tail_pod_logs(k8s_obj, namespace, restore.name)
+    return restore
 
 
 def get_latest_snapshot(pvc: str,
@@ -300,20 +354,13 @@ def restore_cnpg_cluster(k8s_obj: K8s,
     # check for cnpg recovery job and wait for it.
     # example job name: nextcloud-postgres-1-full-recovery
     recover_job = f"{cluster_name}-1-full-recovery"
-    wait_cmd = (f"kubectl wait -n {namespace} --for=condition=complete "
-                f"--timeout=30m job/{recover_job}")
-    wait_msg = f"Waiting on cnpg recovery job: {recover_job}"
-    while True:
-        log.debug(wait_msg)
-        res = subproc([wait_cmd], error_ok=True)
-        if "NotFound" in res:
-            sleep(1)
-        else:
-            pods = k8s_obj.get_pod_names(recover_job, namespace)
-            if pods:
-                tail_out = subproc([f"kubectl tail -n {namespace} {pods[0]}"])
-                log.info(tail_out)
-            break
+    # like kubectl wait --timeout=30m, we give up after 30m and carry on
+    log.info(f"Waiting on cnpg recovery job: {recover_job}")
+    k8s_obj.watcher.wait_for(Wait("job", namespace, job_complete,
+                                  name=recover_job, failed=job_failed),
+                             timeout=1800,
+                             error_ok=True)
+    tail_pod_logs(k8s_obj, namespace, recover_job)
 
     # fix backups after restore
     restore_dict['bootstrap'].pop('recovery')
@@ -546,20 +593,25 @@ def create_restic_restore_job(k8s_obj: K8s,
     k8s_obj.apply_custom_resources([restore_job])
 
     # wait for restore job to complete
-    wait_cmd = (f"kubectl wait job -n {namespace} --for=condition=complete "
-                f"{app}-restic-restore-{now} --timeout=15m")
-    pod_cmd = (f"kubectl get pods -n {namespace} --no-headers -o "
-               f"custom-columns=NAME:.metadata.name | grep {app}-restic-restore-{now}")
-    log.info(wait_cmd)
-    while True:
-        log.debug(f"Waiting for restore job: {app}-restic-restore-{now}")
-        res = subproc([wait_cmd], error_ok=True)
-        log.debug(res)
+    job_name = f"{app}-restic-restore-{now}"
+    # like kubectl wait --timeout=15m, we give up after 15m and carry on
+    log.info(f"Waiting for restore job: {job_name}")
+    k8s_obj.watcher.wait_for(Wait("job", namespace, job_complete,
+                                  name=job_name, failed=job_failed),
+                             timeout=900,
+                             error_ok=True)
 
-        if "NotFound" in res:
-            sleep(1)
-        else:
-            # tail the logs out for the pod if we're done
-            pod = subproc([pod_cmd], universal_newlines=True, shell=True)
-            subproc([f"kubectl logs -n {namespace} --tail=5 {pod}"], error_ok=True)
-            break
+    # tail the logs out for the pod if we're done
+    tail_pod_logs(k8s_obj, namespace, job_name)
+
+
+def tail_pod_logs(k8s_obj: K8s, namespace: str, name_contains: str) -> None:
+    """
+    log the last few lines of output from every pod in a namespace whose name
+    contains name_contains, e.g. the pods of a restore job
+    """
+    pods = k8s_obj.core_v1_api.list_namespaced_pod(namespace).items
+    for pod in pods:
+        if name_contains in pod.metadata.name:
+            subproc([f"kubectl logs -n {namespace} --tail=5 {pod.metadata.name}"],
+                    error_ok=True)
@@ -1,6 +1,6 @@
 # smol-k8s-lab libraries
 from smol_k8s_lab.constants import INITIAL_USR_CONFIG, XDG_CONFIG_FILE, VERSION
-from smol_k8s_lab.k8s_distros import check_all_contexts
+from smol_k8s_lab.k8s_distros import cached_contexts, check_all_contexts
 from smol_k8s_lab.tui.apps_screen import AppsConfigScreen
 from smol_k8s_lab.tui.base_widgets.audio_widget import SmolAudio
 from smol_k8s_lab.tui.base_widgets.cluster_modal import ClusterModalScreen
@@ -13,6 +13,8 @@ from smol_k8s_lab.tui.smol_k8s_config_screen import SmolK8sLabConfig
 from smol_k8s_lab.tui.tui_config_screen import TuiConfigScreen
 
 # external libraries
+from os import replace
+import pickle
 from pyfiglet import Figlet
 from rich.text import Text
 from ruamel.yaml import YAML
@@ -22,6 +24,7 @@ from textual.events import DescendantFocus
 from textual.binding import Binding
 from textual.containers import Grid
 from textual.widgets import Footer, DataTable, Label
+from threading import Lock
 
 
 class BaseApp(App):
@@ -56,16 +59,27 @@ class BaseApp(App):
 
     CSS_PATH = ["./css/base.tcss", "./css/help.tcss"]
 
+    # seconds to wait after the last change before writing the config file
+    WRITE_YAML_DELAY = 0.5
+
     def __init__(self, user_config: dict = INITIAL_USR_CONFIG) -> None:
         self.cfg = user_config
         self.show_footer = self.cfg['smol_k8s_lab']['tui']['show_footer']
         self.cluster_names = []
+        self.cluster_table = None
         self.current_cluster = ""
         accessibility = self.cfg['smol_k8s_lab']['tui']['accessibility']
         self.bell_on_focs = accessibility['bell']['on_focus']
         self.bell_on_error = accessibility['bell']['on_error']
         self.speak_on_focus = accessibility['text_to_speech']['on_focus']
 
+        # write behind state for write_yaml
+        self._write_timer = None
+        self._pending_config_file = ""
+        self._write_lock = Lock()
+        self._snapshot_count = 0
+        self._written_count = 0
+
         super().__init__()
 
     def compose(self) -> ComposeResult:
@@ -106,8 +120,9 @@ class BaseApp(App):
         title = "[#ffaff9]Create[/] a [i]new[/] [#C1FF87]cluster[/] with the name below"
         self.get_widget_by_id("base-new-cluster-input-box-grid").border_title = title
 
-        # get all clusters
-        clusters = check_all_contexts()
+        # show the clusters we found last time right away, and then look for
+        # the current ones in the background
+        clusters = cached_contexts()
 
         if clusters:
             self.generate_cluster_table(clusters)
@@ -116,6 +131,67 @@ class BaseApp(App):
             self.get_widget_by_id("base-screen-container").add_class("no-cluster-table")
             self.call_after_refresh(self.play_screen_audio, screen="base")
 
+        self.run_worker(self.discover_clusters,
+                        group="discover_clusters",
+                        exclusive=True,
+                        thread=True)
+
+    @property
+    def base_screen(self):
+        """
+        the screen with the cluster table, even if another screen is on top
+        """
+        return self.screen_stack[0]
+
+    def discover_clusters(self) -> None:
+        """
+        check every context's cluster at once, in a thread worker, updating
+        the cluster table as each one answers
+        """
+        clusters = check_all_contexts(
+                on_result=lambda row: self.call_from_thread(self.update_cluster_row, row))
+        self.call_from_thread(self.remove_stale_clusters, [row[0] for row in clusters])
+
+    def update_cluster_row(self, row: tuple) -> None:
+        """
+        add a cluster to the cluster table, or update it if it's already there
+        """
+        if not self.cluster_names:
+            screen = self.base_screen.get_widget_by_id("base-screen-container")
+            screen.remove_class("no-cluster-table")
+            self.generate_cluster_table([row])
+            return
+
+        styled_row = [Text(str("\n" + cell), justify="center") for cell in row]
+        if row[0] in self.cluster_names:
+            for column, cell in zip(self.cluster_table.columns, styled_row):
+                self.cluster_table.update_cell(row[0], column, cell,
+                                              update_width=True)
+        else:
+            self.cluster_table.add_row(*styled_row, height=3, key=row[0])
+            self.cluster_names.append(row[0])
+
+    def remove_stale_clusters(self, cluster_names: list) -> None:
+        """
+        remove clusters we had cached, that aren't in your kubeconfig anymore
+        """
+        for cluster in self.cluster_names[:]:
+            if cluster not in cluster_names:
+                self.remove_cluster_row(cluster)
+
+    def remove_cluster_row(self, cluster: str) -> None:
+        """
+        remove a cluster from the cluster table, and the table if it's empty
+        """
+        self.cluster_table.remove_row(cluster)
+        self.cluster_names.remove(cluster)
+
+        if self.cluster_table.row_count < 1:
+            self.base_screen.get_widget_by_id("base-cluster-table-box-grid").remove()
+            screen = self.base_screen.get_widget_by_id("base-screen-container")
+            screen.remove_class("with-cluster-table")
+            screen.add_class("no-cluster-table")
+
     def generate_cluster_table(self, clusters: list) -> None:
         """
         generate a readable table for all the clusters.
@@ -127,6 +203,8 @@ class BaseApp(App):
                                id="clusters-data-table",
                                cursor_type="row")
 
+        self.cluster_table = data_table
+
         # then fill in the cluster table
         data_table.add_column(Text("Cluster", justify="center"))
         data_table.add_column(Text("Distro", justify="center"))
@@ -153,8 +231,8 @@ class BaseApp(App):
         main_grid.border_title = ("Select a row to [#ffaff9]modify[/] or [#ffaff9]"
                                   "delete[/] an [i]existing[/] [#C1FF87]cluster[/]")
 
-        cluster_container = self.get_widget_by_id("cluster-boxes")
-        self.get_widget_by_id("base-screen-container").add_class("with-cluster-table")
+        cluster_container = self.base_screen.get_widget_by_id("cluster-boxes")
+        self.base_screen.get_widget_by_id("base-screen-container").add_class("with-cluster-table")
         cluster_container.mount(main_grid, before="#base-new-cluster-input-box-grid")
 
     @on(DataTable.RowSelected)
@@ -173,17 +251,8 @@ class BaseApp(App):
                 # make sure we actually got anything, because the user may have hit
                 # the cancel button
                 if cluster and row_key:
-                    data_table = self.query_one(DataTable)
-                    data_table.remove_row(row_key)
-
-                    self.cluster_names.remove(cluster)
+                    self.remove_cluster_row(cluster)
                     self.current_cluster = ""
-
-                    if data_table.row_count < 1:
-                        self.get_widget_by_id("base-cluster-table-box-grid").remove()
-                        screen = self.get_widget_by_id("base-screen-container")
-                        screen.remove_class("with-cluster-table")
-                        screen.add_class("no-cluster-table")
             row_index = event.cursor_row
             row = event.data_table.get_row_at(row_index)
 
@@ -288,12 +357,78 @@ class BaseApp(App):
 
     def write_yaml(self, config_file: str = XDG_CONFIG_FILE) -> None:
         """
-        dump current self.cfg to user's smol-k8s-lab config.yaml
+        save current self.cfg to user's smol-k8s-lab config.yaml, once there
+        haven't been any changes for WRITE_YAML_DELAY seconds. This is called
+        on nearly every key press, so we don't write the file every time.
+        """
+        self._pending_config_file = config_file
+        if self._write_timer:
+            self._write_timer.stop()
+        self._write_timer = self.set_timer(self.WRITE_YAML_DELAY,
+                                           self._write_yaml_in_worker)
+
+    def _snapshot_config(self) -> tuple:
+        """
+        returns a (count, pickled copy of self.cfg, config file) to write, so
+        that the config can keep changing while we write the file
         """
-        yaml = YAML()
+        self._snapshot_count += 1
+        config_file = self._pending_config_file
+        self._pending_config_file = ""
+        return (self._snapshot_count,
+                pickle.dumps(self.cfg, protocol=pickle.HIGHEST_PROTOCOL),
+                config_file)
 
-        with open(config_file, 'w') as smol_k8s_config:
-            yaml.dump(self.cfg, smol_k8s_config)
+    def _write_yaml_in_worker(self) -> None:
+        """
+        dump the config in a thread, so typing in the TUI stays smooth
+        """
+        self._write_timer = None
+        if self._pending_config_file:
+            snapshot = self._snapshot_config()
+            self.run_worker(lambda: self._write_snapshot(*snapshot),
+                            group="write_yaml",
+                            thread=True)
+
+    def _write_snapshot(self, count: int, config: bytes, config_file: str) -> None:
+        """
+        dump a snapshot of the config to a temp file, and then move it into
+        place, so the config file is never half written
+        """
+        with self._write_lock:
+            # a newer snapshot was already written
+            if count < self._written_count:
+                return
+
+            yaml = YAML()
+            with open(config_file + '.tmp', 'w') as smol_k8s_config:
+                yaml.dump(pickle.loads(config), smol_k8s_config)
+            replace(config_file + '.tmp', config_file)
+            self._written_count = count
+
+    def flush_yaml(self) -> None:
+        """
+        write any pending changes to the config file right now
+        """
+        if self._write_timer:
+            self._write_timer.stop()
+            self._write_timer = None
+        if self._pending_config_file:
+            self._write_snapshot(*self._snapshot_config())
+
+    def pop_screen(self):
+        """
+        make sure changes made on a screen are saved when we leave it
+        """
+        self.flush_yaml()
+        return super().pop_screen()
+
+    def exit(self, *args, **kwargs) -> None:
+        """
+        make sure all changes are saved before we exit
+        """
+        self.flush_yaml()
+        return super().exit(*args, **kwargs)
 
     def play_screen_audio(self,
                           screen: str,
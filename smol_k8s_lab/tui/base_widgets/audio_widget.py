@@ -126,9 +126,7 @@ class SmolAudio(Widget):
 
         if self.speak_screen_desc and say_desc:
             if not self.speech_program:
-                number_of_workers = len(self.workers)
-                while number_of_workers > 1:
-                    self.log(f"play screen audio number of workers is {number_of_workers}")
+                # pyg_play waits for the title to finish playing on its own
                 audio_file = path.join(self.screen_audio,
                                        f'{screen}_{desc}.mp3')
                 self.say(audio_file=audio_file)
@@ -163,6 +163,13 @@ class PasswordManagerConfig(Widget):
                                   "enabled",
                                   enabled_tooltip)
 
+                serve_tooltip = ("run bw serve while smol-k8s-lab runs, instead "
+                                 "of the bw cli for every item. Much faster")
+                yield bool_option("serve",
+                                  self.cfg.get('serve', False),
+                                  "serve",
+                                  serve_tooltip)
+
                 with Grid(classes="selection-row"):
                     label = Label("duplicate strategy:",
                                   classes="radioset-row-label")
@@ -0,0 +1,115 @@
+"""
+       Name: import_profile
+DESCRIPTION: measures how long each module takes to import, like
+             python -X importtime, so we can see what a command pays for at
+             startup. Enabled with smol-k8s-lab --profile-imports
+     AUTHOR: @jessebot
+    LICENSE: GNU AFFERO GENERAL PUBLIC LICENSE Version 3
+"""
+from importlib.abc import Loader, MetaPathFinder
+import sys
+from time import perf_counter
+
+
+class _TimingLoader(Loader):
+    """
+    wraps the real loader of a module, to time running the module's code
+    """
+    def __init__(self, loader: Loader, profiler: "ImportProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        self._profiler.start(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.stop()
+
+    def __getattr__(self, name: str):
+        # everything else, e.g. get_resource_reader, goes to the real loader
+        return getattr(self._loader, name)
+
+
+class _TimingFinder(MetaPathFinder):
+    """
+    asks the other finders for each module, and wraps the loader they find
+    """
+    def __init__(self, profiler: "ImportProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, name: str, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimingLoader(spec.loader, self._profiler)
+            return spec
+        return None
+
+
+class ImportProfiler():
+    """
+    records the self and cumulative import time of every module imported
+    while installed, in microseconds, like python -X importtime
+    """
+    def __init__(self):
+        self.finder = _TimingFinder(self)
+        # {module name: (self us, cumulative us, depth)}, in import order
+        self.times = {}
+        # [module name, start time, time spent importing its imports]
+        self._stack = []
+
+    def install(self) -> None:
+        if self.finder not in sys.meta_path:
+            sys.meta_path.insert(0, self.finder)
+
+    def uninstall(self) -> None:
+        if self.finder in sys.meta_path:
+            sys.meta_path.remove(self.finder)
+
+    def start(self, name: str) -> None:
+        self._stack.append([name, perf_counter(), 0.0])
+
+    def stop(self) -> None:
+        name, start, children = self._stack.pop()
+        cumulative = perf_counter() - start
+        if self._stack:
+            self._stack[-1][2] += cumulative
+        self.times[name] = (int((cumulative - children) * 1e6),
+                            int(cumulative * 1e6),
+                            len(self._stack))
+
+    def report(self, top: int = 30) -> None:
+        """
+        print the top slowest imports by cumulative time
+        """
+        from rich.console import Console
+        from rich.table import Table
+
+        self.uninstall()
+        table = Table(title=f"Slowest {top} imports", box=None,
+                      header_style="cornflower_blue")
+        table.add_column("module")
+        table.add_column("self (us)", justify="right")
+        table.add_column("cumulative (us)", justify="right")
+
+        slowest = sorted(self.times.items(), key=lambda t: t[1][1], reverse=True)
+        for name, (self_us, cumulative_us, depth) in slowest[:top]:
+            table.add_row("  " * depth + name, str(self_us), str(cumulative_us),
+                          style="" if depth == 0 else "dim")
+
+        console = Console(stderr=True)
+        console.print(table)
+        top_level = sum(t[1] for t in self.times.values() if t[2] == 0)
+        console.print(f"[dim]{len(self.times)} modules imported in "
+                      f"{top_level / 1e6:.2f}s since we started profiling")
+
+
+PROFILER = ImportProfiler()
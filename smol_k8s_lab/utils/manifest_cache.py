@@ -0,0 +1,145 @@
+"""
+       Name: manifest_cache
+DESCRIPTION: local cache of remote manifests, like the Argo CD apps and appsets
+             on raw.githubusercontent.com, so we don't download the same files
+             on every run, and so we can run from the cache while offline
+     AUTHOR: @jessebot
+    LICENSE: GNU AFFERO GENERAL PUBLIC LICENSE Version 3
+"""
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from json import dump, load
+import logging as log
+from os import environ, path, replace
+from pathlib import Path
+import requests
+from threading import Lock
+
+from ..constants import XDG_CACHE_DIR
+
+# manifests are saved by the sha256 of their contents in BLOB_DIR, and each URL
+# is saved by the sha256 of the URL in URL_DIR, pointing to its manifest's blob
+CACHE_DIR = path.join(XDG_CACHE_DIR, 'manifests')
+BLOB_DIR = path.join(CACHE_DIR, 'blobs')
+URL_DIR = path.join(CACHE_DIR, 'urls')
+
+# if set to anything but "", "0", or "false", we never go to the network
+OFFLINE_ENV_VAR = "SMOL_K8S_LAB_OFFLINE"
+
+# the manifests we've already fetched or revalidated during this run, by url
+_fetched = {}
+_lock = Lock()
+_session = requests.Session()
+
+
+def offline() -> bool:
+    """
+    returns True if we're in offline mode, see OFFLINE_ENV_VAR
+    """
+    return environ.get(OFFLINE_ENV_VAR, "").lower() not in ["", "0", "false"]
+
+
+def _url_file(url: str) -> str:
+    return path.join(URL_DIR, sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+
+def _read_cache(url: str) -> tuple:
+    """
+    returns (manifest str, etag) from the cache for a url, or ("", "")
+    """
+    try:
+        with open(_url_file(url), 'r') as url_file:
+            entry = load(url_file)
+        with open(path.join(BLOB_DIR, entry['sha256'] + '.yaml'), 'r') as blob:
+            return blob.read(), entry.get('etag', "")
+    except (OSError, ValueError, KeyError):
+        return "", ""
+
+
+def _write_cache(url: str, manifest: str, etag: str) -> None:
+    """
+    save a manifest to the cache. We write to temp files and then move them
+    into place, so other runs never see half written files
+    """
+    Path(BLOB_DIR).mkdir(parents=True, exist_ok=True)
+    Path(URL_DIR).mkdir(parents=True, exist_ok=True)
+
+    digest = sha256(manifest.encode('utf-8')).hexdigest()
+    blob_file = path.join(BLOB_DIR, digest + '.yaml')
+    if not path.exists(blob_file):
+        with open(blob_file + '.tmp', 'w') as blob:
+            blob.write(manifest)
+        replace(blob_file + '.tmp', blob_file)
+
+    url_file = _url_file(url)
+    with open(url_file + '.tmp', 'w') as entry:
+        dump({"url": url, "etag": etag, "sha256": digest}, entry)
+    replace(url_file + '.tmp', url_file)
+
+
+def fetch(url: str) -> str:
+    """
+    returns the contents of a remote manifest. We download each url at most
+    once per run, and if we've downloaded it on an earlier run, we only ask
+    the server if it changed (using the ETag), and otherwise use our cache.
+    In offline mode, or if the network fails us, we use the cache as is.
+    """
+    with _lock:
+        if url in _fetched:
+            return _fetched[url]
+
+    cached, etag = _read_cache(url)
+    if offline():
+        if not cached:
+            raise FileNotFoundError(f"{url} isn't cached and we're offline, "
+                                    f"because {OFFLINE_ENV_VAR} is set")
+        manifest = cached
+    else:
+        headers = {"If-None-Match": etag} if cached and etag else {}
+        try:
+            response = _session.get(url, headers=headers, timeout=30)
+            if response.status_code == 304:
+                log.debug(f"{url} hasn't changed, using our cached copy")
+                manifest = cached
+            else:
+                response.raise_for_status()
+                manifest = response.text
+                _write_cache(url, manifest, response.headers.get('ETag', ""))
+        except requests.RequestException as e:
+            if not cached:
+                raise
+            log.warning(f"Couldn't download {url}, so we'll use our cached "
+                        f"copy. Error was: {e}")
+            manifest = cached
+
+    with _lock:
+        _fetched[url] = manifest
+    return manifest
+
+
+def cached_file(url: str) -> str:
+    """
+    returns the path to a local file with the contents of a remote manifest,
+    for tools that need a file, like kubectl apply -f
+    """
+    fetch(url)
+    with open(_url_file(url), 'r') as url_file:
+        return path.join(BLOB_DIR, load(url_file)['sha256'] + '.yaml')
+
+
+def prefetch(urls: list, max_parallel: int = 8) -> None:
+    """
+    fetch every url, max_parallel at a time, so they're ready when we need them
+    """
+    urls = [url for url in set(urls) if url not in _fetched]
+    if not urls:
+        return
+
+    log.debug(f"Prefetching {len(urls)} manifests")
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = {url: pool.submit(fetch, url) for url in urls}
+        for url, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                log.debug(f"Couldn't prefetch {url}: {e}")
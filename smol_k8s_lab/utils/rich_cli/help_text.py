@@ -44,7 +44,14 @@ def options_help():
         'Run command immediately after smol-k8s-lab before main cli phase',
 
         'version':
-        f'Print the version of smol-k8s-lab (v{VERSION})'
+        f'Print the version of smol-k8s-lab (v{VERSION})',
+
+        'max_parallel':
+        'How many apps to install at the same time. Overrides '
+        '[light_steel_blue]smol_k8s_lab.max_parallel[/] in your config file',
+
+        'profile_imports':
+        'Print how long importing each module took, like python -X importtime'
         }
 
     if RECORD:
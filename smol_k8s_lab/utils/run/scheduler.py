@@ -0,0 +1,289 @@
+"""
+       Name: scheduler
+DESCRIPTION: runs a graph of install steps, where each step declares the other
+             steps it needs first, and every step that is ready runs at once
+     AUTHOR: @jessebot
+    LICENSE: GNU AFFERO GENERAL PUBLIC LICENSE Version 3
+"""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from inspect import iscoroutine
+import logging as log
+from queue import Queue, Empty
+from rich.table import Table
+from threading import Lock, current_thread, main_thread
+from time import monotonic
+
+from ..rich_cli.console_logging import CONSOLE, header
+
+# calls that steps running in worker threads need made in the main thread,
+# e.g. Textual prompts, see call_in_main_thread()
+_MAIN_THREAD_CALLS = Queue()
+# how many TaskGraphs are running in the main thread, and so serving the queue
+_serving = 0
+_serving_lock = Lock()
+
+
+def call_in_main_thread(func: callable, *args, **kwargs):
+    """
+    calls func in the main thread and returns what it returns. Use this for
+    anything that has to run in the main thread, like a Textual app, from a
+    step that may be running in a worker thread of a TaskGraph.
+
+    If we're already in the main thread, or no TaskGraph is running to take
+    the call, we call func right here.
+    """
+    if current_thread() is main_thread():
+        return func(*args, **kwargs)
+
+    # under the lock, so a TaskGraph can't stop serving calls in between
+    with _serving_lock:
+        future = None
+        if _serving > 0:
+            future = Future()
+            _MAIN_THREAD_CALLS.put((future, func, args, kwargs))
+    if future is None:
+        return func(*args, **kwargs)
+    return future.result()
+
+
+def _run_main_thread_calls() -> None:
+    """
+    make every call that worker threads have asked for, in this thread
+    """
+    while True:
+        try:
+            future, func, args, kwargs = _MAIN_THREAD_CALLS.get_nowait()
+        except Empty:
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+
+class Task():
+    """
+    a single step in a TaskGraph
+    """
+    def __init__(self, name: str, func: callable, requires: list = []):
+        """
+        name:     str, unique name of this step, e.g. "zitadel"
+        func:     callable with no args. May return a coroutine, which we run
+        requires: list of names of other steps that must finish first
+        """
+        self.name = name
+        self.func = func
+        self.requires = list(requires)
+        self.result = None
+        self.start = None
+        self.end = None
+
+    @property
+    def duration(self) -> float:
+        """
+        seconds this step took to run, or 0 if it hasn't run yet
+        """
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    def run(self):
+        """
+        run the step, recording when it started and finished
+        """
+        self.start = monotonic()
+        try:
+            result = self.func()
+            # our configure_* functions are often async, but they block anyway
+            if iscoroutine(result):
+                result = asyncio.run(result)
+            self.result = result
+        finally:
+            self.end = monotonic()
+        return self.result
+
+
+class TaskGraph():
+    """
+    A dependency graph of install steps. Steps run as soon as all the steps
+    they require are done, with at most max_parallel running at once. Steps
+    that require a name that was never added to the graph (e.g. an app that
+    isn't enabled) don't wait on it.
+    """
+    def __init__(self, max_parallel: int = 1):
+        self.max_parallel = max(1, max_parallel)
+        # python dicts keep insertion order, which we use to break ties
+        self.tasks = {}
+        self.started = None
+        self.finished = None
+
+    def add(self, name: str, func: callable, requires: list = []) -> None:
+        """
+        add a step to the graph. See Task for the args
+        """
+        if name in self.tasks:
+            raise ValueError(f"A step called {name} is already in the graph")
+        self.tasks[name] = Task(name, func, requires)
+
+    @property
+    def results(self) -> dict:
+        """
+        dict of {step name: return value} for every step that has finished
+        """
+        return {name: task.result for name, task in self.tasks.items()
+                if task.end is not None}
+
+    def _requirements(self, task: Task) -> list:
+        """
+        returns only the requirements of a task that are actually in the graph
+        """
+        return [req for req in task.requires if req in self.tasks]
+
+    def _check_for_cycles(self) -> None:
+        """
+        raise a ValueError if any steps require each other in a loop
+        """
+        visiting, visited = set(), set()
+
+        def visit(name: str, path: list):
+            if name in visited:
+                return
+            if name in visiting:
+                cycle = " -> ".join(path[path.index(name):] + [name])
+                raise ValueError(f"Install steps require each other: {cycle}")
+            visiting.add(name)
+            for req in self._requirements(self.tasks[name]):
+                visit(req, path + [name])
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name, [])
+
+    def _ready(self, done: set, running: set) -> list:
+        """
+        returns steps, in the order they were added, that can start right now
+        """
+        return [task for name, task in self.tasks.items()
+                if name not in done and name not in running
+                and all(req in done for req in self._requirements(task))]
+
+    def run(self) -> dict:
+        """
+        runs every step in the graph and returns self.results. If a step
+        fails, we stop starting new steps, let the running ones finish, and
+        then raise the first exception.
+        """
+        self._check_for_cycles()
+        self.started = monotonic()
+        done = set()
+
+        # run everything in this thread, in order, if we aren't parallelizing,
+        # so that spinners and prompts behave exactly like they always have
+        if self.max_parallel == 1:
+            while len(done) < len(self.tasks):
+                task = self._ready(done, set())[0]
+                log.debug(f"Starting install step: {task.name}")
+                task.run()
+                done.add(task.name)
+            self.finished = monotonic()
+            return self.results
+
+        running = {}
+        errors = []
+        serve_main_thread_calls = current_thread() is main_thread()
+        global _serving
+        if serve_main_thread_calls:
+            with _serving_lock:
+                _serving += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            try:
+                while True:
+                    if not errors:
+                        for task in self._ready(done, set(running.values())):
+                            if len(running) >= self.max_parallel:
+                                break
+                            log.debug(f"Starting install step: {task.name}")
+                            running[pool.submit(task.run)] = task.name
+
+                    if not running:
+                        break
+
+                    # wake up now and then to make calls steps need made in
+                    # the main thread, like asking the user something
+                    finished, _ = wait(running, timeout=0.1,
+                                       return_when=FIRST_COMPLETED)
+                    if serve_main_thread_calls:
+                        _run_main_thread_calls()
+                    for future in finished:
+                        name = running.pop(future)
+                        error = future.exception()
+                        if error:
+                            log.error(f"Install step {name} failed with: {error}")
+                            errors.append(error)
+                        else:
+                            done.add(name)
+            finally:
+                # make any calls still waiting before we stop serving them, so
+                # no step is left waiting on us while the pool shuts down
+                if serve_main_thread_calls:
+                    with _serving_lock:
+                        _serving -= 1
+                        _run_main_thread_calls()
+
+        self.finished = monotonic()
+        if errors:
+            raise errors[0]
+        return self.results
+
+    def critical_path(self) -> list:
+        """
+        returns the chain of steps with the longest total run time, i.e. the
+        steps that decided how long the whole graph took
+        """
+        longest = {}
+
+        def path_to(name: str) -> tuple:
+            if name not in longest:
+                task = self.tasks[name]
+                best = (0.0, [])
+                for req in self._requirements(task):
+                    best = max(best, path_to(req), key=lambda p: p[0])
+                longest[name] = (best[0] + task.duration, best[1] + [name])
+            return longest[name]
+
+        if not self.tasks:
+            return []
+        return max((path_to(name) for name in self.tasks),
+                   key=lambda p: p[0])[1]
+
+    def print_report(self, title: str = "Install timings") -> None:
+        """
+        prints how long each step took, highlighting the critical path
+        """
+        if not self.tasks or self.started is None:
+            return
+
+        critical = self.critical_path()
+        header(title, "⏱️")
+
+        table = Table(box=None, header_style="cornflower_blue")
+        table.add_column("step")
+        table.add_column("started at", justify="right")
+        table.add_column("took", justify="right")
+        table.add_column("critical path", justify="center")
+
+        ran = [t for t in self.tasks.values() if t.start is not None]
+        for task in sorted(ran, key=lambda t: t.start):
+            table.add_row(task.name,
+                          f"{task.start - self.started:.1f}s",
+                          f"{task.duration:.1f}s",
+                          "[green]●[/]" if task.name in critical else "",
+                          style="" if task.name in critical else "dim")
+        CONSOLE.print(table, justify="center")
+
+        total = (self.finished or monotonic()) - self.started
+        CONSOLE.print(f"\n[dim]Total: {total:.1f}s, critical path: "
+                      f"{' → '.join(critical)}[/dim]", justify="center")
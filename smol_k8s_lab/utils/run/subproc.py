@@ -3,13 +3,17 @@ Using Textualize's rich library to pretty print subprocess outputs,
 so during long running commands, the user isn't wondering what's going on,
 even if you don't actually output anything from stdout/stderr of the command.
 """
+import asyncio
+from collections import deque
 import logging as log
+from queue import Queue
 from subprocess import Popen, PIPE
 import re
 from rich.console import Console
-from rich.markup import MarkupError
+from rich.markup import MarkupError, escape
 from rich.theme import Theme
 from rich.progress import Progress
+from threading import BoundedSemaphore, Thread, current_thread, main_thread
 from time import sleep
 
 
@@ -18,6 +22,25 @@ soft_theme = Theme({"info": "dim cornflower_blue",
                     "danger": "bold magenta"})
 console = Console(theme=soft_theme)
 
+# how many commands asubproc runs at the same time, across every thread and
+# event loop, since our async setup functions each run in their own loop
+MAX_CONCURRENT_COMMANDS = 8
+_command_slots = BoundedSemaphore(MAX_CONCURRENT_COMMANDS)
+
+
+# in stream mode, we only keep this many of the last lines of each output
+STREAM_TAIL_LINES = 200
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+
+def set_max_concurrent_commands(max_commands: int) -> None:
+    """
+    set how many commands asubproc can run at the same time
+    """
+    global MAX_CONCURRENT_COMMANDS, _command_slots
+    MAX_CONCURRENT_COMMANDS = max(1, max_commands)
+    _command_slots = BoundedSemaphore(MAX_CONCURRENT_COMMANDS)
+
 
 def basic_syntax(bash_string: str):
     """
@@ -34,6 +57,28 @@ def basic_syntax(bash_string: str):
         return bash_string
 
 
+def get_status_line(cmd: str, quiet: bool = False) -> str:
+    """
+    returns the line we print while running a command, without any passwords
+    """
+    # do some very basic syntax highlighting
+    printed_cmd = basic_syntax(cmd)
+    if not quiet:
+        status_line = "[green] Running:[/green] "
+
+        # make sure I'm not about to print a password, oof
+        if 'password' not in cmd.lower():
+            status_line += printed_cmd
+        else:
+            status_line += printed_cmd.split('assword')[0] + \
+                'assword[warn]:warning: TRUNCATED'
+    else:
+        cmd_parts = printed_cmd.split(' ')
+        msg = '[green]Running [i]secret[/i] command:[b] ' + cmd_parts[0]
+        status_line = " ".join([msg, " ".join(cmd_parts[1:2]), '[dim]...'])
+    return status_line + '\n'
+
+
 def subproc(commands: list, **kwargs):
     """
     Takes a list of command strings to run in subprocess
@@ -45,34 +90,26 @@ def subproc(commands: list, **kwargs):
         cwd             - path to run commands in. Default: pwd of user
         shell           - use shell with subprocess or not. Default: False
         env             - dictionary of env variables for BASH. Default: None
+        stream          - log output as it arrives, instead of when the
+                          command is done. For long running commands.
+                          Default: False
     """
     # get/set defaults and remove the 2 output specific args from the key word
     # args dict so we can use the rest to pass into subproc.Popen later on
     spinner = kwargs.pop('spinner', True)
     quiet = kwargs.get('quiet', False)
 
+    # spinners from more than one thread at a time garble the terminal, so
+    # only the main thread gets to draw them
+    if current_thread() is not main_thread():
+        spinner = False
+
     if spinner:
         # only need this if we're doing a progress spinner
         console = Console()
 
     for cmd in commands:
-
-        # do some very basic syntax highlighting
-        printed_cmd = basic_syntax(cmd)
-        if not quiet:
-            status_line = "[green] Running:[/green] "
-
-            # make sure I'm not about to print a password, oof
-            if 'password' not in cmd.lower():
-                status_line += printed_cmd
-            else:
-                status_line += printed_cmd.split('assword')[0] + \
-                    'assword[warn]:warning: TRUNCATED'
-        else:
-            cmd_parts = printed_cmd.split(' ')
-            msg = '[green]Running [i]secret[/i] command:[b] ' + cmd_parts[0]
-            status_line = " ".join([msg, cmd_parts[1], '[dim]...'])
-        status_line += '\n'
+        status_line = get_status_line(cmd, quiet)
 
         # Sometimes we need to not use a little loading bar
         if not spinner:
@@ -83,7 +120,10 @@ def subproc(commands: list, **kwargs):
             with console.status(status_line,
                                 spinner='aesthetic',
                                 speed=0.75) as status:
-                output = run_subprocess(cmd, **kwargs)
+                # in stream mode, show the latest line under the spinner
+                def on_line(line: str, status=status, status_line=status_line):
+                    status.update(status_line + f"[dim]{escape(line[:120])}")
+                output = run_subprocess(cmd, on_line=on_line, **kwargs)
 
     return output
 
@@ -99,10 +139,16 @@ def run_subprocess(command: str, decode_ascii: bool = False, **kwargs):
         shell     - bool, run shell or not
         text, universal_newlines - allow for "" in commands
         decode_ascii - decode ascii strings instead of the default UTF-8
+        stream    - bool, read the output line by line as it arrives, see
+                    stream_output
+        on_line   - callable, in stream mode, called with each line of output,
+                    unless quiet
     """
     # get the values if passed in, otherwise, set defaults
     quiet = kwargs.pop('quiet', False)
     error_ok = kwargs.pop('error_ok', False)
+    stream = kwargs.pop('stream', False)
+    on_line = kwargs.pop('on_line', None)
 
     try:
         if kwargs.get('universal_newlines', None):
@@ -116,18 +162,33 @@ def run_subprocess(command: str, decode_ascii: bool = False, **kwargs):
         else:
             raise Exception(e)
 
+    if stream:
+        return stream_output(p, command, quiet, error_ok, decode_ascii, on_line)
+
     res = p.communicate()
-    return_code = p.returncode
+    return handle_output(res, p.returncode, quiet, error_ok, decode_ascii,
+                         kwargs.get('universal_newlines', None) or
+                         kwargs.get('text', None))
+
 
+def handle_output(res: tuple,
+                  return_code: int,
+                  quiet: bool = False,
+                  error_ok: bool = False,
+                  decode_ascii: bool = False,
+                  text: bool = False):
+    """
+    decodes, logs, and checks the (stdout, stderr) of a finished command.
+    Shared by run_subprocess and arun_subprocess
+    """
     # decode the output only if universal_newlines is not true
-    if kwargs.get('universal_newlines', None) or kwargs.get('text', None):
+    if text:
         log.debug("universal_newlines or text is true")
         res_stdout, res_stderr = res[0], res[1]
     elif decode_ascii:
         log.debug("decode_ascii is true")
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        res_stdout = ansi_escape.sub('', res[0].decode('UTF-8'))
-        res_stderr = ansi_escape.sub('', res[1].decode('UTF-8'))
+        res_stdout = ANSI_ESCAPE.sub('', res[0].decode('UTF-8'))
+        res_stderr = ANSI_ESCAPE.sub('', res[1].decode('UTF-8'))
     else:
         res_stdout, res_stderr = res[0].decode('UTF-8'), res[1].decode('UTF-8')
 
@@ -162,6 +223,168 @@ def run_subprocess(command: str, decode_ascii: bool = False, **kwargs):
             return output
 
 
+def stream_output(p: Popen,
+                  command: str,
+                  quiet: bool = False,
+                  error_ok: bool = False,
+                  decode_ascii: bool = False,
+                  on_line: callable = None):
+    """
+    reads stdout and stderr of a running command line by line, as it arrives,
+    logging each line and passing it to on_line, unless quiet. We only keep
+    the last STREAM_TAIL_LINES lines of each, and check each line for errors
+    as it arrives, with the same rules as handle_output.
+
+    Returns the tail of stdout, or of stderr if stdout was empty
+    """
+    tails = {"stdout": deque(maxlen=STREAM_TAIL_LINES),
+             "stderr": deque(maxlen=STREAM_TAIL_LINES)}
+    error_lines = deque(maxlen=20)
+    lines = Queue()
+
+    # one thread per pipe, so a full stderr pipe can't block stdout
+    def read(name: str, pipe) -> None:
+        for line in pipe:
+            lines.put((name, line))
+        pipe.close()
+        lines.put((name, None))
+
+    for name, pipe in [("stdout", p.stdout), ("stderr", p.stderr)]:
+        Thread(target=read, args=(name, pipe), daemon=True).start()
+
+    open_pipes = 2
+    while open_pipes:
+        name, line = lines.get()
+        if line is None:
+            open_pipes -= 1
+            continue
+
+        if isinstance(line, bytes):
+            line = line.decode('UTF-8', errors='replace')
+        line = line.rstrip('\n')
+        if decode_ascii:
+            line = ANSI_ESCAPE.sub('', line)
+
+        tails[name].append(line)
+        if 'error' in line.lower():
+            error_lines.append(line)
+        # quiet means we don't show the output anywhere, even under a spinner
+        if not quiet:
+            log.info(line, extra={"markup": False})
+            if on_line:
+                on_line(line)
+
+    return_code = p.wait()
+
+    if error_lines:
+        err = f'Return code: "{str(return_code)}". Expected code is 0.'
+        tail = "\n".join(list(tails["stderr"])[-20:] or list(tails["stdout"])[-20:])
+        error_msg = (f'\033[0;33m{err}\n{command.split()[0]} reported errors:\n'
+                     + "\n".join(error_lines) +
+                     f'\nLast lines of output:\n{tail}\033[00m')
+        if error_ok:
+            log.error(error_msg)
+        else:
+            raise Exception(error_msg)
+
+    for name in ["stdout", "stderr"]:
+        if tails[name]:
+            return "\n".join(tails[name]) + "\n"
+
+
+async def asubproc(commands: list, timeout: float = None, **kwargs):
+    """
+    async version of subproc, so coroutines can run commands at the same time.
+    Takes a list of command strings and runs them in order, returning the
+    output of the last one. At most MAX_CONCURRENT_COMMANDS commands run at
+    once, across every thread. There's no spinner, since several commands may
+    be running at the same time, so we log the command instead.
+    Optional vars - default, description:
+        timeout         - seconds each command may run before we kill it and
+                          raise a TimeoutError. Default: None, no timeout
+        error_ok        - catch Exceptions and log them, default: False
+        quiet           - don't output from stderr/stdout, Default: False
+        cwd             - path to run commands in. Default: pwd of user
+        shell           - use shell with subprocess or not. Default: False
+        env             - dictionary of env variables for BASH. Default: None
+
+    If the task running this is cancelled, the running command is killed.
+    """
+    # we never draw spinners here, but accept it so calls match subproc's
+    kwargs.pop('spinner', None)
+    quiet = kwargs.get('quiet', False)
+
+    output = None
+    for cmd in commands:
+        log.info(get_status_line(cmd, quiet), extra={"markup": True})
+        output = await arun_subprocess(cmd, timeout=timeout, **kwargs)
+    return output
+
+
+async def _acquire_command_slot(slots: BoundedSemaphore) -> None:
+    """
+    wait for a free command slot without blocking the event loop. We poll
+    instead of waiting in a thread, so that cancelling never leaks a slot
+    """
+    while not slots.acquire(blocking=False):
+        await asyncio.sleep(0.05)
+
+
+async def arun_subprocess(command: str,
+                          decode_ascii: bool = False,
+                          timeout: float = None,
+                          **kwargs):
+    """
+    async version of run_subprocess, usually run from asubproc.
+    Takes the same keyword vars as run_subprocess, plus:
+        timeout - seconds to wait before killing the command, default: None
+    """
+    quiet = kwargs.pop('quiet', False)
+    error_ok = kwargs.pop('error_ok', False)
+    shell = kwargs.pop('shell', False)
+    universal_newlines = kwargs.pop('universal_newlines', None)
+    text = kwargs.pop('text', None) or universal_newlines
+
+    slots = _command_slots
+    await _acquire_command_slot(slots)
+    try:
+        try:
+            if shell:
+                p = await asyncio.create_subprocess_shell(
+                        command, stdout=PIPE, stderr=PIPE, **kwargs)
+            else:
+                p = await asyncio.create_subprocess_exec(
+                        *command.split(), stdout=PIPE, stderr=PIPE, **kwargs)
+        except Exception as e:
+            if error_ok:
+                log.debug(str(e))
+                return str(e)
+            else:
+                raise Exception(e)
+
+        try:
+            res = await asyncio.wait_for(p.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # don't leave the command running after we've given up on it
+            if p.returncode is None:
+                p.kill()
+                await asyncio.shield(p.wait())
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            msg = f"{command.split()[0]} timed out after {timeout}s"
+            if error_ok:
+                log.error(msg)
+                return msg
+            raise TimeoutError(msg)
+    finally:
+        slots.release()
+
+    # asyncio subprocesses always give us bytes
+    if text:
+        res = (res[0].decode('UTF-8'), res[1].decode('UTF-8'))
+    return handle_output(res, p.returncode, quiet, error_ok, decode_ascii, text)
+
+
 def simple_loading_bar(tasks: dict, time_to_wait: int = 120) -> None:
     """
     Prints a small loading bar using rich.
@@ -1,43 +1,179 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging as log
 from os import environ
+import requests
+from threading import Lock
 from smol_k8s_lab.bitwarden.bw_cli import BwCLI
 from smol_k8s_lab.k8s_tools.argocd_util import ArgoCD
 
 
+class SecretResolver():
+    """
+    Resolves value_from dicts to secret values, using one shared session per
+    provider, and remembers every value for the rest of the run. Providers:
+
+        env:       {"env": "ENV_VAR_NAME"}
+        bitwarden: {"bitwarden_item": "item name", "bitwarden_field": "password"}
+        openbao:   {"openbao_item": "path/in/kv", "openbao_field": "key"}
+
+    openbao reads from a KV v2 secrets engine at $BAO_ADDR with $BAO_TOKEN
+    (or $VAULT_ADDR and $VAULT_TOKEN). The mount defaults to "secret", and can
+    be changed with $BAO_KV_MOUNT.
+    """
+    def __init__(self, bitwarden: BwCLI = None):
+        # the unlocked bitwarden vault smol-k8s-lab is using, if any
+        self.bitwarden = bitwarden
+        self._cache = {}
+        self._lock = Lock()
+        self._openbao_session = None
+
+    def _key(self, value_dict: dict) -> tuple:
+        """
+        returns a (provider, lookup) tuple for a value_from dict, or None if
+        we don't know how to resolve it
+        """
+        if value_dict.get('env', None):
+            return ("env", value_dict['env'])
+        if value_dict.get('bitwarden_item', None):
+            return ("bitwarden",
+                    value_dict['bitwarden_item'],
+                    value_dict.get('bitwarden_field', None))
+        if value_dict.get('openbao_item', None):
+            return ("openbao",
+                    value_dict['openbao_item'],
+                    value_dict.get('openbao_field', None))
+        return None
+
+    def resolve(self, value: dict = {}) -> str:
+        """
+        process a value that has a value_from dict and return the value
+        """
+        if isinstance(value, dict):
+            value_dict = value.get('value_from', None)
+            if not value_dict:
+                log.warn(f"{value} has no value_from dict, so we're returning empty str")
+                return ""
+        else:
+            log.warn(f"value, {value}, is not a dict, so we're returning it as it came in")
+            return value
+
+        key = self._key(value_dict)
+        if not key:
+            log.warn("No secret was found so returning empty string")
+            return ""
+
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        # env vars can change in tests and the tui, so we don't cache those
+        if key[0] == "env":
+            return environ.get(key[1], "")
+
+        secret = getattr(self, f"_from_{key[0]}")(*key[1:])
+        if secret:
+            with self._lock:
+                self._cache[key] = secret
+        return secret
+
+    def _from_bitwarden(self, item_name: str, field: str) -> str:
+        """
+        get a field from an item in the shared, already unlocked, vault
+        """
+        if not self.bitwarden:
+            log.warn(f"Can't get {item_name} from Bitwarden, because the "
+                     "Bitwarden password manager isn't enabled")
+            return ""
+        item = self.bitwarden.get_item(item_name, False)[0]
+        if not item:
+            log.warn(f"No Bitwarden item called {item_name}")
+            return ""
+
+        # login items keep their username and password under "login"
+        if field in item:
+            return item[field]
+        if field in (item.get('login') or {}):
+            return item['login'][field]
+        for custom_field in item.get('fields') or []:
+            if custom_field.get('name') == field:
+                return custom_field.get('value', "")
+        log.warn(f"Bitwarden item {item_name} has no field called {field}")
+        return ""
+
+    def _from_openbao(self, path: str, field: str) -> str:
+        """
+        get a key from a secret in openbao's KV v2 secrets engine
+        """
+        address = environ.get("BAO_ADDR", environ.get("VAULT_ADDR", ""))
+        token = environ.get("BAO_TOKEN", environ.get("VAULT_TOKEN", ""))
+        if not address or not token:
+            log.warn(f"Can't get {path} from OpenBao, because $BAO_ADDR and "
+                     "$BAO_TOKEN aren't set")
+            return ""
+
+        with self._lock:
+            if not self._openbao_session:
+                self._openbao_session = requests.Session()
+                self._openbao_session.headers["X-Vault-Token"] = token
+        mount = environ.get("BAO_KV_MOUNT", "secret")
+
+        response = self._openbao_session.get(
+                f"{address.rstrip('/')}/v1/{mount}/data/{path.strip('/')}",
+                timeout=30)
+        if not response.ok:
+            log.warn(f"OpenBao returned {response.status_code} for {path}")
+            return ""
+        return response.json()['data']['data'].get(field, "")
+
+    def prefetch(self, config: dict, max_parallel: int = 4) -> None:
+        """
+        resolve every value_from dict anywhere in config (e.g. all the apps),
+        max_parallel at a time, so they're ready before we start installing
+        """
+        values = []
+
+        def find_values(obj):
+            if isinstance(obj, dict):
+                if isinstance(obj.get('value_from', None), dict):
+                    values.append(obj)
+                    return
+                for child in obj.values():
+                    find_values(child)
+            elif isinstance(obj, list):
+                for child in obj:
+                    find_values(child)
+
+        find_values(config)
+        # only one lookup per secret, and env vars are free
+        unique = {}
+        for value in values:
+            key = self._key(value['value_from'])
+            if key and key[0] != "env":
+                unique.setdefault(key, value)
+        if not unique:
+            return
+
+        log.debug(f"Prefetching {len(unique)} secrets")
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+            for key, future in [(k, pool.submit(self.resolve, v))
+                                for k, v in unique.items()]:
+                try:
+                    future.result()
+                except Exception as e:
+                    log.warn(f"Couldn't prefetch secret {key[:2]}: {e}")
+
+
+# one resolver for the whole run, see SecretResolver
+RESOLVER = SecretResolver()
+
+
 def extract_secret(value: dict = {}) -> str:
     """
     process a value that has a value_from dict and return the value
 
-    supported value_from methods: env, bitwarden. coming soon: openbao
+    supported value_from methods: env, bitwarden, openbao. See SecretResolver
     """
-    if isinstance(value, dict):
-        value_dict = value.get('value_from', None)
-        if not value_dict:
-            log.warn(f"{value} has no value_from dict, so we're returning empty str")
-            return ""
-    else:
-        log.warn(f"value, {value}, is not a dict, so we're returning it as it came in")
-        return value
-
-    # try to get variable from env var
-    env_var = value_dict.get('env', None)
-    if env_var:
-        return environ.get(env_var, "")
-
-    # try to get variable from bitwarden item and field
-    bitwarden_item = value_dict.get('bitwarden_item', None)
-    if bitwarden_item:
-        bitwarden_field = value['value_from'].get('bitwarden_field', None)
-        bw = BwCLI()
-        return bw.get_item(bitwarden_item)[0][bitwarden_field]
-
-    # try to get variable from openbao (or vault) item
-    openbao_item = value_dict.get('openbao_item', None)
-    if openbao_item:
-        log.warn("openbao support not yet implemented")
-
-    log.warn("No secret was found so returning empty string")
-    return ""
+    return RESOLVER.resolve(value)
 
 
 def process_backup_vals(backup_dict: dict,